@@ -1,6 +1,7 @@
 """Abstract base class and registry for all bots."""
 from __future__ import annotations
 
+import functools
 import json
 import logging
 import os
@@ -10,6 +11,7 @@ from pathlib import Path
 from typing import Any
 
 from common.config import get_settings
+from common.llm.metrics import RunMetrics, bot_scope, current_run
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,15 @@ logger = logging.getLogger(__name__)
 class BotBase(ABC):
     """Abstract base that every bot must extend."""
 
+    #: LLM call metrics of the most recent :meth:`run`, or None before the first.
+    last_llm_metrics: RunMetrics | None = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Attribute every LLM call made during run() to this bot.
+        if "run" in cls.__dict__:
+            cls.run = _with_llm_metrics(cls.__dict__["run"])
+
     # ------------------------------------------------------------------
     # Subclasses must define these
     # ------------------------------------------------------------------
@@ -53,6 +64,11 @@ class BotBase(ABC):
         dest = self._output_dir() / filename
         dest.write_text(json.dumps(data, indent=2, default=str), encoding="utf-8")
         logger.info("Saved output to %s", dest)
+        run = current_run()
+        if run is not None and run.records:
+            # A sidecar rather than a key in *data*: outputs are fed to other bots' prompts.
+            sidecar = dest.with_suffix(".metrics.json")
+            sidecar.write_text(json.dumps(run.summary(), indent=2), encoding="utf-8")
         return dest
 
     def load_input(self, filename: str) -> dict:
@@ -65,6 +81,16 @@ class BotBase(ABC):
         return json.loads(path.read_text(encoding="utf-8"))
 
 
+def _with_llm_metrics(run):
+    @functools.wraps(run)
+    def wrapper(self: BotBase, **kwargs: Any) -> dict:
+        with bot_scope(self.name) as metrics:
+            self.last_llm_metrics = metrics
+            return run(self, **kwargs)
+
+    return wrapper
+
+
 # ---------------------------------------------------------------------------
 # Registry
 # ---------------------------------------------------------------------------
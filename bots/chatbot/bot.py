@@ -29,7 +29,7 @@ class ChatbotBot(BotBase):
     def __init__(self, llm: LLMClient | None = None) -> None:
         self._llm = llm or LLMClient()
         settings = get_settings()
-        self._system_prompt = SYSTEM_PROMPT.format(
+        self._system_prompt = SYSTEM_PROMPT.render(
             restaurant_name=settings.restaurant_name,
             cuisine=settings.restaurant_cuisine,
             neighborhood=settings.restaurant_neighborhood,
@@ -56,7 +56,10 @@ class ChatbotBot(BotBase):
             messages.append({"role": msg.role, "content": msg.content})
 
         try:
-            response_text = self._llm.chat_completion(messages, temperature=0.6, max_tokens=500)
+            # A customer is waiting on this reply: hedge slow calls to cut the tail.
+            response_text = self._llm.chat_completion(
+                messages, temperature=0.6, max_tokens=500, call_class="generate", hedge=True
+            )
         except Exception as exc:
             logger.error("chatbot respond failed: %s", exc)
             response_text = "I'm sorry, I'm having trouble responding right now. Please call us directly."
@@ -71,10 +74,10 @@ class ChatbotBot(BotBase):
 
     def detect_intent(self, message: str) -> str:
         """Classify the intent of a user message."""
-        prompt = INTENT_DETECTION_PROMPT.format(message=message)
+        prompt = INTENT_DETECTION_PROMPT.render(message=message)
         messages = [{"role": "user", "content": prompt}]
         try:
-            raw = self._llm.chat_completion(messages, temperature=0.1)
+            raw = self._llm.chat_completion(messages, temperature=0.1, call_class="classify")
             raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
             data = json.loads(raw)
             return data.get("intent", "general")
@@ -90,10 +93,10 @@ class ChatbotBot(BotBase):
         conversation_text = "\n".join(
             f"{m.role.upper()}: {m.content}" for m in session.messages
         )
-        prompt = MARKETING_TRIGGER_PROMPT.format(conversation_text=conversation_text)
+        prompt = MARKETING_TRIGGER_PROMPT.render(conversation_text=conversation_text)
         messages = [{"role": "user", "content": prompt}]
         try:
-            raw = self._llm.chat_completion(messages, temperature=0.2)
+            raw = self._llm.chat_completion(messages, temperature=0.2, call_class="classify")
             raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
             data = json.loads(raw)
             return [MarketingTrigger.model_validate(t) for t in data.get("triggers", [])]
@@ -1,11 +1,8 @@
 """Prompt templates for the Chatbot bot."""
+from common.llm.prompts import PromptTemplate
 
-SYSTEM_PROMPT = """You are a friendly and knowledgeable assistant for {restaurant_name}, a {cuisine} restaurant located in {neighborhood}, {city}.
-
-Restaurant details:
-- Address: {address}
-- Phone: {phone}
-- Hours: {hours}
+SYSTEM_PROMPT = PromptTemplate(
+    instructions="""You are a friendly and knowledgeable assistant for the restaurant described under Input.
 
 Your role is to help customers with questions about:
 - Menu items, ingredients, and dietary options
@@ -20,11 +17,20 @@ Guidelines:
 - Encourage reservations for special occasions
 - Highlight the restaurant's best dishes and unique offerings
 - Never make up information about menu prices unless provided
-"""
-
-INTENT_DETECTION_PROMPT = """Analyse the following customer message and classify the primary intent.
+""",
+    fields=(
+        ("restaurant_name", "Restaurant"),
+        ("cuisine", "Cuisine"),
+        ("neighborhood", "Neighborhood"),
+        ("city", "City"),
+        ("address", "Address"),
+        ("phone", "Phone"),
+        ("hours", "Hours"),
+    ),
+)
 
-Message: "{message}"
+INTENT_DETECTION_PROMPT = PromptTemplate(
+    instructions="""Analyse the customer message under Input and classify the primary intent.
 
 Choose the single best intent from:
 - reservation: wants to book a table
@@ -38,14 +44,14 @@ Return a JSON object with:
 - "intent": one of the above values
 - "confidence": float 0.0-1.0
 - "entities": dict of any extracted entities (e.g. date, party_size, dish_name)
-"""
-
-MARKETING_TRIGGER_PROMPT = """You are a marketing automation expert for a restaurant.
+""",
+    fields=(("message", "Message"),),
+)
 
-Analyse this conversation and determine if a marketing trigger should fire.
+MARKETING_TRIGGER_PROMPT = PromptTemplate(
+    instructions="""You are a marketing automation expert for a restaurant.
 
-Conversation:
-{conversation_text}
+Analyse the conversation under Input and determine if a marketing trigger should fire.
 
 Available triggers:
 - "reservation_follow_up": user mentioned making a reservation
@@ -61,4 +67,6 @@ Return a JSON object with key "triggers" containing a list of objects, each with
 - "scheduled_at": null (will be scheduled externally)
 
 Return empty list if no triggers apply.
-"""
+""",
+    fields=(("conversation_text", "Conversation"),),
+)
@@ -1,7 +1,6 @@
 """Competitor Analysis bot implementation."""
 from __future__ import annotations
 
-import json
 import logging
 from datetime import datetime, timezone
 
@@ -17,77 +16,119 @@ from bots.competitor_analysis.prompts import (
     GENERATE_REPORT_PROMPT,
 )
 from common.config import get_settings
+from common.crawling.async_scraper import AsyncWebScraper
+from common.crawling.fingerprint import FingerprintStore, get_fingerprint_store
 from common.crawling.scraper import WebScraper
+from common.crawling.site_crawler import SiteCrawler
+from common.llm.batch import fan_out
+from common.llm.budget import PromptBudget, Section
 from common.llm.client import LLMClient
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
+# Menus, USPs and promotions sit near the top of most pages; the long tail of
+# footer and boilerplate text is not worth the tokens.
+_PAGE_TOKEN_BUDGET = 3000
+# The merged site text leaves room in that budget for the extraction
+# instructions; every crawled page is trimmed to its share of it, so the menu
+# and offers pages still fit after the home page.
+_SITE_TEXT_TOKEN_BUDGET = 2500
+
 
 class CompetitorAnalysisBot(BotBase):
     name = "competitor_analysis"
     description = "Crawls competitor sites and generates a comparative analysis report"
 
-    def __init__(self, llm: LLMClient | None = None, scraper: WebScraper | None = None) -> None:
+    def __init__(
+        self,
+        llm: LLMClient | None = None,
+        scraper: WebScraper | None = None,
+        fingerprints: FingerprintStore | None = None,
+    ) -> None:
         self._llm = llm or LLMClient()
-        self._scraper = scraper or WebScraper()
+        self._scraper = scraper or AsyncWebScraper()
+        self._site_crawler = SiteCrawler(self._scraper)
+        self._fingerprints = fingerprints if fingerprints is not None else get_fingerprint_store()
 
     # ------------------------------------------------------------------
 
     def crawl_competitor(self, url: str) -> str:
-        """Fetch and return cleaned text from a competitor URL."""
-        result = self._scraper.crawl(url)
-        return result.get("text", "")
+        """Crawl a competitor site from *url* and return the merged text of its key pages."""
+        return self._site_crawler.crawl(url).merged_text(_SITE_TEXT_TOKEN_BUDGET)
+
+    def crawl_competitors(self, urls: list[str]) -> dict[str, str]:
+        """Return ``{url: merged site text}``, crawling concurrently when the scraper is async."""
+        corpora = self._site_crawler.crawl_sites(urls)
+        return {url: corpus.merged_text(_SITE_TEXT_TOKEN_BUDGET) for url, corpus in corpora.items()}
 
     def extract_competitor_profile(
         self, url: str, html: str, restaurant_name: str
     ) -> CompetitorProfile:
         """Use LLM to extract structured competitor data from scraped text."""
-        # Truncate to avoid token limits
-        text = html[:8000] if len(html) > 8000 else html
-        prompt = EXTRACT_COMPETITOR_DATA_PROMPT.format(
+        prompt = EXTRACT_COMPETITOR_DATA_PROMPT.render(
+            budget=PromptBudget(max_prompt_tokens=_PAGE_TOKEN_BUDGET),
             url=url,
             our_restaurant_name=restaurant_name,
-            website_text=text,
+            website_text=Section(html),
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, CompetitorProfile)
+            result = self._llm.structured_completion(
+                messages, CompetitorProfile, call_class="extract"
+            )
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_competitor_profile(raw, url)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_competitor_profile(exc.raw_text, url)
+
+    def profile_competitor(self, url: str, text: str, restaurant_name: str) -> CompetitorProfile:
+        """Extract a profile, reusing the last one while the site text is materially unchanged."""
+        # The restaurant we compare against is part of the prompt, so part of the key.
+        key = f"{restaurant_name}|{url}"
+        if self._fingerprints is not None:
+            previous = self._fingerprints.reusable(key, text)
+            if previous is not None:
+                return CompetitorProfile.model_validate(previous)
+        profile = self.extract_competitor_profile(url, text, restaurant_name)
+        # The placeholder from a failed parse must not stick until the site changes.
+        if self._fingerprints is not None and profile.name != "Unknown":
+            self._fingerprints.store(key, text, profile.model_dump(mode="json"))
+        return profile
 
     def compare_competitor(
         self, our_restaurant_info: dict, competitor: CompetitorProfile
     ) -> CompetitorComparison:
         """Compare our restaurant against a competitor profile."""
-        prompt = COMPARE_COMPETITORS_PROMPT.format(
-            our_restaurant_json=json.dumps(our_restaurant_info, indent=2),
-            competitor_json=competitor.model_dump_json(indent=2),
+        prompt = COMPARE_COMPETITORS_PROMPT.render(
+            our_restaurant_json=our_restaurant_info,
+            competitor_json=competitor.model_dump(mode="json"),
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, CompetitorComparison)
+            result = self._llm.structured_completion(
+                messages, CompetitorComparison, call_class="summarize"
+            )
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_comparison(raw, our_restaurant_info.get("name", ""), competitor)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_comparison(
+                exc.raw_text, our_restaurant_info.get("name", ""), competitor
+            )
 
     def generate_report(self, comparisons: list[CompetitorComparison]) -> str:
         """Generate a Markdown report from all comparisons."""
         settings = get_settings()
-        prompt = GENERATE_REPORT_PROMPT.format(
+        prompt = GENERATE_REPORT_PROMPT.render(
             restaurant_name=settings.restaurant_name,
             analysis_date=datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            comparisons_json=json.dumps(
-                [c.model_dump() for c in comparisons], indent=2, default=str
-            ),
+            comparisons_json=[c.model_dump(mode="json") for c in comparisons],
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            return self._llm.chat_completion(messages, temperature=0.4, max_tokens=3000)
+            return self._llm.chat_completion(
+                messages, temperature=0.4, max_tokens=3000, call_class="generate"
+            )
         except Exception as exc:
             logger.error("generate_report failed: %s", exc)
             return "# Competitor Analysis Report\n\n*Report generation failed.*"
@@ -101,16 +142,20 @@ class CompetitorAnalysisBot(BotBase):
         }
         competitor_urls: list[str] = kwargs.get("competitor_urls", [])
 
-        comparisons: list[CompetitorComparison] = []
-        for url in competitor_urls:
-            logger.info("CompetitorAnalysisBot: crawling %s", url)
-            text = self.crawl_competitor(url)
+        logger.info("CompetitorAnalysisBot: crawling %d competitor sites", len(competitor_urls))
+        texts = self.crawl_competitors(competitor_urls)
+
+        for url, text in texts.items():
             if not text:
                 logger.warning("No text extracted from %s", url)
-                continue
-            profile = self.extract_competitor_profile(url, text, our_restaurant_info["name"])
-            comparison = self.compare_competitor(our_restaurant_info, profile)
-            comparisons.append(comparison)
+        sites = [(url, text) for url, text in texts.items() if text]
+        profiles = fan_out(
+            lambda site: self.profile_competitor(site[0], site[1], our_restaurant_info["name"]),
+            sites,
+        )
+        comparisons: list[CompetitorComparison] = fan_out(
+            lambda profile: self.compare_competitor(our_restaurant_info, profile), profiles
+        )
 
         report_markdown = self.generate_report(comparisons) if comparisons else ""
 
@@ -130,8 +175,7 @@ class CompetitorAnalysisBot(BotBase):
     @staticmethod
     def _parse_competitor_profile(raw: str, url: str) -> CompetitorProfile:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             return CompetitorProfile.model_validate(data)
         except Exception as exc:
             logger.error("_parse_competitor_profile failed: %s", exc)
@@ -142,8 +186,7 @@ class CompetitorAnalysisBot(BotBase):
         raw: str, our_name: str, competitor: CompetitorProfile
     ) -> CompetitorComparison:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             return CompetitorComparison.model_validate(data)
         except Exception as exc:
             logger.error("_parse_comparison failed: %s", exc)
@@ -1,14 +1,8 @@
 """Prompt templates for the Competitor Analysis bot."""
+from common.llm.prompts import PromptTemplate
 
-EXTRACT_COMPETITOR_DATA_PROMPT = """You are a restaurant business analyst. Extract structured data from the following website content.
-
-URL: {url}
-Restaurant we're analysing for: {our_restaurant_name}
-
-Website text:
-\"\"\"
-{website_text}
-\"\"\"
+EXTRACT_COMPETITOR_DATA_PROMPT = PromptTemplate(
+    instructions="""You are a restaurant business analyst. Extract structured data from the website content under Input.
 
 Extract all available information and return a JSON object with:
 - "name": restaurant name
@@ -21,17 +15,18 @@ Extract all available information and return a JSON object with:
 - "promotions": list of current promotions or deals mentioned
 
 If information is not available, use null or empty list. Extract what you can.
-"""
-
-COMPARE_COMPETITORS_PROMPT = """You are a restaurant business strategy consultant.
+""",
+    fields=(
+        ("url", "URL"),
+        ("our_restaurant_name", "Restaurant we're analysing for"),
+        ("website_text", "Website text"),
+    ),
+)
 
-Our restaurant:
-{our_restaurant_json}
+COMPARE_COMPETITORS_PROMPT = PromptTemplate(
+    instructions="""You are a restaurant business strategy consultant.
 
-Competitor profile:
-{competitor_json}
-
-Compare them across key business dimensions. Return a JSON object with:
+Compare our restaurant with the competitor profile under Input across key business dimensions. Return a JSON object with:
 - "our_restaurant": our restaurant name
 - "competitor": the full competitor profile object (pass through as-is)
 - "comparison_axes": dict mapping dimension names to comparison text strings, covering:
@@ -42,17 +37,17 @@ Compare them across key business dimensions. Return a JSON object with:
   * "promotions": promotional strategy comparison
   * "opportunities": gaps we can exploit
 - "summary": 2-3 sentence executive summary of the comparison
-"""
-
-GENERATE_REPORT_PROMPT = """You are a restaurant marketing consultant writing an executive report.
-
-Restaurant: {restaurant_name}
-Analysis date: {analysis_date}
+""",
+    fields=(
+        ("our_restaurant_json", "Our restaurant (JSON)"),
+        ("competitor_json", "Competitor profile (JSON)"),
+    ),
+)
 
-Competitor comparisons (JSON):
-{comparisons_json}
+GENERATE_REPORT_PROMPT = PromptTemplate(
+    instructions="""You are a restaurant marketing consultant writing an executive report.
 
-Write a comprehensive competitor analysis report in Markdown format. Include:
+Write a comprehensive competitor analysis report in Markdown format from the competitor comparisons under Input. Include:
 # Competitor Analysis Report
 ## Executive Summary
 ## Market Landscape
@@ -61,4 +56,10 @@ Write a comprehensive competitor analysis report in Markdown format. Include:
 ## Recommended Actions
 
 Be specific, data-driven, and actionable. Use the data provided.
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant"),
+        ("analysis_date", "Analysis date"),
+        ("comparisons_json", "Competitor comparisons (JSON)"),
+    ),
+)
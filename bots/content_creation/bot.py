@@ -1,21 +1,29 @@
 """Content Creation bot implementation."""
 from __future__ import annotations
 
-import json
 import logging
 from datetime import datetime, timezone
 
+from pydantic import BaseModel
+
 from bots.base import BotBase
 from bots.content_creation.models import BlogPost, ContentOutput, SocialSnippet
 from bots.content_creation.prompts import BLOG_POST_PROMPT, SOCIAL_SNIPPET_PROMPT
 from common.config import get_settings
+from common.llm.batch import fan_out
 from common.llm.client import LLMClient
+from common.llm.packing import packed_completion
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
 _DEFAULT_PLATFORMS = ["facebook", "tiktok", "instagram"]
 
 
+class _SnippetResponse(BaseModel):
+    social_snippets: list[SocialSnippet]
+
+
 class ContentCreationBot(BotBase):
     name = "content_creation"
     description = "Creates blog posts and social media snippets based on SEO keyword clusters"
@@ -39,21 +47,20 @@ class ContentCreationBot(BotBase):
 
     def create_blog_post(self, keyword_cluster: dict, restaurant_info: dict) -> BlogPost:
         """Generate a full blog post for a given keyword cluster."""
-        prompt = BLOG_POST_PROMPT.format(
+        prompt = BLOG_POST_PROMPT.render(
             restaurant_name=restaurant_info.get("restaurant_name", "Our Restaurant"),
             city=restaurant_info.get("city", ""),
             neighborhood=restaurant_info.get("neighborhood", ""),
             cuisine=restaurant_info.get("cuisine", ""),
-            keyword_cluster_json=json.dumps(keyword_cluster, indent=2),
+            keyword_cluster_json=keyword_cluster,
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, BlogPost)
+            result = self._llm.structured_completion(messages, BlogPost, call_class="generate")
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_blog_post(raw)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_blog_post(exc.raw_text)
 
     def create_social_snippets(
         self,
@@ -62,26 +69,43 @@ class ContentCreationBot(BotBase):
     ) -> list[SocialSnippet]:
         """Generate platform-specific social snippets for a blog post."""
         platforms = platforms or _DEFAULT_PLATFORMS
-        settings = get_settings()
-        prompt = SOCIAL_SNIPPET_PROMPT.format(
-            blog_title=blog_post.title,
-            meta_description=blog_post.meta_description,
-            restaurant_name=settings.restaurant_name,
-            city=settings.restaurant_city,
-        )
+        prompt = SOCIAL_SNIPPET_PROMPT.render(**self._snippet_values(blog_post))
         messages = [{"role": "user", "content": prompt}]
         try:
-            from pydantic import BaseModel as PydanticBase
+            result = self._llm.structured_completion(
+                messages, _SnippetResponse, call_class="generate"
+            )
+            return result.social_snippets
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_social_snippets(exc.raw_text)
 
-            class _SnippetResponse(PydanticBase):
-                social_snippets: list[SocialSnippet]
+    def create_social_snippets_many(self, blog_posts: list[BlogPost]) -> list[list[SocialSnippet]]:
+        """Generate snippets for several blog posts, packed into as few calls as possible."""
+        if not blog_posts:
+            return []
+        results = packed_completion(
+            self._llm,
+            [
+                SOCIAL_SNIPPET_PROMPT.render_input(**self._snippet_values(post))
+                for post in blog_posts
+            ],
+            _SnippetResponse,
+            call_class="generate",
+            instructions=SOCIAL_SNIPPET_PROMPT.instructions,
+            max_tokens_per_item=800,
+        )
+        return [result.social_snippets if result else [] for result in results]
 
-            result = self._llm.structured_completion(messages, _SnippetResponse)
-            return result.social_snippets
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_social_snippets(raw)
+    @staticmethod
+    def _snippet_values(blog_post: BlogPost) -> dict:
+        settings = get_settings()
+        return {
+            "blog_title": blog_post.title,
+            "meta_description": blog_post.meta_description,
+            "restaurant_name": settings.restaurant_name,
+            "city": settings.restaurant_city,
+        }
 
     def run(self, **kwargs) -> dict:
         settings = get_settings()
@@ -102,14 +126,14 @@ class ContentCreationBot(BotBase):
                 [{"keyword": restaurant_info["cuisine"] + " restaurant " + restaurant_info["city"]}],
             )
 
-        blog_posts: list[BlogPost] = []
+        def _blog_post(cluster: dict) -> BlogPost:
+            logger.info("ContentCreationBot: creating blog post for keyword: %s", cluster.get("keyword"))
+            return self.create_blog_post(cluster, restaurant_info)
+
+        blog_posts: list[BlogPost] = fan_out(_blog_post, clusters)
         social_snippets: list[SocialSnippet] = []
 
-        for cluster in clusters:
-            logger.info("ContentCreationBot: creating blog post for keyword: %s", cluster.get("keyword"))
-            post = self.create_blog_post(cluster, restaurant_info)
-            blog_posts.append(post)
-            snippets = self.create_social_snippets(post)
+        for snippets in self.create_social_snippets_many(blog_posts):
             social_snippets.extend(snippets)
 
         output = ContentOutput(
@@ -128,8 +152,7 @@ class ContentCreationBot(BotBase):
     @staticmethod
     def _parse_blog_post(raw: str) -> BlogPost:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             return BlogPost.model_validate(data)
         except Exception as exc:
             logger.error("_parse_blog_post failed: %s", exc)
@@ -138,8 +161,7 @@ class ContentCreationBot(BotBase):
     @staticmethod
     def _parse_social_snippets(raw: str) -> list[SocialSnippet]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("social_snippets", data) if isinstance(data, dict) else data
             return [SocialSnippet.model_validate(item) for item in items]
         except Exception as exc:
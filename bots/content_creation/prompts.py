@@ -1,17 +1,10 @@
 """Prompt templates for the Content Creation bot."""
+from common.llm.prompts import PromptTemplate
 
-BLOG_POST_PROMPT = """You are a skilled food and lifestyle blogger writing for a local restaurant's website.
+BLOG_POST_PROMPT = PromptTemplate(
+    instructions="""You are a skilled food and lifestyle blogger writing for a local restaurant's website.
 
-Restaurant details:
-- Name: {restaurant_name}
-- City: {city}
-- Neighborhood: {neighborhood}
-- Cuisine: {cuisine}
-
-Target keyword cluster:
-{keyword_cluster_json}
-
-Write a compelling blog post that:
+Write a compelling blog post for the restaurant and target keyword cluster under Input that:
 1. Naturally incorporates the target keywords
 2. Provides genuine value to the reader (tips, stories, guides)
 3. Encourages readers to visit the restaurant
@@ -24,15 +17,20 @@ Return a JSON object with keys:
 - "meta_description": SEO meta description (150-160 characters)
 - "target_keywords": list of keywords used in the post
 - "word_count": integer word count of body_markdown
-"""
-
-SOCIAL_SNIPPET_PROMPT = """You are a social media manager for a local restaurant.
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("neighborhood", "Neighborhood"),
+        ("cuisine", "Cuisine"),
+        ("keyword_cluster_json", "Target keyword cluster (JSON)"),
+    ),
+)
 
-Blog post title: {blog_title}
-Blog post summary: {meta_description}
-Restaurant: {restaurant_name} in {city}
+SOCIAL_SNIPPET_PROMPT = PromptTemplate(
+    instructions="""You are a social media manager for a local restaurant.
 
-Create platform-specific social media snippets to promote this blog post.
+Create platform-specific social media snippets to promote the blog post under Input.
 
 Return a JSON object with key "social_snippets" containing a list of objects for EACH of these platforms: facebook, tiktok, instagram.
 Each object must have:
@@ -45,4 +43,11 @@ Guidelines:
 - Facebook: conversational, 100-200 chars, include a call-to-action
 - Instagram: visual storytelling, emojis welcome, 150-220 chars
 - TikTok: energetic, trendy, 100-150 chars, hook in the first line
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant"),
+        ("city", "City"),
+        ("blog_title", "Blog post title"),
+        ("meta_description", "Blog post summary"),
+    ),
+)
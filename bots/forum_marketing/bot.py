@@ -5,11 +5,15 @@ import json
 import logging
 from datetime import datetime, timezone
 
+from pydantic import BaseModel
+
 from bots.base import BotBase
 from bots.forum_marketing.models import ForumDraft, ForumDraftQueue
 from bots.forum_marketing.prompts import FORUM_DRAFT_PROMPT, SENSITIVITY_CHECK_PROMPT
 from common.config import get_settings
 from common.llm.client import LLMClient
+from common.llm.packing import packed_completion
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,10 @@ _DEFAULT_TOPICS = [
 ]
 
 
+class _FlagsResponse(BaseModel):
+    sensitivity_flags: list[str]
+
+
 class ForumMarketingBot(BotBase):
     name = "forum_marketing"
     description = "Generates human-review-required forum post drafts for community marketing"
@@ -32,7 +40,7 @@ class ForumMarketingBot(BotBase):
 
     def generate_draft(self, topic: str, platform: str, restaurant_info: dict) -> ForumDraft:
         """Generate a single forum draft."""
-        prompt = FORUM_DRAFT_PROMPT.format(
+        prompt = FORUM_DRAFT_PROMPT.render(
             restaurant_name=restaurant_info.get("restaurant_name", "Our Restaurant"),
             city=restaurant_info.get("city", ""),
             neighborhood=restaurant_info.get("neighborhood", ""),
@@ -42,25 +50,19 @@ class ForumMarketingBot(BotBase):
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, ForumDraft)
+            result = self._llm.structured_completion(messages, ForumDraft, call_class="generate")
             result.status = "pending_review"
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_draft(raw, platform, topic)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_draft(exc.raw_text, platform, topic)
 
     def check_sensitivity(self, draft: ForumDraft) -> list[str]:
         """Run a sensitivity/spam check on a draft."""
-        settings = get_settings()
-        prompt = SENSITIVITY_CHECK_PROMPT.format(
-            draft_content=draft.draft_content,
-            platform=draft.platform,
-            restaurant_name=settings.restaurant_name,
-        )
+        prompt = SENSITIVITY_CHECK_PROMPT.render(**self._sensitivity_values(draft))
         messages = [{"role": "user", "content": prompt}]
         try:
-            raw = self._llm.chat_completion(messages, temperature=0.2)
+            raw = self._llm.chat_completion(messages, temperature=0.2, call_class="classify")
             raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
             data = json.loads(raw)
             return data.get("sensitivity_flags", [])
@@ -68,6 +70,31 @@ class ForumMarketingBot(BotBase):
             logger.error("check_sensitivity failed: %s", exc)
             return []
 
+    def check_sensitivity_many(self, drafts: list[ForumDraft]) -> list[list[str]]:
+        """Run the sensitivity check on several drafts, packed into as few calls as possible."""
+        if not drafts:
+            return []
+        results = packed_completion(
+            self._llm,
+            [
+                SENSITIVITY_CHECK_PROMPT.render_input(**self._sensitivity_values(draft))
+                for draft in drafts
+            ],
+            _FlagsResponse,
+            temperature=0.2,
+            call_class="classify",
+            instructions=SENSITIVITY_CHECK_PROMPT.instructions,
+        )
+        return [result.sensitivity_flags if result else [] for result in results]
+
+    @staticmethod
+    def _sensitivity_values(draft: ForumDraft) -> dict:
+        return {
+            "draft_content": draft.draft_content,
+            "platform": draft.platform,
+            "restaurant_name": get_settings().restaurant_name,
+        }
+
     def run(self, **kwargs) -> dict:
         settings = get_settings()
         restaurant_info = {
@@ -81,11 +108,11 @@ class ForumMarketingBot(BotBase):
         drafts: list[ForumDraft] = []
         for platform, topic in topics:
             logger.info("ForumMarketingBot: generating draft for %s / %s", platform, topic)
-            draft = self.generate_draft(topic, platform, restaurant_info)
-            flags = self.check_sensitivity(draft)
+            drafts.append(self.generate_draft(topic, platform, restaurant_info))
+
+        for draft, flags in zip(drafts, self.check_sensitivity_many(drafts)):
             draft.sensitivity_flags = flags
             draft.status = "pending_review"  # always starts as pending
-            drafts.append(draft)
 
         queue = ForumDraftQueue(drafts=drafts, generated_at=datetime.now(timezone.utc))
         result = queue.model_dump(mode="json")
@@ -99,8 +126,7 @@ class ForumMarketingBot(BotBase):
     @staticmethod
     def _parse_draft(raw: str, platform: str, topic: str) -> ForumDraft:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             draft = ForumDraft.model_validate(data)
             draft.status = "pending_review"
             return draft
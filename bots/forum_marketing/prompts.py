@@ -1,17 +1,10 @@
 """Prompt templates for the Forum Marketing bot."""
+from common.llm.prompts import PromptTemplate
 
-FORUM_DRAFT_PROMPT = """You are a community manager helping a local restaurant engage authentically in online forums and community groups.
+FORUM_DRAFT_PROMPT = PromptTemplate(
+    instructions="""You are a community manager helping a local restaurant engage authentically in online forums and community groups.
 
-Restaurant details:
-- Name: {restaurant_name}
-- City: {city}
-- Neighborhood: {neighborhood}
-- Cuisine: {cuisine}
-
-Platform: {platform}
-Topic / thread context: {topic}
-
-Write a natural, helpful forum post that:
+Write a natural, helpful forum post for the platform and topic under Input that:
 1. Adds genuine value to the conversation
 2. Mentions the restaurant subtly and naturally (NOT as an advertisement)
 3. Matches the tone and norms of the platform
@@ -23,21 +16,29 @@ Return a JSON object with:
 - "draft_content": the full post text
 - "sensitivity_flags": list of any concerns (e.g. "mentions restaurant name twice", "sounds promotional")
 - "status": always "pending_review"
-"""
-
-SENSITIVITY_CHECK_PROMPT = """You are a community moderation expert. Review the following forum post draft for a local restaurant.
-
-Post:
-\"\"\"
-{draft_content}
-\"\"\"
-
-Platform: {platform}
-Restaurant name: {restaurant_name}
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("neighborhood", "Neighborhood"),
+        ("cuisine", "Cuisine"),
+        ("platform", "Platform"),
+        ("topic", "Topic / thread context"),
+    ),
+)
+
+SENSITIVITY_CHECK_PROMPT = PromptTemplate(
+    instructions="""You are a community moderation expert. Review the forum post draft for a local restaurant under Input.
 
 Identify any potential issues that could get the post flagged as spam, self-promotion, or inauthentic.
 
 Return a JSON object with key "sensitivity_flags" containing a list of strings, each describing a specific concern.
 If the post is clean, return an empty list.
 Focus on: excessive self-promotion, unnatural keyword stuffing, link spam, lack of community value, off-topic content.
-"""
+""",
+    fields=(
+        ("platform", "Platform"),
+        ("restaurant_name", "Restaurant name"),
+        ("draft_content", "Post"),
+    ),
+)
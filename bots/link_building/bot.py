@@ -1,18 +1,29 @@
 """Link Building bot implementation."""
 from __future__ import annotations
 
-import json
 import logging
+from collections.abc import Iterator
 from datetime import datetime, timezone
 
+from pydantic import BaseModel
+
 from bots.base import BotBase
 from bots.link_building.models import LinkBuildingOutput, LinkProspect, OutreachEmail
 from bots.link_building.prompts import OUTREACH_EMAIL_PROMPT, PROSPECT_DISCOVERY_PROMPT
 from common.config import get_settings
+from common.llm.batch import fan_out
 from common.llm.client import LLMClient
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
+# Outreach emails drafted per run.
+_OUTREACH_BATCH = 5
+
+
+class _ProspectResponse(BaseModel):
+    prospects: list[LinkProspect]
+
 
 class LinkBuildingBot(BotBase):
     name = "link_building"
@@ -30,32 +41,51 @@ class LinkBuildingBot(BotBase):
         cuisine: str,
     ) -> list[LinkProspect]:
         """Ask the LLM to suggest link-building prospects."""
+        messages = self._prospect_messages(keywords, city, cuisine)
+        try:
+            result = self._llm.structured_completion(
+                messages, _ProspectResponse, call_class="generate"
+            )
+            return result.prospects
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_prospects(exc.raw_text)
+
+    def stream_prospects(
+        self,
+        keywords: list[str],
+        city: str,
+        cuisine: str,
+    ) -> Iterator[LinkProspect]:
+        """Like :meth:`discover_prospects`, but yield each prospect as soon as it is generated."""
+        messages = self._prospect_messages(keywords, city, cuisine)
+        seen = 0
+        try:
+            for prospect in self._llm.stream_structured(
+                messages, _ProspectResponse, "prospects", call_class="generate"
+            ):
+                seen += 1
+                yield prospect
+        except StructuredOutputError as exc:
+            logger.debug("stream_structured failed (%s), repairing reply locally", exc)
+            yield from self._parse_prospects(exc.raw_text)[seen:]
+
+    @staticmethod
+    def _prospect_messages(keywords: list[str], city: str, cuisine: str) -> list[dict]:
         settings = get_settings()
-        prompt = PROSPECT_DISCOVERY_PROMPT.format(
+        prompt = PROSPECT_DISCOVERY_PROMPT.render(
             restaurant_name=settings.restaurant_name,
             city=city,
             cuisine=cuisine,
             keywords_list=", ".join(keywords),
         )
-        messages = [{"role": "user", "content": prompt}]
-        try:
-            from pydantic import BaseModel as PydanticBase
-
-            class _ProspectResponse(PydanticBase):
-                prospects: list[LinkProspect]
-
-            result = self._llm.structured_completion(messages, _ProspectResponse)
-            return result.prospects
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_prospects(raw)
+        return [{"role": "user", "content": prompt}]
 
     def generate_outreach_email(
         self, prospect: LinkProspect, restaurant_info: dict
     ) -> OutreachEmail:
         """Generate a tailored outreach email for a prospect."""
-        prompt = OUTREACH_EMAIL_PROMPT.format(
+        prompt = OUTREACH_EMAIL_PROMPT.render(
             restaurant_name=restaurant_info.get("restaurant_name", ""),
             city=restaurant_info.get("city", ""),
             cuisine=restaurant_info.get("cuisine", ""),
@@ -65,12 +95,11 @@ class LinkBuildingBot(BotBase):
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, OutreachEmail)
+            result = self._llm.structured_completion(messages, OutreachEmail, call_class="generate")
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_outreach_email(raw, prospect.url)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_outreach_email(exc.raw_text, prospect.url)
 
     def save_prospects_to_db(self, prospects: list[LinkProspect]) -> None:
         """Persist prospects to the database."""
@@ -101,16 +130,23 @@ class LinkBuildingBot(BotBase):
         )
 
         logger.info("LinkBuildingBot: discovering prospects")
-        prospects = self.discover_prospects(
-            keywords, restaurant_info["city"], restaurant_info["cuisine"]
+        prospects: list[LinkProspect] = []
+
+        def _outreach_targets() -> Iterator[LinkProspect]:
+            for prospect in self.stream_prospects(
+                keywords, restaurant_info["city"], restaurant_info["cuisine"]
+            ):
+                prospects.append(prospect)
+                if len(prospects) <= _OUTREACH_BATCH:
+                    logger.info("LinkBuildingBot: generating outreach for %s", prospect.url)
+                    yield prospect
+
+        # Outreach for the first prospects is drafted while the rest stream in.
+        outreach_emails: list[OutreachEmail] = fan_out(
+            lambda prospect: self.generate_outreach_email(prospect, restaurant_info),
+            _outreach_targets(),
         )
 
-        outreach_emails: list[OutreachEmail] = []
-        for prospect in prospects[:5]:  # limit initial outreach batch
-            logger.info("LinkBuildingBot: generating outreach for %s", prospect.url)
-            email = self.generate_outreach_email(prospect, restaurant_info)
-            outreach_emails.append(email)
-
         if kwargs.get("save_to_db", False):
             self.save_prospects_to_db(prospects)
 
@@ -130,8 +166,7 @@ class LinkBuildingBot(BotBase):
     @staticmethod
     def _parse_prospects(raw: str) -> list[LinkProspect]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("prospects", data) if isinstance(data, dict) else data
             return [LinkProspect.model_validate(item) for item in items]
         except Exception as exc:
@@ -141,8 +176,7 @@ class LinkBuildingBot(BotBase):
     @staticmethod
     def _parse_outreach_email(raw: str, prospect_url: str) -> OutreachEmail:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             return OutreachEmail.model_validate(data)
         except Exception as exc:
             logger.error("_parse_outreach_email failed: %s", exc)
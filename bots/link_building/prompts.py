@@ -1,14 +1,10 @@
 """Prompt templates for the Link Building bot."""
+from common.llm.prompts import PromptTemplate
 
-PROSPECT_DISCOVERY_PROMPT = """You are a link-building specialist for local businesses.
+PROSPECT_DISCOVERY_PROMPT = PromptTemplate(
+    instructions="""You are a link-building specialist for local businesses.
 
-Target business:
-- Restaurant name: {restaurant_name}
-- City: {city}
-- Cuisine: {cuisine}
-- Keywords: {keywords_list}
-
-Identify potential link-building targets that would likely link to or feature this restaurant.
+Identify potential link-building targets that would likely link to or feature the restaurant under Input.
 Think about: local food bloggers, neighbourhood guides, city tourism sites, food review sites,
 local news outlets, event listing sites, culinary schools, community directories.
 
@@ -22,21 +18,19 @@ Return a JSON object with key "prospects" containing a list of objects, each wit
 - "status": always "prospect"
 
 Return at least 8 diverse prospects.
-"""
-
-OUTREACH_EMAIL_PROMPT = """You are a professional outreach specialist writing personalised link-building emails.
-
-Restaurant:
-- Name: {restaurant_name}
-- City: {city}
-- Cuisine: {cuisine}
-- Website: {restaurant_website}
-
-Target prospect:
-- URL: {prospect_url}
-- Notes: {prospect_notes}
-
-Write a warm, personalised outreach email that:
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("cuisine", "Cuisine"),
+        ("keywords_list", "Keywords"),
+    ),
+)
+
+OUTREACH_EMAIL_PROMPT = PromptTemplate(
+    instructions="""You are a professional outreach specialist writing personalised link-building emails.
+
+Write a warm, personalised outreach email from the restaurant to the target prospect under Input that:
 1. Opens with a genuine compliment about their site/content
 2. Briefly introduces the restaurant
 3. Proposes a natural link/feature opportunity
@@ -47,4 +41,13 @@ Return a JSON object with:
 - "prospect_url": the target URL
 - "subject": email subject line (under 60 characters)
 - "body": full email body text
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("cuisine", "Cuisine"),
+        ("restaurant_website", "Restaurant website"),
+        ("prospect_url", "Prospect URL"),
+        ("prospect_notes", "Prospect notes"),
+    ),
+)
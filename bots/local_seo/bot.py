@@ -1,7 +1,6 @@
 """Local SEO bot implementation."""
 from __future__ import annotations
 
-import json
 import logging
 from datetime import datetime, timezone
 
@@ -19,6 +18,7 @@ from bots.local_seo.prompts import (
 )
 from common.config import get_settings
 from common.llm.client import LLMClient
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +51,7 @@ class LocalSeoBot(BotBase):
         cuisine: str,
     ) -> list[KeywordCluster]:
         """Ask the LLM to generate keyword clusters."""
-        prompt = KEYWORD_RESEARCH_PROMPT.format(
+        prompt = KEYWORD_RESEARCH_PROMPT.render(
             restaurant_name=restaurant_name,
             city=city,
             neighborhood=neighborhood,
@@ -64,12 +64,11 @@ class LocalSeoBot(BotBase):
             class _KwResponse(PydanticBase):
                 keyword_clusters: list[KeywordCluster]
 
-            result = self._llm.structured_completion(messages, _KwResponse)
+            result = self._llm.structured_completion(messages, _KwResponse, call_class="generate")
             return result.keyword_clusters
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back to chat", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_keyword_clusters(raw)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_keyword_clusters(exc.raw_text)
 
     def generate_seo_metas(
         self,
@@ -79,14 +78,12 @@ class LocalSeoBot(BotBase):
         """Generate title tags, meta descriptions, and H1s for each page."""
         pages = pages or _DEFAULT_PAGES
         settings = get_settings()
-        prompt = SEO_META_PROMPT.format(
+        prompt = SEO_META_PROMPT.render(
             restaurant_name=settings.restaurant_name,
             city=settings.restaurant_city,
             neighborhood=settings.restaurant_neighborhood,
             cuisine=settings.restaurant_cuisine,
-            keyword_clusters_json=json.dumps(
-                [kc.model_dump() for kc in keyword_clusters], indent=2
-            ),
+            keyword_clusters_json=[kc.model_dump() for kc in keyword_clusters],
             pages_list="\n".join(f"- {p}" for p in pages),
         )
         messages = [{"role": "user", "content": prompt}]
@@ -96,12 +93,11 @@ class LocalSeoBot(BotBase):
             class _MetaResponse(PydanticBase):
                 seo_metas: list[SeoMeta]
 
-            result = self._llm.structured_completion(messages, _MetaResponse)
+            result = self._llm.structured_completion(messages, _MetaResponse, call_class="generate")
             return result.seo_metas
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_seo_metas(raw)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_seo_metas(exc.raw_text)
 
     def generate_internal_links(
         self,
@@ -112,11 +108,11 @@ class LocalSeoBot(BotBase):
         pages = pages or _DEFAULT_PAGES
         content_map = content_map or {p: f"{p} page content" for p in pages}
         settings = get_settings()
-        prompt = INTERNAL_LINKS_PROMPT.format(
+        prompt = INTERNAL_LINKS_PROMPT.render(
             restaurant_name=settings.restaurant_name,
             cuisine=settings.restaurant_cuisine,
             city=settings.restaurant_city,
-            content_map_json=json.dumps(content_map, indent=2),
+            content_map_json=content_map,
         )
         messages = [{"role": "user", "content": prompt}]
         try:
@@ -125,12 +121,11 @@ class LocalSeoBot(BotBase):
             class _LinkResponse(PydanticBase):
                 internal_links: list[InternalLinkSuggestion]
 
-            result = self._llm.structured_completion(messages, _LinkResponse)
+            result = self._llm.structured_completion(messages, _LinkResponse, call_class="generate")
             return result.internal_links
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_internal_links(raw)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_internal_links(exc.raw_text)
 
     def run(self, **kwargs) -> dict:
         settings = get_settings()
@@ -170,8 +165,7 @@ class LocalSeoBot(BotBase):
     @staticmethod
     def _parse_keyword_clusters(raw: str) -> list[KeywordCluster]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("keyword_clusters", data) if isinstance(data, dict) else data
             return [KeywordCluster.model_validate(item) for item in items]
         except Exception as exc:
@@ -181,8 +175,7 @@ class LocalSeoBot(BotBase):
     @staticmethod
     def _parse_seo_metas(raw: str) -> list[SeoMeta]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("seo_metas", data) if isinstance(data, dict) else data
             return [SeoMeta.model_validate(item) for item in items]
         except Exception as exc:
@@ -192,8 +185,7 @@ class LocalSeoBot(BotBase):
     @staticmethod
     def _parse_internal_links(raw: str) -> list[InternalLinkSuggestion]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("internal_links", data) if isinstance(data, dict) else data
             return [InternalLinkSuggestion.model_validate(item) for item in items]
         except Exception as exc:
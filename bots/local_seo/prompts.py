@@ -1,12 +1,10 @@
 """Prompt templates for the Local SEO bot."""
+from common.llm.prompts import PromptTemplate
 
-KEYWORD_RESEARCH_PROMPT = """You are an expert local SEO consultant specialising in restaurant marketing.
+KEYWORD_RESEARCH_PROMPT = PromptTemplate(
+    instructions="""You are an expert local SEO consultant specialising in restaurant marketing.
 
-Generate a comprehensive set of keyword clusters for a restaurant with the following details:
-- Restaurant name: {restaurant_name}
-- City: {city}
-- Neighborhood: {neighborhood}
-- Cuisine type: {cuisine}
+Generate a comprehensive set of keyword clusters for the restaurant described under Input.
 
 Return a JSON object with a single key "keyword_clusters" whose value is a list of objects, each with:
 - "keyword": the primary keyword phrase
@@ -16,23 +14,21 @@ Return a JSON object with a single key "keyword_clusters" whose value is a list
 
 Focus on high-intent local search terms, cuisine-specific terms, and neighborhood/city combos.
 Return at least 8 keyword clusters covering different aspects (e.g. delivery, dine-in, cuisine type, occasion).
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("neighborhood", "Neighborhood"),
+        ("cuisine", "Cuisine type"),
+    ),
+)
 
-SEO_META_PROMPT = """You are an expert on-page SEO specialist for local businesses.
+SEO_META_PROMPT = PromptTemplate(
+    instructions="""You are an expert on-page SEO specialist for local businesses.
 
-Restaurant details:
-- Name: {restaurant_name}
-- City: {city}
-- Neighborhood: {neighborhood}
-- Cuisine: {cuisine}
+Write SEO metadata for each of the pages listed under Input, targeting the keyword clusters given there.
 
-Target keyword clusters (JSON):
-{keyword_clusters_json}
-
-Pages to optimise:
-{pages_list}
-
-For each page, return a JSON object with key "seo_metas" containing a list of objects, each with:
+Return a JSON object with key "seo_metas" containing a list of objects, one per page, each with:
 - "page_type": the page name/type
 - "title_tag": SEO-optimised title tag (50-60 characters)
 - "meta_description": compelling meta description (150-160 characters)
@@ -40,20 +36,32 @@ For each page, return a JSON object with key "seo_metas" containing a list of ob
 - "target_keywords": list of 2-4 target keywords for this page
 
 Make every title/description unique, local, and click-worthy.
-"""
-
-INTERNAL_LINKS_PROMPT = """You are an internal linking SEO expert.
-
-Restaurant: {restaurant_name} ({cuisine}, {city})
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("neighborhood", "Neighborhood"),
+        ("cuisine", "Cuisine"),
+        ("keyword_clusters_json", "Target keyword clusters (JSON)"),
+        ("pages_list", "Pages to optimise"),
+    ),
+)
 
-Available pages and their content summaries:
-{content_map_json}
+INTERNAL_LINKS_PROMPT = PromptTemplate(
+    instructions="""You are an internal linking SEO expert.
 
-Suggest internal link opportunities. Return a JSON object with key "internal_links" containing a list of objects, each with:
+Suggest internal link opportunities between the pages listed under Input. Return a JSON object with key "internal_links" containing a list of objects, each with:
 - "source_page": page where the link should be placed
 - "target_page": page the link should point to
 - "anchor_text": exact anchor text to use (keyword-rich)
 - "reason": brief explanation of why this link helps SEO
 
 Aim for at least 6 link suggestions that improve crawlability and keyword authority.
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant"),
+        ("cuisine", "Cuisine"),
+        ("city", "City"),
+        ("content_map_json", "Available pages and their content summaries (JSON)"),
+    ),
+)
@@ -19,7 +19,9 @@ from bots.orchestrator.prompts import (
     SUMMARIZE_BOT_OUTPUT_PROMPT,
 )
 from common.config import get_settings
+from common.llm.budget import PromptBudget, Section
 from common.llm.client import LLMClient
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,11 @@ _KNOWN_BOTS = [
     "chatbot",
 ]
 
+# Prompt token caps: enough for the findings that matter without paying for
+# every raw record a bot produced.
+_SUMMARIZE_TOKEN_BUDGET = 3000
+_EXECUTIVE_SUMMARY_TOKEN_BUDGET = 4000
+
 
 class OrchestratorBot(BotBase):
     name = "orchestrator"
@@ -64,18 +71,15 @@ class OrchestratorBot(BotBase):
 
     def summarize_bot_output(self, bot_name: str, output_data: dict) -> BotSummary:
         """Use LLM to extract key findings and tasks from a bot's output."""
-        # Truncate large payloads
-        output_json = json.dumps(output_data, indent=2, default=str)
-        if len(output_json) > 6000:
-            output_json = output_json[:6000] + "\n... (truncated)"
-
-        prompt = SUMMARIZE_BOT_OUTPUT_PROMPT.format(
+        # Large payloads are shrunk structurally, so the JSON stays valid
+        prompt = SUMMARIZE_BOT_OUTPUT_PROMPT.render(
+            budget=PromptBudget(max_prompt_tokens=_SUMMARIZE_TOKEN_BUDGET),
             bot_name=bot_name,
-            output_json=output_json,
+            output_json=Section(output_data),
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            result = self._llm.structured_completion(messages, BotSummary)
+            result = self._llm.structured_completion(messages, BotSummary, call_class="summarize")
             result.bot_name = bot_name
             # Set last_run from output if present
             if "generated_at" in output_data:
@@ -84,20 +88,22 @@ class OrchestratorBot(BotBase):
                 except Exception:
                     pass
             return result
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            return self._parse_bot_summary(raw, bot_name)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            return self._parse_bot_summary(exc.raw_text, bot_name)
 
     def prioritize_tasks(self, all_tasks: list[ActionableTask]) -> list[ActionableTask]:
         """Re-prioritize and deduplicate tasks across all bots."""
         if not all_tasks:
             return []
-        tasks_json = json.dumps([t.model_dump() for t in all_tasks], indent=2)
-        prompt = PRIORITIZE_TASKS_PROMPT.format(tasks_json=tasks_json)
+        prompt = PRIORITIZE_TASKS_PROMPT.render(
+            tasks_json=[t.model_dump(mode="json") for t in all_tasks]
+        )
         messages = [{"role": "user", "content": prompt}]
         try:
-            raw = self._llm.chat_completion(messages, temperature=0.3)
+            raw = self._llm.chat_completion(
+                messages, temperature=0.3, max_tokens=2000, call_class="classify"
+            )
             raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
             data = json.loads(raw)
             items = data.get("top_tasks", data) if isinstance(data, dict) else data
@@ -115,25 +121,23 @@ class OrchestratorBot(BotBase):
         top_tasks = self.prioritize_tasks(all_tasks)
 
         period = datetime.now(timezone.utc).strftime("%B %Y")
-        summaries_json = json.dumps(
-            [s.model_dump(mode="json") for s in bot_summaries], indent=2, default=str
-        )
-        # Truncate if needed
-        if len(summaries_json) > 8000:
-            summaries_json = summaries_json[:8000] + "\n... (truncated)"
+        summaries = [s.model_dump(mode="json") for s in bot_summaries]
 
         active_bots = len([s for s in bot_summaries if s.last_run])
         health_score = round(min(10.0, (active_bots / max(len(_KNOWN_BOTS), 1)) * 10), 1)
 
-        prompt = EXECUTIVE_SUMMARY_PROMPT.format(
+        prompt = EXECUTIVE_SUMMARY_PROMPT.render(
+            budget=PromptBudget(max_prompt_tokens=_EXECUTIVE_SUMMARY_TOKEN_BUDGET),
             restaurant_name=settings.restaurant_name,
             period=period,
-            summaries_json=summaries_json,
+            summaries_json=Section(summaries),
             health_score=health_score,
         )
         messages = [{"role": "user", "content": prompt}]
         try:
-            report_markdown = self._llm.chat_completion(messages, temperature=0.4, max_tokens=2000)
+            report_markdown = self._llm.chat_completion(
+                messages, temperature=0.4, max_tokens=2000, call_class="summarize"
+            )
         except Exception as exc:
             logger.error("generate_executive_summary LLM call failed: %s", exc)
             report_markdown = f"# Marketing Summary - {period}\n\n*Report generation failed.*"
@@ -174,8 +178,7 @@ class OrchestratorBot(BotBase):
     @staticmethod
     def _parse_bot_summary(raw: str, bot_name: str) -> BotSummary:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             summary = BotSummary.model_validate(data)
             summary.bot_name = bot_name
             return summary
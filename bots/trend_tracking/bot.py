@@ -1,15 +1,19 @@
 """Trend Tracking bot implementation."""
 from __future__ import annotations
 
-import json
 import logging
 from datetime import datetime, timezone
 
+from pydantic import BaseModel
+
 from bots.base import BotBase
 from bots.trend_tracking.models import TrendItem, WeeklyTrendReport
 from bots.trend_tracking.prompts import ACTIONABLE_IDEAS_PROMPT, TREND_ANALYSIS_PROMPT
 from common.config import get_settings
+from common.crawling.scraper import WebScraper
 from common.llm.client import LLMClient
+from common.llm.packing import packed_completion
+from common.llm.structured import StructuredOutputError, repair_json
 
 logger = logging.getLogger(__name__)
 
@@ -20,37 +24,40 @@ _RSS_FEEDS = [
 ]
 
 
+class _IdeasResponse(BaseModel):
+    actionable_ideas: list[str]
+
+
 class TrendTrackingBot(BotBase):
     name = "trend_tracking"
     description = "Tracks restaurant industry trends and generates weekly opportunity reports"
 
-    def __init__(self, llm: LLMClient | None = None) -> None:
+    def __init__(self, llm: LLMClient | None = None, scraper: WebScraper | None = None) -> None:
         self._llm = llm or LLMClient()
+        self._scraper = scraper or WebScraper()
 
     # ------------------------------------------------------------------
 
     def fetch_news_headlines(self, topics: list[str] | None = None) -> list[str]:
         """Fetch headlines from RSS feeds and/or news search."""
+        headlines, _ = self._fetch_headlines(topics)
+        return headlines
+
+    def _fetch_headlines(self, topics: list[str] | None) -> tuple[list[str], bool]:
+        """Return headlines and whether every feed is unchanged since its last fetch."""
         headlines: list[str] = []
-        try:
-            import httpx
-
-            for feed_url in _RSS_FEEDS:
-                try:
-                    with httpx.Client(timeout=10, follow_redirects=True) as client:
-                        resp = client.get(feed_url)
-                        resp.raise_for_status()
-                        headlines.extend(self._parse_rss_titles(resp.text))
-                except Exception as exc:
-                    logger.debug("Failed to fetch %s: %s", feed_url, exc)
-        except ImportError:
-            logger.warning("httpx not available; skipping news fetch")
+        unchanged = True
+        for feed_url in _RSS_FEEDS:
+            fetched = self._scraper.fetch_result(feed_url, timeout=10)
+            unchanged = unchanged and bool(fetched.text) and fetched.unchanged
+            if fetched.text:
+                headlines.extend(self._parse_rss_titles(fetched.text))
 
         if not headlines and topics:
             # Fallback: use topic names as placeholder headlines
             headlines = [f"Latest trends in {t}" for t in topics]
 
-        return headlines[:50]  # cap at 50 headlines
+        return headlines[:50], unchanged  # cap at 50 headlines
 
     @staticmethod
     def _parse_rss_titles(rss_xml: str) -> list[str]:
@@ -68,7 +75,7 @@ class TrendTrackingBot(BotBase):
         """Use LLM to identify relevant trends from headlines."""
         settings = get_settings()
         headlines_text = "\n".join(f"- {h}" for h in headlines) if headlines else "No headlines available."
-        prompt = TREND_ANALYSIS_PROMPT.format(
+        prompt = TREND_ANALYSIS_PROMPT.render(
             restaurant_name=restaurant_info.get("restaurant_name", settings.restaurant_name),
             city=restaurant_info.get("city", settings.restaurant_city),
             cuisine=restaurant_info.get("cuisine", settings.restaurant_cuisine),
@@ -81,41 +88,51 @@ class TrendTrackingBot(BotBase):
             class _TrendsResponse(PydanticBase):
                 trends: list[TrendItem]
 
-            result = self._llm.structured_completion(messages, _TrendsResponse)
+            result = self._llm.structured_completion(
+                messages, _TrendsResponse, call_class="extract"
+            )
             trends = result.trends
-        except Exception as exc:
-            logger.debug("structured_completion failed (%s), falling back", exc)
-            raw = self._llm.chat_completion(messages)
-            trends = self._parse_trends(raw)
+        except StructuredOutputError as exc:
+            logger.debug("structured_completion failed (%s), repairing reply locally", exc)
+            trends = self._parse_trends(exc.raw_text)
 
         # Enrich with actionable ideas
-        for trend in trends:
-            if not trend.actionable_ideas:
-                trend.actionable_ideas = self._generate_actionable_ideas(trend, restaurant_info)
+        missing = [trend for trend in trends if not trend.actionable_ideas]
+        for trend, ideas in zip(missing, self._generate_actionable_ideas(missing, restaurant_info)):
+            trend.actionable_ideas = ideas
 
         return trends
 
-    def _generate_actionable_ideas(self, trend: TrendItem, restaurant_info: dict) -> list[str]:
-        """Generate actionable ideas for a specific trend."""
+    def _generate_actionable_ideas(
+        self, trends: list[TrendItem], restaurant_info: dict
+    ) -> list[list[str]]:
+        """Generate actionable ideas for each trend, packed into as few calls as possible."""
+        if not trends:
+            return []
         settings = get_settings()
-        prompt = ACTIONABLE_IDEAS_PROMPT.format(
-            restaurant_name=restaurant_info.get("restaurant_name", settings.restaurant_name),
-            city=restaurant_info.get("city", settings.restaurant_city),
-            cuisine=restaurant_info.get("cuisine", settings.restaurant_cuisine),
-            trend_topic=trend.topic,
-            trend_summary=trend.summary,
+        prompts = [
+            ACTIONABLE_IDEAS_PROMPT.render_input(
+                restaurant_name=restaurant_info.get("restaurant_name", settings.restaurant_name),
+                city=restaurant_info.get("city", settings.restaurant_city),
+                cuisine=restaurant_info.get("cuisine", settings.restaurant_cuisine),
+                trend_topic=trend.topic,
+                trend_summary=trend.summary,
+            )
+            for trend in trends
+        ]
+        results = packed_completion(
+            self._llm,
+            prompts,
+            _IdeasResponse,
+            temperature=0.5,
+            call_class="generate",
+            instructions=ACTIONABLE_IDEAS_PROMPT.instructions,
         )
-        messages = [{"role": "user", "content": prompt}]
-        try:
-            raw = self._llm.chat_completion(messages, temperature=0.5)
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
-            return data.get("actionable_ideas", [])
-        except Exception as exc:
-            logger.error("_generate_actionable_ideas failed: %s", exc)
-            return []
+        return [result.actionable_ideas if result else [] for result in results]
 
-    def generate_weekly_report(self, trends: list[TrendItem]) -> WeeklyTrendReport:
+    def generate_weekly_report(
+        self, trends: list[TrendItem], analysis_inputs: dict | None = None
+    ) -> WeeklyTrendReport:
         """Build a WeeklyTrendReport from analysed trends."""
         top_opportunities: list[str] = []
         for trend in sorted(trends, key=lambda t: t.relevance_score, reverse=True)[:3]:
@@ -126,6 +143,7 @@ class TrendTrackingBot(BotBase):
             week_of=week_of,
             trends=trends,
             top_opportunities=top_opportunities,
+            analysis_inputs=analysis_inputs or {},
             generated_at=datetime.now(timezone.utc),
         )
 
@@ -140,14 +158,21 @@ class TrendTrackingBot(BotBase):
             "topics",
             [restaurant_info["cuisine"], "restaurant industry", "food trends", restaurant_info["city"]],
         )
+        analysis_inputs = {**restaurant_info, "topics": list(topics)}
 
         logger.info("TrendTrackingBot: fetching headlines")
-        headlines = self.fetch_news_headlines(topics)
-
-        logger.info("TrendTrackingBot: analysing %d headlines", len(headlines))
-        trends = self.analyze_trends(headlines, restaurant_info)
-
-        report = self.generate_weekly_report(trends)
+        headlines, unchanged = self._fetch_headlines(topics)
+
+        # Same feeds and inputs as last run: the previous analysis still holds.
+        previous = self.load_input(f"{self.name}/latest.json") if unchanged else {}
+        if previous.get("trends") and previous.get("analysis_inputs") == analysis_inputs:
+            logger.info("TrendTrackingBot: feeds unchanged, reusing previous trend analysis")
+            trends = [TrendItem.model_validate(item) for item in previous["trends"]]
+        else:
+            logger.info("TrendTrackingBot: analysing %d headlines", len(headlines))
+            trends = self.analyze_trends(headlines, restaurant_info)
+
+        report = self.generate_weekly_report(trends, analysis_inputs)
         result = report.model_dump(mode="json")
         self.save_output(result, "latest.json")
         return result
@@ -159,8 +184,7 @@ class TrendTrackingBot(BotBase):
     @staticmethod
     def _parse_trends(raw: str) -> list[TrendItem]:
         try:
-            raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
-            data = json.loads(raw)
+            data = repair_json(raw)
             items = data.get("trends", data) if isinstance(data, dict) else data
             return [TrendItem.model_validate(item) for item in items]
         except Exception as exc:
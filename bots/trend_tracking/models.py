@@ -18,4 +18,6 @@ class WeeklyTrendReport(BaseModel):
     week_of: str
     trends: list[TrendItem] = Field(default_factory=list)
     top_opportunities: list[str] = Field(default_factory=list)
+    # Restaurant and topics the trends were analysed for; reused only if they match.
+    analysis_inputs: dict = Field(default_factory=dict)
     generated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
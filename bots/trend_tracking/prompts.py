@@ -1,16 +1,10 @@
 """Prompt templates for the Trend Tracking bot."""
+from common.llm.prompts import PromptTemplate
 
-TREND_ANALYSIS_PROMPT = """You are a restaurant industry trend analyst.
+TREND_ANALYSIS_PROMPT = PromptTemplate(
+    instructions="""You are a restaurant industry trend analyst.
 
-Restaurant context:
-- Name: {restaurant_name}
-- City: {city}
-- Cuisine: {cuisine}
-
-Recent news headlines and summaries:
-{headlines_text}
-
-Analyse these headlines and identify the most relevant trends for this restaurant. For each trend:
+Analyse the recent news headlines under Input and identify the most relevant trends for the restaurant described there. For each trend:
 1. Determine how relevant it is to a local restaurant business
 2. Summarise the trend clearly
 
@@ -22,21 +16,28 @@ Return a JSON object with key "trends" containing a list of objects, each with:
 - "actionable_ideas": empty list (will be filled separately)
 
 Only include trends with relevance_score >= 0.5. Return at least 5 trends if available.
-"""
-
-ACTIONABLE_IDEAS_PROMPT = """You are a restaurant marketing strategist.
-
-Restaurant:
-- Name: {restaurant_name}
-- City: {city}
-- Cuisine: {cuisine}
-
-Trend:
-- Topic: {trend_topic}
-- Summary: {trend_summary}
-
-Generate 3-5 specific, actionable ideas for how this restaurant can leverage this trend.
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("cuisine", "Cuisine"),
+        ("headlines_text", "Recent news headlines and summaries"),
+    ),
+)
+
+ACTIONABLE_IDEAS_PROMPT = PromptTemplate(
+    instructions="""You are a restaurant marketing strategist.
+
+Generate 3-5 specific, actionable ideas for how the restaurant under Input can leverage the trend given there.
 Each idea should be concrete and implementable within 2-4 weeks.
 
 Return a JSON object with key "actionable_ideas" containing a list of strings.
-"""
+""",
+    fields=(
+        ("restaurant_name", "Restaurant name"),
+        ("city", "City"),
+        ("cuisine", "Cuisine"),
+        ("trend_topic", "Trend topic"),
+        ("trend_summary", "Trend summary"),
+    ),
+)
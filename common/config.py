@@ -15,6 +15,8 @@ try:
         # OpenAI
         openai_api_key: str = ""
         openai_model: str = "gpt-4o"
+        # Point at an OpenAI-compatible server, e.g. infra/fake_llm_server.py
+        openai_base_url: str = ""
 
         # SERP
         serp_api_key: str = ""
@@ -39,12 +41,122 @@ try:
         database_url: str = "sqlite:///./restaurant_bots.db"
         output_dir: str = "./outputs"
 
+        # LLM response cache (opt-in)
+        llm_cache_enabled: bool = False
+        llm_cache_path: str = "./.cache/llm_responses.db"
+        llm_cache_ttl_seconds: int = 7 * 24 * 3600
+        llm_cache_max_entries: int = 5000
+
+        # Async LLM client
+        llm_max_concurrency: int = 8
+
+        # Offline batch mode for scheduled jobs
+        llm_batch_enabled: bool = False
+        llm_batch_backend: str = "openai"  # "openai" or "local"
+        llm_batch_dir: str = "./.cache/llm_batches"
+        llm_batch_flush_seconds: float = 5.0
+        llm_batch_poll_seconds: float = 60.0
+
+        # Rate limits (0 = unlimited). Per-model overrides use
+        # "model=rpm:tpm,model=rpm:tpm"; a path shares the budget across processes.
+        llm_rpm_limit: int = 0
+        llm_tpm_limit: int = 0
+        llm_model_rate_limits: str = ""
+        llm_rate_limit_path: str = ""
+
+        # Retries and circuit breaking (deadline 0 = unbounded)
+        llm_max_attempts: int = 4
+        llm_retry_base_delay: float = 0.5
+        llm_retry_max_delay: float = 30.0
+        llm_call_deadline_seconds: float = 120.0
+        llm_breaker_failure_threshold: int = 5
+        llm_breaker_reset_seconds: float = 30.0
+
+        # Coalesce identical in-flight requests into one upstream call
+        llm_single_flight_enabled: bool = True
+
+        # Hedged requests for calls that opt in (max rate 0 = never hedge)
+        llm_hedge_percentile: float = 0.95
+        llm_hedge_max_rate: float = 0.1
+        llm_hedge_min_samples: int = 20
+
+        # Cap on prompt tokens for budgeted prompts (0 = model context window)
+        llm_prompt_token_budget: int = 12000
+
+        # Model routing per call class (empty model = OPENAI_MODEL)
+        llm_classify_model: str = "gpt-4o-mini"
+        llm_classify_max_tokens: int = 1000
+        llm_extract_model: str = ""
+        llm_extract_max_tokens: int = 2000
+        llm_generate_model: str = ""
+        llm_generate_max_tokens: int = 4000
+        llm_summarize_model: str = ""
+        llm_summarize_max_tokens: int = 2000
+
+        # Prometheus textfile for LLM metrics, rewritten after each scheduled job
+        llm_metrics_path: str = ""
+
+        # Record/replay cassette ("record", "replay" or "" for live traffic)
+        llm_cassette_mode: str = ""
+        llm_cassette_path: str = "./.cache/llm_cassette.jsonl.gz"
+        llm_cassette_latency: str = ""
+
+        # Shared HTTP connection pool for LLM traffic (HTTP/2 needs the h2 package)
+        llm_http_max_connections: int = 100
+        llm_http_max_keepalive: int = 20
+        llm_http_keepalive_expiry: float = 30.0
+        llm_http2: bool = False
+        llm_http_connect_timeout: float = 5.0
+        llm_http_read_timeout: float = 600.0
+
+        # Shared HTTP connection pool for crawling (WebScraper, RSS feeds)
+        crawl_http_max_connections: int = 50
+        crawl_http_max_keepalive: int = 20
+        crawl_http_keepalive_expiry: float = 60.0
+        crawl_http2: bool = False
+        crawl_connect_timeout: float = 10.0
+        crawl_timeout: float = 30.0
+        crawl_dns_ttl: float = 300.0
+        # AsyncWebScraper: fetches in flight overall and per host
+        crawl_max_concurrency: int = 20
+        crawl_per_host_concurrency: int = 2
+        # Conditional-GET cache for crawled pages and RSS feeds
+        crawl_cache_enabled: bool = False
+        crawl_cache_path: str = "./.cache/http_cache.db"
+        crawl_cache_max_entries: int = 10000
+        crawl_cache_max_mb: int = 200
+        # Most body bytes read per fetch (0 = no cap); the rest is never downloaded
+        crawl_max_bytes: int = 2_000_000
+        # HTML parser: "selectolax", "lxml", "html.parser" or "" for the fastest installed
+        crawl_parser: str = ""
+        # Politeness: robots.txt rules (cached for crawl_robots_ttl seconds) and
+        # at least crawl_host_delay seconds between requests to one host
+        crawl_respect_robots: bool = True
+        crawl_host_delay: float = 1.0
+        crawl_robots_ttl: float = 86400.0
+        crawl_robots_cache_path: str = "./.cache/robots.db"
+        # Reuse a page's previous LLM extraction while its text's SimHash stays
+        # within crawl_fingerprint_max_distance bits of the stored one
+        crawl_fingerprint_enabled: bool = False
+        crawl_fingerprint_path: str = "./.cache/fingerprints.db"
+        crawl_fingerprint_max_distance: int = 3
+        # Same-site crawls of competitor sites (SiteCrawler)
+        crawl_site_max_pages: int = 8
+        crawl_site_max_depth: int = 2
+        crawl_site_max_bytes: int = 3_000_000
+
         model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
 
 except ImportError:
     # Fallback: plain dataclass reading os.environ
     import dataclasses
 
+    def _env_flag(name: str, default: bool) -> bool:
+        raw = os.environ.get(name)
+        if raw is None:
+            return default
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+
     @dataclasses.dataclass
     class Settings:  # type: ignore[no-redef]
         openai_api_key: str = dataclasses.field(
@@ -53,6 +165,9 @@ except ImportError:
         openai_model: str = dataclasses.field(
             default_factory=lambda: os.environ.get("OPENAI_MODEL", "gpt-4o")
         )
+        openai_base_url: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("OPENAI_BASE_URL", "")
+        )
         serp_api_key: str = dataclasses.field(
             default_factory=lambda: os.environ.get("SERP_API_KEY", "")
         )
@@ -100,6 +215,212 @@ except ImportError:
         output_dir: str = dataclasses.field(
             default_factory=lambda: os.environ.get("OUTPUT_DIR", "./outputs")
         )
+        llm_cache_enabled: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("LLM_CACHE_ENABLED", False)
+        )
+        llm_cache_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_CACHE_PATH", "./.cache/llm_responses.db")
+        )
+        llm_cache_ttl_seconds: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+        llm_cache_max_entries: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+        )
+        llm_max_concurrency: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+        )
+        llm_batch_enabled: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("LLM_BATCH_ENABLED", False)
+        )
+        llm_batch_backend: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_BATCH_BACKEND", "openai")
+        )
+        llm_batch_dir: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_BATCH_DIR", "./.cache/llm_batches")
+        )
+        llm_batch_flush_seconds: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_BATCH_FLUSH_SECONDS", "5.0"))
+        )
+        llm_batch_poll_seconds: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_BATCH_POLL_SECONDS", "60.0"))
+        )
+        llm_rpm_limit: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_RPM_LIMIT", "0"))
+        )
+        llm_tpm_limit: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_TPM_LIMIT", "0"))
+        )
+        llm_model_rate_limits: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_MODEL_RATE_LIMITS", "")
+        )
+        llm_rate_limit_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_RATE_LIMIT_PATH", "")
+        )
+        llm_max_attempts: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_MAX_ATTEMPTS", "4"))
+        )
+        llm_retry_base_delay: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+        )
+        llm_retry_max_delay: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_RETRY_MAX_DELAY", "30.0"))
+        )
+        llm_call_deadline_seconds: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_CALL_DEADLINE_SECONDS", "120.0"))
+        )
+        llm_breaker_failure_threshold: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+        )
+        llm_breaker_reset_seconds: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30.0"))
+        )
+        llm_single_flight_enabled: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("LLM_SINGLE_FLIGHT_ENABLED", True)
+        )
+        llm_hedge_percentile: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95"))
+        )
+        llm_hedge_max_rate: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_HEDGE_MAX_RATE", "0.1"))
+        )
+        llm_hedge_min_samples: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+        )
+        llm_prompt_token_budget: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", "12000"))
+        )
+        llm_classify_model: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_CLASSIFY_MODEL", "gpt-4o-mini")
+        )
+        llm_classify_max_tokens: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_CLASSIFY_MAX_TOKENS", "1000"))
+        )
+        llm_extract_model: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_EXTRACT_MODEL", "")
+        )
+        llm_extract_max_tokens: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_EXTRACT_MAX_TOKENS", "2000"))
+        )
+        llm_generate_model: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_GENERATE_MODEL", "")
+        )
+        llm_generate_max_tokens: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_GENERATE_MAX_TOKENS", "4000"))
+        )
+        llm_summarize_model: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_SUMMARIZE_MODEL", "")
+        )
+        llm_summarize_max_tokens: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_SUMMARIZE_MAX_TOKENS", "2000"))
+        )
+        llm_metrics_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_METRICS_PATH", "")
+        )
+        llm_cassette_mode: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_CASSETTE_MODE", "")
+        )
+        llm_cassette_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get(
+                "LLM_CASSETTE_PATH", "./.cache/llm_cassette.jsonl.gz"
+            )
+        )
+        llm_cassette_latency: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("LLM_CASSETTE_LATENCY", "")
+        )
+        llm_http_max_connections: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", "100"))
+        )
+        llm_http_max_keepalive: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE", "20"))
+        )
+        llm_http_keepalive_expiry: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY", "30.0"))
+        )
+        llm_http2: bool = dataclasses.field(default_factory=lambda: _env_flag("LLM_HTTP2", False))
+        llm_http_connect_timeout: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_HTTP_CONNECT_TIMEOUT", "5.0"))
+        )
+        llm_http_read_timeout: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("LLM_HTTP_READ_TIMEOUT", "600.0"))
+        )
+        crawl_http_max_connections: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_HTTP_MAX_CONNECTIONS", "50"))
+        )
+        crawl_http_max_keepalive: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_HTTP_MAX_KEEPALIVE", "20"))
+        )
+        crawl_http_keepalive_expiry: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_HTTP_KEEPALIVE_EXPIRY", "60.0"))
+        )
+        crawl_http2: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("CRAWL_HTTP2", False)
+        )
+        crawl_connect_timeout: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_CONNECT_TIMEOUT", "10.0"))
+        )
+        crawl_timeout: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_TIMEOUT", "30.0"))
+        )
+        crawl_dns_ttl: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_DNS_TTL", "300.0"))
+        )
+        crawl_max_concurrency: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_MAX_CONCURRENCY", "20"))
+        )
+        crawl_per_host_concurrency: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_PER_HOST_CONCURRENCY", "2"))
+        )
+        crawl_cache_enabled: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("CRAWL_CACHE_ENABLED", False)
+        )
+        crawl_cache_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("CRAWL_CACHE_PATH", "./.cache/http_cache.db")
+        )
+        crawl_cache_max_entries: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_CACHE_MAX_ENTRIES", "10000"))
+        )
+        crawl_cache_max_mb: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_CACHE_MAX_MB", "200"))
+        )
+        crawl_max_bytes: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_MAX_BYTES", "2000000"))
+        )
+        crawl_parser: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("CRAWL_PARSER", "")
+        )
+        crawl_respect_robots: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("CRAWL_RESPECT_ROBOTS", True)
+        )
+        crawl_host_delay: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_HOST_DELAY", "1.0"))
+        )
+        crawl_robots_ttl: float = dataclasses.field(
+            default_factory=lambda: float(os.environ.get("CRAWL_ROBOTS_TTL", "86400"))
+        )
+        crawl_robots_cache_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get("CRAWL_ROBOTS_CACHE_PATH", "./.cache/robots.db")
+        )
+        crawl_fingerprint_enabled: bool = dataclasses.field(
+            default_factory=lambda: _env_flag("CRAWL_FINGERPRINT_ENABLED", False)
+        )
+        crawl_fingerprint_path: str = dataclasses.field(
+            default_factory=lambda: os.environ.get(
+                "CRAWL_FINGERPRINT_PATH", "./.cache/fingerprints.db"
+            )
+        )
+        crawl_fingerprint_max_distance: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_FINGERPRINT_MAX_DISTANCE", "3"))
+        )
+        crawl_site_max_pages: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_SITE_MAX_PAGES", "8"))
+        )
+        crawl_site_max_depth: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_SITE_MAX_DEPTH", "2"))
+        )
+        crawl_site_max_bytes: int = dataclasses.field(
+            default_factory=lambda: int(os.environ.get("CRAWL_SITE_MAX_BYTES", "3000000"))
+        )
 
         def __post_init__(self) -> None:
             # Load .env file if present
@@ -0,0 +1,169 @@
+"""Asynchronous web scraper that crawls many sites concurrently."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable
+from typing import Any, TypeVar
+from urllib.parse import urlparse
+
+from common.config import get_settings
+from common.crawling.http_cache import CacheEntry, FetchResult, HttpCache
+from common.crawling.scraper import WebScraper
+from common.crawling.transport import aclose_crawl_client, get_async_crawl_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncWebScraper(WebScraper):
+    """Async counterpart of WebScraper backed by ``httpx.AsyncClient``.
+
+    At most ``max_concurrency`` fetches are in flight at once, and at most
+    ``per_host_concurrency`` of them to any one host, so a slow site only
+    holds up its own pages. Each fetch is abandoned after ``timeout``
+    seconds end to end. The synchronous API is inherited unchanged.
+
+    A fetch waits out its host's crawl delay before taking a global slot,
+    so slots go to whichever hosts are ready and throughput grows with the
+    number of distinct hosts rather than stalling on the slowest-paced one.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        async_client: Any = None,
+        cache: HttpCache | None = None,
+        max_concurrency: int | None = None,
+        per_host_concurrency: int | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(client=client, cache=cache, **kwargs)
+        settings = get_settings()
+        self._async_client = async_client
+        self._max_concurrency = max(1, max_concurrency or settings.crawl_max_concurrency)
+        self._per_host_concurrency = max(
+            1, per_host_concurrency or settings.crawl_per_host_concurrency
+        )
+        self._timeout = timeout or settings.crawl_timeout
+        self._semaphore: asyncio.Semaphore | None = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_semaphores(self, url: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        # Semaphores are bound to the loop they are first used on; bots may
+        # call asyncio.run() several times over the life of one scraper.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._host_semaphores = {}
+            self._semaphore_loop = loop
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self._per_host_concurrency)
+        return self._semaphore, self._host_semaphores[host]
+
+    @property
+    def per_host_concurrency(self) -> int:
+        return self._per_host_concurrency
+
+    async def aclose(self) -> None:
+        """Close the clients this scraper was given; the shared pools stay open."""
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def afetch(self, url: str, timeout: float | None = None) -> str:
+        """Async version of :meth:`fetch`."""
+        return (await self.afetch_result(url, timeout)).text
+
+    async def afetch_result(self, url: str, timeout: float | None = None) -> FetchResult:
+        """Async version of :meth:`fetch_result`."""
+        entry = self._cache.get(url) if self._cache is not None else None
+        if entry is not None and entry.fresh:
+            return FetchResult(url, entry.body, unchanged=True, from_cache=True)
+        headers = entry.validators() if entry is not None else {}
+        client = self._async_client or get_async_crawl_client()
+        overall, per_host = self._get_semaphores(url)
+        # Take the host slot (and wait out the host's crawl delay) first so
+        # requests queued behind a slow host do not hold global slots other
+        # hosts could use.
+        async with per_host:
+            if self._politeness is not None and not await self._politeness.aacquire(url, client):
+                return FetchResult(url, "")
+            async with overall:
+                try:
+                    return await asyncio.wait_for(
+                        self._astream(client, url, headers, entry), timeout or self._timeout
+                    )
+                except TimeoutError:
+                    logger.error(
+                        "afetch(%s) timed out after %.0fs", url, timeout or self._timeout
+                    )
+                except Exception as exc:
+                    logger.error("afetch(%s) failed: %s", url, exc)
+                return FetchResult(url, "")
+
+    async def _astream(
+        self, client: Any, url: str, headers: dict[str, str], entry: CacheEntry | None
+    ) -> FetchResult:
+        async with client.stream("GET", url, headers=headers) as response:
+            if entry is not None and response.status_code == 304:
+                return self._cache.store(url, response, entry)
+            response.raise_for_status()
+            reader = self._body_reader(url, response)
+            if reader is None:
+                return FetchResult(url, "")
+            async for chunk in response.aiter_bytes():
+                if not reader.feed(chunk):
+                    break
+        return self._body_result(url, response, entry, reader)
+
+    async def acrawl(self, url: str) -> dict:
+        """Async version of :meth:`crawl`; parsing runs off the event loop."""
+        fetched = await self.afetch_result(url)
+        return await asyncio.to_thread(self._crawl_result, url, fetched.text, fetched.unchanged)
+
+    async def crawl_many(self, urls: list[str]) -> AsyncIterator[dict]:
+        """Crawl *urls* concurrently, yielding each :meth:`crawl` result as it completes.
+
+        Results arrive in completion order; use the ``"url"`` key to match
+        them up. Stopping iteration early cancels the outstanding fetches.
+        """
+        tasks = [asyncio.ensure_future(self.acrawl(url)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def crawl_all(self, urls: list[str]) -> dict[str, dict]:
+        """Synchronous entry point for bots: crawl *urls* on a fresh event loop.
+
+        Returns ``{url: crawl result}`` in the order the URLs were given.
+        """
+        return self.run(self._crawl_all(urls))
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run *coro* on a fresh event loop, then close that loop's pooled client."""
+        return asyncio.run(self._run(coro))
+
+    # ------------------------------------------------------------------
+
+    async def _run(self, coro: Awaitable[T]) -> T:
+        try:
+            return await coro
+        finally:
+            if self._async_client is None:
+                await aclose_crawl_client()
+
+    async def _crawl_all(self, urls: list[str]) -> dict[str, dict]:
+        results = {result["url"]: result async for result in self.crawl_many(urls)}
+        return {url: results[url] for url in dict.fromkeys(urls)}
@@ -0,0 +1,227 @@
+"""Parse-once HTML documents with pluggable parser backends."""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+from typing import Any
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text is never page content.
+_SKIP_TAGS = ("script", "style", "noscript", "head")
+
+
+class _SoupBackend:
+    """BeautifulSoup with a named tree builder ("html.parser" needs nothing extra)."""
+
+    def __init__(self, features: str) -> None:
+        self.features = features
+
+    def parse(self, html: str) -> Any:
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(html, self.features)
+
+    def text_nodes(self, tree: Any) -> list[str]:
+        from bs4 import CData, NavigableString, Tag
+
+        # Walks the tree instead of decomposing skipped tags, which would
+        # destroy the <head> metadata other accessors read.
+        strings: list[str] = []
+        stack = [iter(tree.children)]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+            elif isinstance(node, Tag):
+                if node.name not in _SKIP_TAGS:
+                    stack.append(iter(node.children))
+            elif type(node) in (NavigableString, CData):
+                strings.append(str(node))
+        return strings
+
+    def hrefs(self, tree: Any) -> list[str]:
+        return [anchor["href"] for anchor in tree.find_all("a", href=True)]
+
+    def title(self, tree: Any) -> str:
+        return tree.title.get_text() if tree.title else ""
+
+    def meta(self, tree: Any) -> list[tuple[str | None, str | None]]:
+        return [
+            (tag.get("name") or tag.get("property"), tag.get("content"))
+            for tag in tree.find_all("meta")
+        ]
+
+    def json_ld(self, tree: Any) -> list[str]:
+        return [
+            tag.get_text() for tag in tree.find_all("script", type="application/ld+json")
+        ]
+
+
+class _LxmlBackend:
+    """lxml's libxml2 HTML parser, queried with XPath."""
+
+    def parse(self, html: str) -> Any:
+        import lxml.html
+
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # Unicode input with an XML encoding declaration; let lxml decode it.
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+
+    def text_nodes(self, tree: Any) -> list[str]:
+        skipped = " or ".join(f"ancestor::{tag}" for tag in _SKIP_TAGS)
+        return tree.xpath(f"//text()[not({skipped})]")
+
+    def hrefs(self, tree: Any) -> list[str]:
+        return tree.xpath("//a/@href")
+
+    def title(self, tree: Any) -> str:
+        return "".join(tree.xpath("(//title)[1]//text()"))
+
+    def meta(self, tree: Any) -> list[tuple[str | None, str | None]]:
+        return [
+            (tag.get("name") or tag.get("property"), tag.get("content"))
+            for tag in tree.xpath("//meta")
+        ]
+
+    def json_ld(self, tree: Any) -> list[str]:
+        return [tag.text_content() for tag in tree.xpath('//script[@type="application/ld+json"]')]
+
+
+class _SelectolaxBackend:
+    """selectolax's Lexbor engine: C parsing and CSS selectors."""
+
+    def parse(self, html: str) -> Any:
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborHTMLParser(html)
+
+    def text_nodes(self, tree: Any) -> list[str]:
+        # strip_tags mutates, so work on a copy of the tree rather than reparsing.
+        content = tree.clone()
+        content.strip_tags(list(_SKIP_TAGS))
+        return [content.root.text(separator=" ")] if content.root is not None else []
+
+    def hrefs(self, tree: Any) -> list[str]:
+        return [node.attributes["href"] for node in tree.css("a[href]")]
+
+    def title(self, tree: Any) -> str:
+        node = tree.css_first("title")
+        return node.text() if node is not None else ""
+
+    def meta(self, tree: Any) -> list[tuple[str | None, str | None]]:
+        return [
+            (node.attributes.get("name") or node.attributes.get("property"),
+             node.attributes.get("content"))
+            for node in tree.css("meta")
+        ]
+
+    def json_ld(self, tree: Any) -> list[str]:
+        return [node.text() for node in tree.css('script[type="application/ld+json"]')]
+
+
+# Fastest first; "auto" picks the first one whose package is installed.
+_BACKENDS: dict[str, tuple[str, Any]] = {
+    "selectolax": ("selectolax", _SelectolaxBackend),
+    "lxml": ("lxml", _LxmlBackend),
+    "html.parser": ("bs4", lambda: _SoupBackend("html.parser")),
+}
+
+
+@functools.cache
+def available_backends() -> tuple[str, ...]:
+    """Names of the parser backends whose packages are installed, fastest first."""
+    import importlib.util
+
+    return tuple(
+        name for name, (module, _) in _BACKENDS.items() if importlib.util.find_spec(module)
+    )
+
+
+@functools.cache
+def get_backend(name: str = "") -> Any:
+    """Return the backend called *name*; "" or "auto" picks the fastest installed one."""
+    if name in ("", "auto"):
+        name = available_backends()[0]
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend {name!r}; choose from {list(_BACKENDS)}")
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend {name!r} needs the {_BACKENDS[name][0]} package")
+    return _BACKENDS[name][1]()
+
+
+class ParsedDocument:
+    """An HTML page parsed once, with text, links and metadata computed on demand.
+
+    Every accessor reads the same tree, so a caller that needs text and
+    links pays for one parse. A page that fails to parse behaves as empty.
+    """
+
+    def __init__(self, html: str, base_url: str = "", backend: str = "") -> None:
+        self.html = html
+        self.base_url = base_url
+        self._backend = get_backend(backend)
+
+    @functools.cached_property
+    def _tree(self) -> Any:
+        if not self.html:
+            return None
+        try:
+            return self._backend.parse(self.html)
+        except Exception as exc:
+            logger.error("Parsing %s failed: %s", self.base_url or "HTML", exc)
+            return None
+
+    @functools.cached_property
+    def text(self) -> str:
+        """Whitespace-normalised visible text, without scripts, styles or <head>."""
+        if self._tree is None:
+            return ""
+        return " ".join(" ".join(self._backend.text_nodes(self._tree)).split())
+
+    @functools.cached_property
+    def links(self) -> list[str]:
+        """Absolute http(s) link targets, deduplicated in document order."""
+        if self._tree is None:
+            return []
+        links: list[str] = []
+        for href in self._backend.hrefs(self._tree):
+            if self.base_url:
+                href = urljoin(self.base_url, href)
+            if urlparse(href).scheme in ("http", "https"):
+                links.append(href)
+        return list(dict.fromkeys(links))
+
+    @functools.cached_property
+    def title(self) -> str:
+        if self._tree is None:
+            return ""
+        return " ".join(self._backend.title(self._tree).split())
+
+    @functools.cached_property
+    def meta(self) -> dict[str, str]:
+        """``<meta>`` content by name or property (description, og:title, ...)."""
+        if self._tree is None:
+            return {}
+        return {
+            key.lower(): content
+            for key, content in self._backend.meta(self._tree)
+            if key and content is not None
+        }
+
+    @functools.cached_property
+    def structured_data(self) -> list[Any]:
+        """Parsed JSON-LD blocks (schema.org Restaurant, Menu, ...); invalid ones are skipped."""
+        if self._tree is None:
+            return []
+        blocks: list[Any] = []
+        for raw in self._backend.json_ld(self._tree):
+            try:
+                blocks.append(json.loads(raw))
+            except ValueError:
+                logger.debug("Skipping invalid JSON-LD on %s", self.base_url or "page")
+        return blocks
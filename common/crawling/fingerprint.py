@@ -0,0 +1,152 @@
+"""SimHash fingerprints of page text, to spot pages that have not materially changed."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_BITS = 64
+_SHINGLE_WORDS = 3
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_fingerprints (
+    key TEXT PRIMARY KEY,
+    simhash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over overlapping three-word shingles of *text*.
+
+    Texts that share most of their shingles get fingerprints a few bits
+    apart, so a rotated banner or a new date moves it little while a new
+    menu section moves it a lot.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = [
+        " ".join(words[i : i + _SHINGLE_WORDS])
+        for i in range(max(1, len(words) - _SHINGLE_WORDS + 1))
+    ]
+    weights = [0] * _BITS
+    for shingle in shingles:
+        digest = int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(_BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class FingerprintStore:
+    """SimHash of the text a structured result was extracted from, per key.
+
+    The key must cover everything else the extraction depended on (the URL
+    and any other prompt inputs). :meth:`reusable` returns the stored result
+    when the new text is within *max_distance* bits of the stored
+    fingerprint, i.e. the page is materially unchanged and its LLM
+    extraction can be skipped. Safe to share between threads.
+    """
+
+    def __init__(self, path: str | Path, max_distance: int = 3) -> None:
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.reused = 0
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def reusable(self, key: str, text: str) -> Any | None:
+        """The result stored for *key* if *text* is a near-duplicate of its source, else None."""
+        with self._lock:
+            self.checks += 1
+            row = self._conn.execute(
+                "SELECT simhash, result FROM page_fingerprints WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or not text:
+            return None
+        distance = hamming_distance(int(row[0], 16), simhash(text))
+        if distance > self.max_distance:
+            logger.debug("%s changed (%d bits); extracting again", key, distance)
+            return None
+        with self._lock:
+            self.reused += 1
+        logger.debug("%s materially unchanged (%d bits); reusing stored result", key, distance)
+        return json.loads(row[1])
+
+    def store(self, key: str, text: str, result: Any) -> None:
+        """Remember *result* (JSON-serialisable) as extracted from *text*."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_fingerprints (key, simhash, result, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, format(simhash(text), "016x"), json.dumps(result), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM page_fingerprints")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"checks": self.checks, "reused": self.reused}
+
+    def to_prometheus(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, key, help_text in (
+            ("crawl_fingerprint_checks_total", "checks", "Near-duplicate checks of crawled pages."),
+            ("crawl_fingerprint_reused_total", "reused", "Extractions skipped as near-duplicates."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {stats[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+_SHARED_STORES: dict[str, FingerprintStore] = {}
+_SHARED_STORES_LOCK = threading.Lock()
+
+
+def get_fingerprint_store() -> FingerprintStore | None:
+    """Return the process-wide FingerprintStore from settings, or None when disabled."""
+    from common.config import get_settings
+
+    settings = get_settings()
+    if not settings.crawl_fingerprint_enabled:
+        return None
+    with _SHARED_STORES_LOCK:
+        store = _SHARED_STORES.get(settings.crawl_fingerprint_path)
+        if store is None:
+            store = FingerprintStore(
+                settings.crawl_fingerprint_path,
+                max_distance=settings.crawl_fingerprint_max_distance,
+            )
+            _SHARED_STORES[settings.crawl_fingerprint_path] = store
+        return store
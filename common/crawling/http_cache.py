@@ -0,0 +1,310 @@
+"""Persistent HTTP cache with conditional revalidation for crawled pages and feeds."""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS http_responses (
+    url TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """A stored response body and the validators needed to revalidate it."""
+
+    url: str
+    body: str
+    body_hash: str
+    etag: str | None = None
+    last_modified: str | None = None
+    expires_at: float | None = None
+
+    @property
+    def fresh(self) -> bool:
+        """True while Cache-Control/Expires allow serving without asking the server."""
+        return self.expires_at is not None and self.expires_at > time.time()
+
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclasses.dataclass(frozen=True)
+class FetchResult:
+    """A fetched body, and whether it is the same as the last time it was fetched.
+
+    ``unchanged`` is set for fresh cache hits, 304 replies and 200 replies
+    whose body hashes the same as the stored one; callers can skip
+    re-processing such content. ``from_cache`` means no body was downloaded;
+    ``truncated`` that the body was cut off at the fetch size cap.
+    """
+
+    url: str
+    text: str
+    unchanged: bool = False
+    from_cache: bool = False
+    truncated: bool = False
+
+
+def _body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _expires_at(headers: Any, now: float) -> float | None:
+    """Absolute expiry time from Cache-Control max-age or Expires, if any."""
+    directives = {}
+    for part in (headers.get("cache-control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-cache" in directives or "no-store" in directives:
+        return None
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return now + int(directives[name]) - int(headers.get("age") or 0)
+            except ValueError:
+                return None
+    if headers.get("expires"):
+        try:
+            return parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class HttpCache:
+    """SQLite-backed store of response bodies keyed by URL, with LRU/size eviction.
+
+    Use :meth:`get` before a request: serve a :attr:`CacheEntry.fresh` entry
+    directly, otherwise send its :meth:`CacheEntry.validators`. Hand the
+    response to :meth:`store`, which turns a 304 into the stored body. Safe
+    to share between threads.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int | None = 10000,
+        max_bytes: int | None = 200 * 1024 * 1024,
+    ) -> None:
+        self._path = Path(path)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.unchanged = 0
+        self.evictions = 0
+        if str(path) != ":memory:":
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+
+    def get(self, url: str) -> CacheEntry | None:
+        """Return the stored entry for *url*, counting a fresh hit if it can be served as is."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, body_hash, etag, last_modified, expires_at "
+                "FROM http_responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE http_responses SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+        entry = CacheEntry(url, *row)
+        if entry.fresh:
+            with self._lock:
+                self.fresh_hits += 1
+                self.unchanged += 1
+        return entry
+
+    def store(
+        self,
+        url: str,
+        response: Any,
+        entry: CacheEntry | None = None,
+        text: str | None = None,
+    ) -> FetchResult:
+        """Record *response* (to a request for *url*) and return the body to use.
+
+        *entry* is what :meth:`get` returned before the request. A 304 reply
+        refreshes its expiry and returns its body; a 200 replaces it. Pass
+        *text* when the body was read from a stream rather than ``response.text``.
+        """
+        now = time.time()
+        headers = response.headers
+        expires_at = _expires_at(headers, now)
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+                self.unchanged += 1
+                self._conn.execute(
+                    "UPDATE http_responses SET expires_at = ?, fetched_at = ?, accessed_at = ?, "
+                    "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                    "WHERE url = ?",
+                    (expires_at, now, now, headers.get("etag"), headers.get("last-modified"), url),
+                )
+                self._conn.commit()
+            return FetchResult(url, entry.body, unchanged=True, from_cache=True)
+
+        text = response.text if text is None else text
+        body_hash = _body_hash(text)
+        unchanged = entry is not None and entry.body_hash == body_hash
+        no_store = "no-store" in (headers.get("cache-control") or "").lower()
+        with self._lock:
+            self.misses += 1
+            self.unchanged += unchanged
+            if no_store:
+                self._conn.execute("DELETE FROM http_responses WHERE url = ?", (url,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO http_responses (url, body, body_hash, etag, "
+                    "last_modified, expires_at, size, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        url,
+                        text,
+                        body_hash,
+                        headers.get("etag"),
+                        headers.get("last-modified"),
+                        expires_at,
+                        len(text.encode("utf-8")),
+                        now,
+                        now,
+                    ),
+                )
+                self._evict()
+            self._conn.commit()
+        return FetchResult(url, text, unchanged=unchanged)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM http_responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/revalidation counters and current occupancy."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_responses"
+            ).fetchone()
+        requests = self.fresh_hits + self.revalidated + self.misses
+        served = self.fresh_hits + self.revalidated
+        return {
+            "fresh_hits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "unchanged": self.unchanged,
+            "hit_rate": round(served / requests, 4) if requests else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def to_prometheus(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, key, help_text in (
+            ("crawl_cache_fresh_hits_total", "fresh_hits", "Pages served without a request."),
+            ("crawl_cache_revalidated_total", "revalidated", "304 Not Modified replies."),
+            ("crawl_cache_misses_total", "misses", "Pages downloaded in full."),
+            ("crawl_cache_unchanged_total", "unchanged", "Fetches whose content had not changed."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {stats[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    # ------------------------------------------------------------------
+
+    def _evict(self) -> None:
+        """Drop least-recently-used rows until within the entry and byte budgets."""
+        if self._max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM http_responses").fetchone()
+            if count > self._max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM http_responses WHERE url IN ("
+                    "SELECT url FROM http_responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self._max_entries,),
+                )
+                self.evictions += max(cursor.rowcount, 0)
+
+        if self._max_bytes is not None:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM http_responses"
+            ).fetchone()
+            if total > self._max_bytes:
+                rows = self._conn.execute(
+                    "SELECT url, size FROM http_responses ORDER BY accessed_at ASC"
+                ).fetchall()
+                doomed: list[str] = []
+                for url, size in rows:
+                    if total <= self._max_bytes:
+                        break
+                    doomed.append(url)
+                    total -= size
+                self._conn.executemany(
+                    "DELETE FROM http_responses WHERE url = ?", [(u,) for u in doomed]
+                )
+                self.evictions += len(doomed)
+
+
+_SHARED_CACHES: dict[str, HttpCache] = {}
+_SHARED_CACHES_LOCK = threading.Lock()
+
+
+def get_http_cache() -> HttpCache | None:
+    """Return the process-wide HttpCache from settings, or None when disabled."""
+    from common.config import get_settings
+
+    settings = get_settings()
+    if not settings.crawl_cache_enabled:
+        return None
+    with _SHARED_CACHES_LOCK:
+        cache = _SHARED_CACHES.get(settings.crawl_cache_path)
+        if cache is None:
+            cache = HttpCache(
+                settings.crawl_cache_path,
+                max_entries=settings.crawl_cache_max_entries,
+                max_bytes=settings.crawl_cache_max_mb * 1024 * 1024,
+            )
+            _SHARED_CACHES[settings.crawl_cache_path] = cache
+        return cache
@@ -0,0 +1,342 @@
+"""Crawl politeness: cached robots.txt rules and per-host request pacing."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from common.crawling.streaming import BodyReader
+from common.llm.rate_limit import TokenBucket
+from common.llm.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# The product token sites address in robots.txt (see transport.HEADERS).
+USER_AGENT = "RestaurantBot"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS robots_txt (
+    origin TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+# Google reads at most 500 KiB of robots.txt; so do we.
+_MAX_ROBOTS_BYTES = 500 * 1024
+# A server error may be transient: retry sooner than the normal TTL.
+_ERROR_TTL = 600.0
+# A Crawl-delay above this is treated as this, or a site could stall a run.
+_MAX_CRAWL_DELAY = 30.0
+
+
+class RobotsRules:
+    """Parsed robots.txt of one origin.
+
+    4xx answers allow everything; server and network errors disallow
+    everything until the entry expires, as crawlers conventionally do.
+    """
+
+    def __init__(self, status: int, body: str = "") -> None:
+        self.status = status
+        self._parser = RobotFileParser()
+        if 200 <= status < 300:
+            self._parser.parse(body.splitlines())
+        elif 400 <= status < 500:
+            self._parser.allow_all = True
+        else:
+            self._parser.disallow_all = True
+
+    def allowed(self, url: str, user_agent: str = USER_AGENT) -> bool:
+        return self._parser.can_fetch(user_agent, url)
+
+    def crawl_delay(self, user_agent: str = USER_AGENT) -> float:
+        delay = self._parser.crawl_delay(user_agent)
+        if delay is None:
+            rate = self._parser.request_rate(user_agent)
+            delay = rate.seconds / rate.requests if rate and rate.requests else 0
+        return min(float(delay or 0), _MAX_CRAWL_DELAY)
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+class RobotsCache:
+    """robots.txt rules per origin, kept in memory and (optionally) in SQLite.
+
+    Entries live for *ttl* seconds; the SQLite file at *path* lets later
+    runs and other processes skip the fetch. Concurrent lookups of one
+    origin share a single request.
+    """
+
+    def __init__(self, path: str | Path | None = None, ttl: float = 86400.0) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory: dict[str, tuple[RobotsRules, float]] = {}
+        self._flight = SingleFlight()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fetches = 0
+        self._path = Path(path) if path else None
+        self._conn: sqlite3.Connection | None = None
+
+    def rules(self, url: str, client: Any) -> RobotsRules:
+        """Rules for *url*'s origin, fetched with the httpx *client* if not cached."""
+        origin = _origin(url)
+        rules = self._lookup(origin)
+        if rules is None:
+            rules, _ = self._flight.do(origin, lambda: self._fetch(origin, client))
+        return rules
+
+    async def arules(self, url: str, client: Any) -> RobotsRules:
+        """Async version of :meth:`rules`, taking an ``httpx.AsyncClient``."""
+        origin = _origin(url)
+        rules = self._lookup(origin)
+        if rules is None:
+            rules, _ = await self._flight.ado(origin, lambda: self._afetch(origin, client))
+        return rules
+
+    def store(self, origin: str, status: int, body: str = "") -> RobotsRules:
+        ttl = min(_ERROR_TTL, self.ttl) if status >= 500 or status == 0 else self.ttl
+        expires_at = time.time() + ttl
+        rules = RobotsRules(status, body)
+        with self._lock:
+            self._memory[origin] = (rules, expires_at)
+            conn = self._db()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO robots_txt (origin, status, body, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (origin, status, body, expires_at),
+                )
+                conn.commit()
+        return rules
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                conn.execute("DELETE FROM robots_txt")
+                conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "fetches": self.fetches,
+                "origins": len(self._memory),
+            }
+
+    # ------------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection | None:
+        # Opened on first use, so scrapers that never fetch leave no file behind.
+        if self._conn is None and self._path is not None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, origin: str) -> RobotsRules | None:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(origin)
+            if cached is not None and cached[1] > now:
+                self.memory_hits += 1
+                return cached[0]
+            conn = self._db()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT status, body, expires_at FROM robots_txt WHERE origin = ?", (origin,)
+            ).fetchone()
+            if row is None or row[2] <= now:
+                return None
+            rules = RobotsRules(row[0], row[1])
+            self._memory[origin] = (rules, row[2])
+            self.disk_hits += 1
+            return rules
+
+    def _fetch(self, origin: str, client: Any) -> RobotsRules:
+        with self._lock:
+            self.fetches += 1
+        try:
+            with client.stream("GET", f"{origin}/robots.txt") as response:
+                reader = BodyReader(response.headers.get("content-type"), _MAX_ROBOTS_BYTES)
+                for chunk in response.iter_bytes():
+                    if not reader.feed(chunk):
+                        break
+            status, body = response.status_code, reader.text()
+        except Exception as exc:
+            logger.warning("robots.txt for %s unavailable: %s", origin, exc)
+            status, body = 0, ""
+        return self.store(origin, status, body)
+
+    async def _afetch(self, origin: str, client: Any) -> RobotsRules:
+        with self._lock:
+            self.fetches += 1
+        try:
+            async with client.stream("GET", f"{origin}/robots.txt") as response:
+                reader = BodyReader(response.headers.get("content-type"), _MAX_ROBOTS_BYTES)
+                async for chunk in response.aiter_bytes():
+                    if not reader.feed(chunk):
+                        break
+            status, body = response.status_code, reader.text()
+        except Exception as exc:
+            logger.warning("robots.txt for %s unavailable: %s", origin, exc)
+            status, body = 0, ""
+        return self.store(origin, status, body)
+
+
+class HostThrottle:
+    """One token bucket per host, refilling one request per crawl delay.
+
+    Reservations never block: :meth:`reserve` returns how long the caller
+    must wait, so requests to other hosts can go ahead in the meantime.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self, host: str, delay: float) -> float:
+        if delay <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(60.0 / delay, capacity=1.0)
+                self._buckets[host] = bucket
+            # robots.txt may raise the delay after the bucket was made.
+            bucket.rate = 1.0 / delay
+            wait = bucket.reserve(1)
+            if wait > 0:
+                self.waits += 1
+                self.wait_seconds += wait
+        return wait
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hosts": len(self._buckets),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+
+class Politeness:
+    """Decides whether a URL may be fetched and paces requests per host.
+
+    The delay for a host is the larger of *delay* and its robots.txt
+    Crawl-delay. With *respect_robots* off only the pacing applies.
+    """
+
+    def __init__(
+        self,
+        robots: RobotsCache | None = None,
+        throttle: HostThrottle | None = None,
+        delay: float = 1.0,
+        respect_robots: bool = True,
+    ) -> None:
+        self.robots = robots or RobotsCache()
+        self.throttle = throttle or HostThrottle()
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self.disallowed = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str, client: Any) -> bool:
+        """Wait for *url*'s host to be ready; False if robots.txt disallows it."""
+        rules = self.robots.rules(url, client) if self.respect_robots else None
+        wait = self._reserve(url, rules)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def aacquire(self, url: str, client: Any) -> bool:
+        """Async version of :meth:`acquire`."""
+        rules = await self.robots.arules(url, client) if self.respect_robots else None
+        wait = self._reserve(url, rules)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.robots.stats(), **self.throttle.stats(), "disallowed": self.disallowed}
+
+    def to_prometheus(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, key, help_text in (
+            ("crawl_robots_fetches_total", "fetches", "robots.txt files downloaded."),
+            ("crawl_robots_disallowed_total", "disallowed", "URLs skipped because of robots.txt."),
+            ("crawl_host_waits_total", "waits", "Requests delayed for per-host pacing."),
+            ("crawl_host_wait_seconds_total", "wait_seconds", "Seconds spent on per-host pacing."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {stats[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def _reserve(self, url: str, rules: RobotsRules | None) -> float | None:
+        if rules is not None and not rules.allowed(url):
+            logger.info("Skipping %s: disallowed by robots.txt", url)
+            with self._lock:
+                self.disallowed += 1
+            return None
+        delay = max(self.delay, rules.crawl_delay() if rules is not None else 0.0)
+        return self.throttle.reserve(urlparse(url).netloc.lower(), delay)
+
+
+_SHARED_POLITENESS: dict[tuple, Politeness] = {}
+_SHARED_THROTTLE = HostThrottle()
+_SHARED_POLITENESS_LOCK = threading.Lock()
+
+
+def get_politeness() -> Politeness | None:
+    """Return the process-wide Politeness from settings, or None when disabled.
+
+    Every scraper shares one set of host buckets, so pacing holds across
+    bots crawling the same site.
+    """
+    from common.config import get_settings
+
+    settings = get_settings()
+    if not settings.crawl_respect_robots and settings.crawl_host_delay <= 0:
+        return None
+    key = (
+        settings.crawl_robots_cache_path,
+        settings.crawl_robots_ttl,
+        settings.crawl_host_delay,
+        settings.crawl_respect_robots,
+    )
+    with _SHARED_POLITENESS_LOCK:
+        politeness = _SHARED_POLITENESS.get(key)
+        if politeness is None:
+            politeness = Politeness(
+                RobotsCache(settings.crawl_robots_cache_path, ttl=settings.crawl_robots_ttl),
+                _SHARED_THROTTLE,
+                delay=settings.crawl_host_delay,
+                respect_robots=settings.crawl_respect_robots,
+            )
+            _SHARED_POLITENESS[key] = politeness
+        return politeness
@@ -1,74 +1,164 @@
 """Web scraping utilities."""
 from __future__ import annotations
 
+import dataclasses
 import logging
-from urllib.parse import urljoin, urlparse
+from types import TracebackType
+from typing import Any, Self
 
-logger = logging.getLogger(__name__)
+from common.config import get_settings
+from common.crawling.document import ParsedDocument
+from common.crawling.http_cache import CacheEntry, FetchResult, HttpCache, get_http_cache
+from common.crawling.politeness import Politeness, get_politeness
+from common.crawling.streaming import (
+    TEXT_CONTENT_TYPES,
+    BodyReader,
+    body_stats,
+    content_type_allowed,
+)
+from common.crawling.transport import get_crawl_client
 
-_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (compatible; RestaurantBot/1.0; +https://github.com/restaurant-bots)"
-    )
-}
+logger = logging.getLogger(__name__)
 
 
 class WebScraper:
-    """Simple synchronous web scraper backed by httpx + BeautifulSoup."""
+    """Simple synchronous web scraper backed by httpx + BeautifulSoup.
+
+    Requests go through the process-wide pooled client (see
+    :func:`~common.crawling.transport.get_crawl_client`), so connections,
+    TLS sessions and DNS answers are reused across scrapers and bot runs.
+    Pass *client* to use a private ``httpx.Client`` instead; :meth:`close`
+    only ever closes a client the scraper was given.
+
+    With an :class:`~common.crawling.http_cache.HttpCache` (by default the
+    shared one when ``CRAWL_CACHE_ENABLED``), fetches are conditional and
+    report whether the content changed since the previous fetch.
+
+    Bodies are streamed: responses whose type is not in *content_types* are
+    dropped after their headers, and at most *max_bytes* (``CRAWL_MAX_BYTES``,
+    0 for no cap) of a body is read and decoded.
+
+    Pages are parsed once into a :class:`~common.crawling.document.ParsedDocument`
+    with the *parser* backend (``CRAWL_PARSER``; the fastest installed by default).
 
-    def fetch(self, url: str) -> str:
+    With a :class:`~common.crawling.politeness.Politeness` (by default the
+    shared one from settings), URLs disallowed by robots.txt come back empty
+    and requests to one host are spaced by its crawl delay.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        cache: HttpCache | None = None,
+        parser: str | None = None,
+        max_bytes: int | None = None,
+        content_types: tuple[str, ...] = TEXT_CONTENT_TYPES,
+        politeness: Politeness | None = None,
+    ) -> None:
+        settings = get_settings()
+        self._client = client
+        self._cache = cache if cache is not None else get_http_cache()
+        self._politeness = politeness if politeness is not None else get_politeness()
+        self._parser = parser if parser is not None else settings.crawl_parser
+        max_bytes = settings.crawl_max_bytes if max_bytes is None else max_bytes
+        self._max_bytes = max_bytes or None
+        self._content_types = content_types
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+
+    def fetch(self, url: str, timeout: float | None = None) -> str:
         """Fetch URL and return raw HTML string."""
-        try:
-            import httpx
+        return self.fetch_result(url, timeout).text
 
-            with httpx.Client(follow_redirects=True, timeout=30, headers=_HEADERS) as client:
-                response = client.get(url)
+    def fetch_result(self, url: str, timeout: float | None = None) -> FetchResult:
+        """Like :meth:`fetch`, also reporting whether the content is unchanged."""
+        try:
+            entry = self._cache.get(url) if self._cache is not None else None
+            if entry is not None and entry.fresh:
+                return FetchResult(url, entry.body, unchanged=True, from_cache=True)
+            client = self._client or get_crawl_client()
+            if self._politeness is not None and not self._politeness.acquire(url, client):
+                return FetchResult(url, "")
+            kwargs: dict[str, Any] = {"timeout": timeout} if timeout is not None else {}
+            if entry is not None:
+                kwargs["headers"] = entry.validators()
+            with client.stream("GET", url, **kwargs) as response:
+                if entry is not None and response.status_code == 304:
+                    return self._cache.store(url, response, entry)
                 response.raise_for_status()
-                return response.text
+                reader = self._body_reader(url, response)
+                if reader is None:
+                    return FetchResult(url, "")
+                for chunk in response.iter_bytes():
+                    if not reader.feed(chunk):
+                        break
+            return self._body_result(url, response, entry, reader)
         except Exception as exc:
             logger.error("fetch(%s) failed: %s", url, exc)
-            return ""
+            return FetchResult(url, "")
+
+    def _body_reader(self, url: str, response: Any) -> BodyReader | None:
+        """A reader for *response*'s body, or None if its content type is not wanted."""
+        content_type = response.headers.get("content-type")
+        if not content_type_allowed(content_type, self._content_types):
+            logger.info("Skipping %s: content type %s", url, content_type)
+            body_stats().observe_skipped()
+            return None
+        return BodyReader(content_type, self._max_bytes)
+
+    def _body_result(
+        self, url: str, response: Any, entry: CacheEntry | None, reader: BodyReader
+    ) -> FetchResult:
+        text = reader.text()
+        body_stats().observe(reader)
+        if reader.truncated:
+            logger.debug("Truncated %s at %d bytes", url, reader.bytes_read)
+        if self._cache is None:
+            return FetchResult(url, text, truncated=reader.truncated)
+        result = self._cache.store(url, response, entry, text=text)
+        return dataclasses.replace(result, truncated=reader.truncated)
+
+    def parse(self, html: str, base_url: str = "") -> ParsedDocument:
+        """Parse *html* once; text, links and metadata are read from the same tree."""
+        return ParsedDocument(html, base_url=base_url, backend=self._parser)
 
     def extract_text(self, html: str) -> str:
         """Return clean plain text from HTML."""
-        if not html:
-            return ""
-        try:
-            from bs4 import BeautifulSoup
-
-            soup = BeautifulSoup(html, "html.parser")
-            # Remove script / style noise
-            for tag in soup(["script", "style", "noscript", "head"]):
-                tag.decompose()
-            return " ".join(soup.get_text(separator=" ").split())
-        except Exception as exc:
-            logger.error("extract_text failed: %s", exc)
-            return ""
+        return self.parse(html).text
 
     def extract_links(self, html: str, base_url: str = "") -> list[str]:
         """Return list of absolute href URLs found in HTML."""
-        if not html:
-            return []
-        try:
-            from bs4 import BeautifulSoup
-
-            soup = BeautifulSoup(html, "html.parser")
-            links: list[str] = []
-            for anchor in soup.find_all("a", href=True):
-                href: str = anchor["href"]
-                if base_url:
-                    href = urljoin(base_url, href)
-                parsed = urlparse(href)
-                if parsed.scheme in ("http", "https"):
-                    links.append(href)
-            return list(dict.fromkeys(links))  # deduplicate, preserve order
-        except Exception as exc:
-            logger.error("extract_links failed: %s", exc)
-            return []
+        return self.parse(html, base_url=base_url).links
 
     def crawl(self, url: str) -> dict:
-        """Fetch and parse a URL, returning a structured dict."""
-        html = self.fetch(url)
-        text = self.extract_text(html)
-        links = self.extract_links(html, base_url=url)
-        return {"url": url, "html": html, "text": text, "links": links}
+        """Fetch and parse a URL, returning a structured dict.
+
+        ``unchanged`` is True when the page is the same as on its last fetch;
+        ``document`` gives lazy access to its title, meta tags and JSON-LD.
+        """
+        fetched = self.fetch_result(url)
+        return self._crawl_result(url, fetched.text, fetched.unchanged)
+
+    def _crawl_result(self, url: str, html: str, unchanged: bool) -> dict:
+        document = self.parse(html, base_url=url)
+        return {
+            "url": url,
+            "html": html,
+            "text": document.text,
+            "links": document.links,
+            "unchanged": unchanged,
+            "document": document,
+        }
@@ -0,0 +1,324 @@
+"""Bounded same-site crawling: sitemap seeding, a prioritised frontier, merged text."""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import heapq
+import itertools
+import logging
+import re
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from common.crawling.async_scraper import AsyncWebScraper
+from common.crawling.scraper import WebScraper
+from common.llm.budget import PromptBudget, Section
+
+logger = logging.getLogger(__name__)
+
+# Where restaurants keep what competitor analysis needs, best first.
+_PRIORITY_PATTERNS = (
+    (re.compile(r"menu|carta|food|drinks|wine|dishes|prices?"), 10),
+    (re.compile(r"special|promo|offer|deal|happy-?hour|brunch|lunch|dinner"), 8),
+    (re.compile(r"order|delivery|takeaway|take-out|catering"), 7),
+    (re.compile(r"event|private|party|book|reserv"), 6),
+    (re.compile(r"about|story|chef|location|contact|hours"), 3),
+    (
+        re.compile(r"blog|news|press|tag|category|author|page/\d|login|cart|account|privacy|terms"),
+        -6,
+    ),
+)
+_SKIP_EXTENSIONS = re.compile(
+    r"\.(jpe?g|png|gif|webp|svg|ico|css|js|json|zip|gz|mp4|mov|webm|mp3|woff2?|ttf)$",
+    re.IGNORECASE,
+)
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|source)$")
+_SITEMAP_LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+# Sitemap indexes can fan out to thousands of files; a few are plenty.
+_MAX_CHILD_SITEMAPS = 3
+_MAX_SITEMAP_URLS = 500
+
+
+@dataclasses.dataclass(frozen=True)
+class CrawlBudget:
+    """Stop a site crawl after *max_pages* page fetches or *max_bytes* of HTML.
+
+    Links are followed at most *max_depth* clicks from the start page;
+    sitemap entries count as depth 1. Sitemap fetches count against both
+    limits and may use at most half of *max_pages*.
+    """
+
+    max_pages: int = 8
+    max_depth: int = 2
+    max_bytes: int = 3_000_000
+
+
+def crawl_budget_from_settings() -> CrawlBudget:
+    from common.config import get_settings
+
+    settings = get_settings()
+    return CrawlBudget(
+        max_pages=settings.crawl_site_max_pages,
+        max_depth=settings.crawl_site_max_depth,
+        max_bytes=settings.crawl_site_max_bytes,
+    )
+
+
+@dataclasses.dataclass
+class SitePage:
+    url: str
+    text: str
+    depth: int
+    unchanged: bool = False
+
+
+@dataclasses.dataclass
+class SiteCorpus:
+    """Pages crawled from one site, in the order they were chosen.
+
+    *attempts* counts every page fetch, including failed, empty and
+    robots-disallowed ones; it is what the page budget limits.
+    """
+
+    start_url: str
+    pages: list[SitePage] = dataclasses.field(default_factory=list)
+    pdf_links: list[str] = dataclasses.field(default_factory=list)
+    bytes_read: int = 0
+    attempts: int = 0
+
+    @property
+    def unchanged(self) -> bool:
+        """True when every page is the same as on its previous fetch."""
+        return bool(self.pages) and all(page.unchanged for page in self.pages)
+
+    def merged_text(self, max_tokens: int | None = None, model: str | None = None) -> str:
+        """All page texts under ``## <url>`` headings, together within *max_tokens*.
+
+        Each page is a :class:`~common.llm.budget.Section` guaranteed an equal
+        share of the tokens, so short pages stay whole and only the long ones
+        are trimmed, by tokens, to fit. Linked PDFs (menus, often) are
+        listed at the end; their bodies are not fetched. Empty when no page
+        had any text.
+        """
+        sections = [f"## {page.url}\n{page.text}" for page in self.pages if page.text]
+        if sections and self.pdf_links:
+            sections.append("## Linked documents\n" + "\n".join(self.pdf_links))
+        if max_tokens is not None and sections:
+            budget = PromptBudget(model=model, max_prompt_tokens=max_tokens)
+            share = max_tokens // len(sections)
+            fitted = budget.fit(
+                {str(i): Section(s, min_tokens=share) for i, s in enumerate(sections)}, max_tokens
+            )
+            sections = [fitted[str(i)] for i in range(len(sections))]
+        return "\n\n".join(sections)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used to dedupe URLs: no fragment, tracking params or default port."""
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and (parsed.scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    path = re.sub(r"/(index\.html?)?$", "", parsed.path) or "/"
+    query = urlencode(
+        sorted((k, v) for k, v in parse_qsl(parsed.query) if not _TRACKING_PARAMS.match(k))
+    )
+    return urlunparse((parsed.scheme.lower(), host, path, "", query, ""))
+
+
+def url_priority(url: str) -> int:
+    """How likely *url* is to hold menu, price or promotion content."""
+    path = urlparse(url).path.lower()
+    return sum(weight for pattern, weight in _PRIORITY_PATTERNS if pattern.search(path))
+
+
+def _site_key(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host.removeprefix("www.")
+
+
+def _parse_sitemap(xml: str) -> tuple[list[str], list[str]]:
+    """Return ``(page URLs, child sitemap URLs)`` from a sitemap or sitemap index."""
+    urls = _SITEMAP_LOC.findall(xml or "")
+    if "<sitemapindex" not in (xml or ""):
+        return urls, []
+    # Follow the child sitemaps most likely to list content pages.
+    children = sorted(urls, key=lambda u: ("page" not in u, "post" in u))
+    return [], children[:_MAX_CHILD_SITEMAPS]
+
+
+class Frontier:
+    """URLs still to crawl on one site, best first, each seen at most once."""
+
+    def __init__(self, start_url: str) -> None:
+        self.site = _site_key(start_url)
+        self._heap: list[tuple[int, int, str, int]] = []
+        self._seen: set[str] = set()
+        self._order = itertools.count()
+
+    def add(self, url: str, depth: int, bonus: int = 0) -> bool:
+        """Queue *url* unless it is off-site, not a page, or already seen."""
+        if urlparse(url).scheme not in ("http", "https") or _site_key(url) != self.site:
+            return False
+        if _SKIP_EXTENSIONS.search(urlparse(url).path):
+            return False
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        score = url_priority(url) + bonus - depth
+        heapq.heappush(self._heap, (-score, next(self._order), url, depth))
+        return True
+
+    def pop(self) -> tuple[str, int] | None:
+        if not self._heap:
+            return None
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class SiteCrawler:
+    """Crawls the pages of a site most likely to describe its menu and offers.
+
+    Seeds from ``/sitemap.xml`` and the start page's links, then follows the
+    highest-priority same-site URLs until the :class:`CrawlBudget` runs out.
+    With an :class:`AsyncWebScraper`, several pages of a site (up to its
+    per-host limit) and several sites are fetched at once.
+    """
+
+    def __init__(
+        self, scraper: WebScraper | None = None, budget: CrawlBudget | None = None
+    ) -> None:
+        self._scraper = scraper or WebScraper()
+        self.budget = budget or crawl_budget_from_settings()
+
+    def crawl(self, start_url: str) -> SiteCorpus:
+        corpus = SiteCorpus(start_url)
+        frontier = self._frontier(start_url)
+        sitemap_pages, children = self._sitemap(corpus, self._sitemap_url(start_url))
+        for child in children:
+            sitemap_pages += self._sitemap(corpus, child)[0]
+        self._seed(frontier, sitemap_pages)
+        while self._has_budget(corpus):
+            item = frontier.pop()
+            if item is None:
+                break
+            self._accept(corpus, frontier, item[1], self._scraper.crawl(item[0]))
+        return self._done(corpus)
+
+    async def acrawl(self, start_url: str) -> SiteCorpus:
+        """Async version of :meth:`crawl`; needs an :class:`AsyncWebScraper`."""
+        scraper = self._async_scraper()
+        corpus = SiteCorpus(start_url)
+        frontier = self._frontier(start_url)
+        sitemap_pages, children = await self._asitemap(corpus, self._sitemap_url(start_url))
+        children = children[: self._sitemap_room(corpus)]
+        for xml in await asyncio.gather(*(scraper.afetch(child) for child in children)):
+            sitemap_pages += _parse_sitemap(self._count_fetch(corpus, xml))[0]
+        self._seed(frontier, sitemap_pages)
+        while self._has_budget(corpus):
+            # Small batches keep the frontier's order meaningful: links found
+            # on one batch can outrank what is already queued.
+            room = min(self.budget.max_pages - corpus.attempts, scraper.per_host_concurrency)
+            batch = [item for item in (frontier.pop() for _ in range(room)) if item is not None]
+            if not batch:
+                break
+            results = await asyncio.gather(*(scraper.acrawl(url) for url, _ in batch))
+            for (_, depth), page in zip(batch, results):
+                self._accept(corpus, frontier, depth, page)
+        return self._done(corpus)
+
+    def crawl_sites(self, start_urls: list[str]) -> dict[str, SiteCorpus]:
+        """Crawl several sites, concurrently when the scraper is async; input order is kept."""
+        urls = list(dict.fromkeys(start_urls))
+        if isinstance(self._scraper, AsyncWebScraper):
+            return self._scraper.run(self._acrawl_sites(urls))
+        return {url: self.crawl(url) for url in urls}
+
+    # ------------------------------------------------------------------
+
+    async def _acrawl_sites(self, urls: list[str]) -> dict[str, SiteCorpus]:
+        corpora = await asyncio.gather(*(self.acrawl(url) for url in urls))
+        return dict(zip(urls, corpora))
+
+    def _async_scraper(self) -> AsyncWebScraper:
+        if not isinstance(self._scraper, AsyncWebScraper):
+            raise TypeError("SiteCrawler.acrawl needs an AsyncWebScraper")
+        return self._scraper
+
+    @staticmethod
+    def _frontier(start_url: str) -> Frontier:
+        frontier = Frontier(start_url)
+        # The start page goes first: it names the site and links its sections.
+        frontier.add(start_url, depth=0, bonus=1000)
+        return frontier
+
+    @staticmethod
+    def _sitemap_url(start_url: str) -> str:
+        return urljoin(start_url, "/sitemap.xml")
+
+    @staticmethod
+    def _seed(frontier: Frontier, sitemap_pages: list[str]) -> None:
+        for url in sitemap_pages[:_MAX_SITEMAP_URLS]:
+            frontier.add(url, depth=1)
+
+    @staticmethod
+    def _done(corpus: SiteCorpus) -> SiteCorpus:
+        logger.debug(
+            "Crawled %d of %d pages fetched (%d bytes) from %s",
+            len(corpus.pages), corpus.attempts, corpus.bytes_read, corpus.start_url,
+        )
+        return corpus
+
+    def _sitemap(self, corpus: SiteCorpus, url: str) -> tuple[list[str], list[str]]:
+        if not self._sitemap_room(corpus):
+            return [], []
+        return _parse_sitemap(self._count_fetch(corpus, self._scraper.fetch(url)))
+
+    async def _asitemap(self, corpus: SiteCorpus, url: str) -> tuple[list[str], list[str]]:
+        if not self._sitemap_room(corpus):
+            return [], []
+        xml = await self._async_scraper().afetch(url)
+        return _parse_sitemap(self._count_fetch(corpus, xml))
+
+    def _sitemap_room(self, corpus: SiteCorpus) -> int:
+        """Sitemap fetches still allowed; they leave at least half the page budget for pages."""
+        if corpus.bytes_read >= self.budget.max_bytes:
+            return 0
+        return max(0, self.budget.max_pages // 2 - corpus.attempts)
+
+    @staticmethod
+    def _count_fetch(corpus: SiteCorpus, body: str) -> str:
+        corpus.attempts += 1
+        corpus.bytes_read += len(body.encode("utf-8"))
+        return body
+
+    def _has_budget(self, corpus: SiteCorpus) -> bool:
+        return (
+            corpus.attempts < self.budget.max_pages
+            and corpus.bytes_read < self.budget.max_bytes
+        )
+
+    def _accept(
+        self, corpus: SiteCorpus, frontier: Frontier, depth: int, page: dict[str, Any]
+    ) -> None:
+        corpus.attempts += 1
+        html = page.get("html", "")
+        # Pages of a batch that arrive after the byte budget ran out are dropped.
+        if not html or corpus.bytes_read >= self.budget.max_bytes:
+            return
+        corpus.bytes_read += len(html.encode("utf-8"))
+        corpus.pages.append(
+            SitePage(page["url"], page.get("text", ""), depth, page.get("unchanged", False))
+        )
+        for link in page.get("links", []):
+            if urlparse(link).path.lower().endswith(".pdf"):
+                # PDF bodies are refused by content type; keep the link as a pointer.
+                if _site_key(link) == frontier.site and link not in corpus.pdf_links:
+                    corpus.pdf_links.append(link)
+            elif depth < self.budget.max_depth:
+                frontier.add(link, depth + 1)
@@ -0,0 +1,166 @@
+"""Bounded, incrementally decoded response bodies for crawling."""
+from __future__ import annotations
+
+import codecs
+import re
+import threading
+from typing import Any
+
+# Pages and feeds we can extract text from; anything else is not downloaded.
+TEXT_CONTENT_TYPES = (
+    "text/html",
+    "application/xhtml+xml",
+    "text/xml",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "text/plain",
+)
+
+# Charset declarations sit in the first bytes of a document.
+_SNIFF_BYTES = 2048
+_META_CHARSET = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?([a-zA-Z0-9_.:-]+)"""
+    rb"""|<\?xml[^>]+encoding\s*=\s*["']([a-zA-Z0-9_.:-]+)""",
+    re.IGNORECASE,
+)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def content_type_allowed(content_type: str | None, allowed: tuple[str, ...]) -> bool:
+    """True if *content_type* (a header value) is one of *allowed*; unknown types pass."""
+    if not content_type:
+        return True
+    return content_type.split(";", 1)[0].strip().lower() in allowed
+
+
+def header_charset(content_type: str | None) -> str | None:
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip("\"' ")
+    return None
+
+
+def _known_codec(name: str | None) -> str | None:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+class BodyReader:
+    """Decodes a response body chunk by chunk, keeping at most *max_bytes*.
+
+    The charset comes from the Content-Type header, else a BOM or a
+    ``<meta charset>``/XML declaration in the first bytes, else UTF-8.
+    Bytes past the cap are never decoded; :meth:`feed` returns False once
+    the cap is reached so the caller can stop reading and drop the connection.
+    """
+
+    def __init__(self, content_type: str | None = None, max_bytes: int | None = None) -> None:
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+        self.encoding = _known_codec(header_charset(content_type))
+        self._pending = b""
+        self._decoder: Any = None
+        self._parts: list[str] = []
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[: self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        if self._decoder is None:
+            self._pending += chunk
+            if len(self._pending) < _SNIFF_BYTES and not self.truncated:
+                return True
+            chunk, self._pending = self._pending, b""
+            self._start_decoder(chunk)
+        self._parts.append(self._decoder.decode(chunk))
+        return not self.truncated
+
+    def text(self) -> str:
+        if self._decoder is None:
+            chunk, self._pending = self._pending, b""
+            self._start_decoder(chunk)
+            self._parts.append(self._decoder.decode(chunk))
+        # A cut-off multi-byte character at the cap is replaced, not raised.
+        self._parts.append(self._decoder.decode(b"", final=True))
+        return "".join(self._parts)
+
+    def _start_decoder(self, head: bytes) -> None:
+        if self.encoding is None:
+            for bom, name in _BOMS:
+                if head.startswith(bom):
+                    self.encoding = name
+                    break
+        if self.encoding is None:
+            match = _META_CHARSET.search(head[:_SNIFF_BYTES])
+            if match:
+                self.encoding = _known_codec((match.group(1) or match.group(2)).decode("ascii"))
+        self.encoding = self.encoding or "utf-8"
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+
+
+class BodyStats:
+    """Counts what bounded fetching downloaded, cut short or refused."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.bodies = 0
+        self.bytes_read = 0
+        self.truncated = 0
+        self.skipped = 0
+
+    def observe(self, reader: BodyReader) -> None:
+        with self._lock:
+            self.bodies += 1
+            self.bytes_read += reader.bytes_read
+            self.truncated += reader.truncated
+
+    def observe_skipped(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "bodies": self.bodies,
+                "bytes_read": self.bytes_read,
+                "truncated": self.truncated,
+                "skipped": self.skipped,
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, key, help_text in (
+            ("crawl_body_bytes_total", "bytes_read", "Response body bytes read while crawling."),
+            ("crawl_bodies_truncated_total", "truncated", "Bodies cut off at the size cap."),
+            ("crawl_bodies_skipped_total", "skipped", "Responses refused by content type."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {snapshot[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.bodies = self.bytes_read = self.truncated = self.skipped = 0
+
+
+_STATS = BodyStats()
+
+
+def body_stats() -> BodyStats:
+    return _STATS
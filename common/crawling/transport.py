@@ -0,0 +1,293 @@
+"""Process-wide pooled HTTP client for crawling, with a DNS cache."""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import dataclasses
+import logging
+import socket
+import threading
+import time
+import weakref
+from typing import Any
+
+from common.llm.transport import ConnectionStats
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (compatible; RestaurantBot/1.0; +https://github.com/restaurant-bots)"
+    )
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CrawlTransportConfig:
+    """Connection pool, keep-alive, HTTP/2, timeout and DNS settings for crawling."""
+
+    max_connections: int = 50
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    timeout: float = 30.0
+    dns_ttl: float = 300.0
+
+
+def crawl_transport_config_from_settings() -> CrawlTransportConfig:
+    from common.config import get_settings
+
+    settings = get_settings()
+    return CrawlTransportConfig(
+        max_connections=settings.crawl_http_max_connections,
+        max_keepalive_connections=settings.crawl_http_max_keepalive,
+        keepalive_expiry=settings.crawl_http_keepalive_expiry,
+        http2=settings.crawl_http2,
+        connect_timeout=settings.crawl_connect_timeout,
+        timeout=settings.crawl_timeout,
+        dns_ttl=settings.crawl_dns_ttl,
+    )
+
+
+class DNSCache:
+    """Caches ``getaddrinfo`` results for *ttl* seconds.
+
+    The pool only keeps a connection per origin while it is idle-alive, so
+    revisiting a site after ``keepalive_expiry`` would otherwise resolve its
+    name again. Failed lookups are not cached.
+    """
+
+    def __init__(self, ttl: float = 300.0) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, int], tuple[float, list[tuple]]] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def resolve(self, host: str, port: int) -> list[tuple]:
+        """Return ``getaddrinfo`` tuples for a TCP connection to *host*:*port*."""
+        cached = self._lookup(host, port)
+        if cached is not None:
+            return cached
+        return self._store(host, port, socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+
+    async def aresolve(self, host: str, port: int) -> list[tuple]:
+        """Async version of :meth:`resolve`, resolving on the loop's executor."""
+        cached = self._lookup(host, port)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return self._store(host, port, infos)
+
+    def _lookup(self, host: str, port: int) -> list[tuple] | None:
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def _store(self, host: str, port: int, infos: list[tuple]) -> list[tuple]:
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic() + self.ttl, infos)
+        return infos
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.lookups = self.hits = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "hosts": len(self._entries),
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, key, help_text in (
+            ("crawl_dns_lookups_total", "lookups", "Host name resolutions requested."),
+            ("crawl_dns_hits_total", "hits", "Resolutions answered from the DNS cache."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {snapshot[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _addresses(infos: list[tuple]) -> list[str]:
+    return [
+        address[0]
+        for family, _, _, _, address in infos
+        if family in (socket.AF_INET, socket.AF_INET6)
+    ]
+
+
+def _network_backend(dns: DNSCache) -> Any:
+    import httpcore
+
+    class _CachedDNSBackend(httpcore.SyncBackend):
+        """Connects to a cached address; TLS still verifies the original host name."""
+
+        def connect_tcp(self, host: str, port: int, timeout: float | None = None, **kwargs: Any):
+            error: Exception | None = None
+            for address in _addresses(dns.resolve(host, port)):
+                try:
+                    return super().connect_tcp(address, port, timeout, **kwargs)
+                except httpcore.ConnectError as exc:
+                    error = exc
+            raise error or httpcore.ConnectError(f"No address found for {host}")
+
+    return _CachedDNSBackend()
+
+
+def _async_network_backend(dns: DNSCache) -> Any:
+    import httpcore
+
+    class _CachedDNSAsyncBackend(httpcore.AnyIOBackend):
+        async def connect_tcp(
+            self, host: str, port: int, timeout: float | None = None, **kwargs: Any
+        ):
+            error: Exception | None = None
+            for address in _addresses(await dns.aresolve(host, port)):
+                try:
+                    return await super().connect_tcp(address, port, timeout, **kwargs)
+                except httpcore.ConnectError as exc:
+                    error = exc
+            raise error or httpcore.ConnectError(f"No address found for {host}")
+
+    return _CachedDNSAsyncBackend()
+
+
+_STATS = ConnectionStats(prefix="crawl_http", target="crawled sites")
+_DNS = DNSCache()
+_LOCK = threading.Lock()
+_CLIENT: Any = None
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def connection_stats() -> ConnectionStats:
+    """Connection reuse counters for all traffic through the shared crawl client."""
+    return _STATS
+
+
+def dns_cache() -> DNSCache:
+    return _DNS
+
+
+def _install_trace(request: Any) -> None:
+    request.extensions.setdefault("trace", _STATS.trace)
+
+
+async def _ainstall_trace(request: Any) -> None:
+    request.extensions.setdefault("trace", _STATS.atrace)
+
+
+def _transport_kwargs(config: CrawlTransportConfig) -> dict[str, Any]:
+    import httpx
+
+    http2 = config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is missing; using HTTP/1.1")
+            http2 = False
+    _DNS.ttl = config.dns_ttl
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    }
+
+
+def _client_options(config: CrawlTransportConfig) -> dict[str, Any]:
+    import httpx
+
+    return {
+        "follow_redirects": True,
+        "timeout": httpx.Timeout(config.timeout, connect=config.connect_timeout),
+        "headers": HEADERS,
+    }
+
+
+def get_crawl_client(config: CrawlTransportConfig | None = None) -> Any:
+    """Return the process-wide ``httpx.Client`` for crawling, creating it on first use.
+
+    *config* only applies to the first call; later calls share that pool,
+    which outlives individual bot runs until :func:`close_crawl_client`.
+    """
+    global _CLIENT
+    with _LOCK:
+        if _CLIENT is None or _CLIENT.is_closed:
+            import httpx
+
+            config = config or crawl_transport_config_from_settings()
+            transport = httpx.HTTPTransport(**_transport_kwargs(config))
+            # httpx has no resolver hook; the pool's network backend is the seam.
+            transport._pool._network_backend = _network_backend(_DNS)
+            _CLIENT = httpx.Client(
+                transport=transport,
+                event_hooks={"request": [_install_trace]},
+                **_client_options(config),
+            )
+        return _CLIENT
+
+
+def get_async_crawl_client(config: CrawlTransportConfig | None = None) -> Any:
+    """Return the shared ``httpx.AsyncClient`` for crawling on the running event loop.
+
+    Pooled connections belong to the loop that opened them, so each loop
+    gets its own client; close it with :func:`aclose_crawl_client` before
+    the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        client = _ASYNC_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            import httpx
+
+            config = config or crawl_transport_config_from_settings()
+            transport = httpx.AsyncHTTPTransport(**_transport_kwargs(config))
+            transport._pool._network_backend = _async_network_backend(_DNS)
+            client = httpx.AsyncClient(
+                transport=transport,
+                event_hooks={"request": [_ainstall_trace]},
+                **_client_options(config),
+            )
+            _ASYNC_CLIENTS[loop] = client
+        return client
+
+
+async def aclose_crawl_client() -> None:
+    """Close the running loop's shared async crawl client, if it has one."""
+    with _LOCK:
+        client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_crawl_client() -> None:
+    """Close the shared crawl client; the next call builds a fresh pool."""
+    global _CLIENT
+    with _LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+            _CLIENT = None
+
+
+atexit.register(close_crawl_client)
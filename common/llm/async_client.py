@@ -0,0 +1,366 @@
+"""Asynchronous LLM client with bounded concurrency."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from common.config import get_settings
+from common.llm.cache import ResponseCache, make_cache_key
+from common.llm.cassette import REPLAY, AsyncCassetteClient, Cassette
+from common.llm.client import DEFAULT_MAX_TOKENS, LLMClient
+from common.llm.hedging import HedgePolicy
+from common.llm.metrics import (
+    MetricsRegistry,
+    current_record,
+    note,
+    note_retries,
+    note_usage,
+)
+from common.llm.rate_limit import RateLimiter
+from common.llm.retry import CircuitBreaker, RetryPolicy, RetryStats
+from common.llm.singleflight import SingleFlight
+from common.llm.structured import (
+    is_unsupported_error,
+    json_mode_messages,
+    mark_native_unsupported,
+    native_supported,
+    parse_json_reply,
+    truncated_reply,
+)
+from common.llm.transport import aclose_async_http_client, get_async_http_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncLLMClient(LLMClient):
+    """Async counterpart of LLMClient backed by ``openai.AsyncOpenAI``.
+
+    At most ``max_concurrency`` requests are in flight at once per client;
+    cache hits do not take a slot. The synchronous API is inherited unchanged.
+
+    The SDK client is built per event loop, next to that loop's shared
+    connection pool (see :func:`~common.llm.transport.get_async_http_client`);
+    :meth:`run_concurrently` closes both before its loop ends.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str | None = None,
+        cache: ResponseCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        single_flight: SingleFlight | None = None,
+        metrics: MetricsRegistry | None = None,
+        cassette: Cassette | None = None,
+        hedge_policy: HedgePolicy | None = None,
+        max_concurrency: int | None = None,
+    ) -> None:
+        super().__init__(
+            api_key=api_key,
+            model=model,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker,
+            single_flight=single_flight,
+            metrics=metrics,
+            cassette=cassette,
+            hedge_policy=hedge_policy,
+        )
+        settings = get_settings()
+        self._max_concurrency = max(1, max_concurrency or settings.llm_max_concurrency)
+        # A client injected here (tests, replay) is used on every loop.
+        self._async_client: Any = None
+        self._loop_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    def _get_async_client(self) -> Any:
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop)
+        if client is None:
+            client = self._build_async_client()
+            self._loop_clients[loop] = client
+        return client
+
+    def _build_async_client(self) -> Any:
+        cassette = self._cassette
+        if cassette is not None and cassette.mode == REPLAY:
+            return AsyncCassetteClient(cassette)
+        try:
+            import openai
+
+            client = openai.AsyncOpenAI(
+                api_key=self._api_key,
+                base_url=self._base_url,
+                max_retries=0,
+                http_client=get_async_http_client(),
+            )
+        except ImportError as exc:
+            raise RuntimeError("openai package is required") from exc
+        if cassette is not None:
+            client = AsyncCassetteClient(cassette, client)
+        return client
+
+    async def _asend_chat(
+        self,
+        request: dict,
+        deadline: float | None = None,
+        stats: RetryStats | None = None,
+        hedge: bool = False,
+    ) -> Any:
+        """Async version of :meth:`LLMClient._send_chat`; a losing hedge is cancelled."""
+
+        async def _send() -> Any:
+            return await self._asend_with_retries(
+                lambda **kw: self._get_async_client().chat.completions.create(**kw),
+                request,
+                deadline,
+                None if hedge else stats,
+            )
+
+        if hedge:
+            return await self._hedge.acall(request["model"], _send)
+        return await _send()
+
+    async def _asend_parse(
+        self, request: dict, deadline: float | None = None, stats: RetryStats | None = None
+    ) -> Any:
+        """Async version of :meth:`LLMClient._send_parse`."""
+        return await self._asend_with_retries(
+            lambda **kw: self._get_async_client().beta.chat.completions.parse(**kw),
+            request,
+            deadline,
+            stats,
+        )
+
+    async def _asend_with_retries(
+        self,
+        send: Callable[..., Awaitable[Any]],
+        request: dict,
+        deadline: float | None,
+        stats: RetryStats | None,
+    ) -> Any:
+        # Each attempt holds a concurrency slot only while it is on the wire,
+        # not while it backs off.
+        async def _attempt(timeout: float | None) -> Any:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.aacquire(request["model"], self._throttle_tokens(request))
+            kwargs = dict(request)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            async with self._get_semaphore():
+                return await send(**kwargs)
+
+        stats = stats if stats is not None else RetryStats()
+        try:
+            response = await self._retry_policy.acall(
+                _attempt, breaker=self._breaker, deadline=deadline, stats=stats
+            )
+        finally:
+            note_retries(stats.retries)
+        note_usage(getattr(response, "usage", None))
+        return response
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # A semaphore is bound to the loop it is first used on; bots may call
+        # asyncio.run() several times over the life of one client.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def achat_completion(
+        self,
+        messages: list[dict],
+        model: str | None = None,
+        temperature: float = 0.7,
+        max_tokens: int | None = None,
+        use_cache: bool = True,
+        deadline: float | None = None,
+        call_class: str | None = None,
+        hedge: bool = False,
+    ) -> str:
+        """Async version of :meth:`LLMClient.chat_completion`."""
+        used_model, route = self._route(call_class, model)
+        if max_tokens is None:
+            max_tokens = route.max_tokens if route is not None else DEFAULT_MAX_TOKENS
+        nested = current_record() is not None
+        with self._metrics.track(used_model, call_class) as record:
+            key = None
+            if use_cache:
+                key = make_cache_key(used_model, messages, temperature, max_tokens)
+            elif not nested:
+                record.cache = "bypass"
+            if key is not None and self._cache is not None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    record.cache = "hit"
+                    return cached
+
+            request = {
+                "model": used_model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            }
+
+            async def _call() -> str:
+                try:
+                    response = await self._asend_chat(request, deadline=deadline, hedge=hedge)
+                    content = response.choices[0].message.content or ""
+                except Exception as exc:
+                    logger.error("achat_completion failed: %s", exc)
+                    raise
+                if key is not None and self._cache is not None and content:
+                    self._cache.set(key, content)
+                return content
+
+            if key is None or self._single_flight is None:
+                return await _call()
+            content, shared = await self._single_flight.ado(key, _call)
+            if shared:
+                record.cache = "coalesced"
+            return content
+
+    async def astructured_completion(
+        self,
+        messages: list[dict],
+        response_format: type[BaseModel],
+        model: str | None = None,
+        use_cache: bool = True,
+        deadline: float | None = None,
+        call_class: str | None = None,
+    ) -> BaseModel:
+        """Async version of :meth:`LLMClient.structured_completion`."""
+        used_model, route = self._route(call_class, model)
+        max_tokens = route.max_tokens if route is not None else None
+        with self._metrics.track(used_model, call_class) as record:
+            key = None
+            if use_cache:
+                key = make_cache_key(
+                    used_model, messages, max_tokens=max_tokens, response_format=response_format
+                )
+            else:
+                record.cache = "bypass"
+            if key is not None and self._cache is not None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    try:
+                        result = response_format.model_validate_json(cached)
+                    except Exception as exc:
+                        logger.debug("Discarding unparseable cache entry: %s", exc)
+                    else:
+                        record.cache = "hit"
+                        return result
+
+            async def _call() -> BaseModel:
+                result = await self._astructured_uncached(
+                    messages, response_format, used_model, deadline, max_tokens
+                )
+                if key is not None and self._cache is not None:
+                    self._cache.set(key, result.model_dump_json())
+                return result
+
+            if key is None or self._single_flight is None:
+                return await _call()
+            result, shared = await self._single_flight.ado(key, _call)
+            if not shared:
+                return result
+            record.cache = "coalesced"
+            return result.model_copy(deep=True)
+
+    async def gather(self, *aws: Awaitable[T], return_exceptions: bool = False) -> list[T]:
+        """Await independent completions concurrently, preserving input order.
+
+        Concurrency is still capped by the client's semaphore, so it is safe to
+        pass hundreds of awaitables at once.
+        """
+        return list(await asyncio.gather(*aws, return_exceptions=return_exceptions))
+
+    def run_concurrently(self, *aws: Awaitable[T], return_exceptions: bool = False) -> list[T]:
+        """Synchronous entry point for bots: run :meth:`gather` on a fresh event loop.
+
+        The loop's SDK client and connection pool are closed before the loop
+        ends, so the method can be called any number of times on one client.
+        """
+        return asyncio.run(self._run_gather(aws, return_exceptions))
+
+    # ------------------------------------------------------------------
+
+    async def _run_gather(self, aws: tuple[Awaitable[T], ...], return_exceptions: bool) -> list[T]:
+        try:
+            return await self.gather(*aws, return_exceptions=return_exceptions)
+        finally:
+            self._loop_clients.pop(asyncio.get_running_loop(), None)
+            await aclose_async_http_client()
+
+    async def _astructured_uncached(
+        self,
+        messages: list[dict],
+        response_format: type[BaseModel],
+        used_model: str,
+        deadline: float | None = None,
+        max_tokens: int | None = None,
+    ) -> BaseModel:
+        # Native path first unless known to be refused; see LLMClient._structured_uncached.
+        if native_supported(used_model, response_format):
+            request = {
+                "model": used_model,
+                "messages": messages,
+                "response_format": response_format,
+            }
+            if max_tokens is not None:
+                request["max_tokens"] = max_tokens
+            note(path="native")
+            try:
+                response = await self._asend_parse(request, deadline=deadline)
+            except Exception as exc:
+                partial = truncated_reply(exc)
+                if partial is not None:
+                    note(path="native_repaired")
+                    return parse_json_reply(partial, response_format)
+                if not is_unsupported_error(exc):
+                    raise
+                mark_native_unsupported(used_model, response_format)
+            else:
+                message = response.choices[0].message
+                if message.parsed is not None:
+                    return message.parsed
+                note(path="native_repaired")
+                raw = message.content or getattr(message, "refusal", None) or ""
+                return parse_json_reply(raw, response_format)
+
+        # JSON mode + local repair
+        note(path="json_mode")
+        raw = await self.achat_completion(
+            json_mode_messages(messages),
+            model=used_model,
+            temperature=0.2,
+            max_tokens=max_tokens,
+            use_cache=False,
+            deadline=deadline,
+        )
+        return parse_json_reply(raw, response_format)
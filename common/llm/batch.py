@@ -0,0 +1,347 @@
+"""Offline batch submission for latency-insensitive LLM workloads.
+
+Call sites keep their synchronous shape: ``LLMClient(batch=queue)`` hands
+each request to a :class:`BatchQueue` and blocks on a future. The queue
+collects requests from every thread of a run into a JSONL job file, submits
+it through a pluggable :class:`BatchBackend` and demultiplexes the results
+back to the waiting callers by ``custom_id``. Bots issue independent calls
+through :func:`fan_out`, so they are all waiting at once and share a job.
+"""
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_ENDPOINT = "/v1/chat/completions"
+
+
+class BatchError(RuntimeError):
+    """Raised to a waiting call site when its request failed inside a batch."""
+
+
+class BatchBackend(ABC):
+    """Submits a JSONL job file and returns its per-request results."""
+
+    @abstractmethod
+    def submit(self, job_file: Path) -> str:
+        """Submit *job_file* and return a backend-specific batch id."""
+
+    @abstractmethod
+    def poll(self, batch_id: str) -> str:
+        """Return the batch status: "in_progress", "completed" or "failed"."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> list[dict]:
+        """Return result lines in the OpenAI batch output format.
+
+        Each line has ``custom_id`` plus either ``response`` (with
+        ``status_code`` and ``body``) or ``error``.
+        """
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Backend for the OpenAI Batch API (24h completion window)."""
+
+    def __init__(self, client: Any = None, api_key: str | None = None) -> None:
+        if client is None:
+            try:
+                import openai
+
+                client = openai.OpenAI(api_key=api_key)
+            except ImportError as exc:
+                raise RuntimeError("openai package is required") from exc
+        self._client = client
+
+    def submit(self, job_file: Path) -> str:
+        with open(job_file, "rb") as fh:
+            uploaded = self._client.files.create(file=fh, purpose="batch")
+        batch = self._client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def poll(self, batch_id: str) -> str:
+        status = self._client.batches.retrieve(batch_id).status
+        if status == "completed":
+            return "completed"
+        if status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def results(self, batch_id: str) -> list[dict]:
+        batch = self._client.batches.retrieve(batch_id)
+        lines: list[dict] = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            text = self._client.files.content(file_id).text
+            lines.extend(json.loads(line) for line in text.splitlines() if line.strip())
+        return lines
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for tests and offline runs.
+
+    Jobs are "processed" synchronously on submit by *responder*, which maps a
+    request body to the assistant's reply text. Output is written next to
+    the job as ``<batch_id>.output.jsonl``, mirroring the real backend.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        responder: Callable[[dict], str] | None = None,
+    ) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._responder = responder or (lambda body: "{}")
+
+    def submit(self, job_file: Path) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        out_lines: list[str] = []
+        for line in Path(job_file).read_text(encoding="utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                content = self._responder(request["body"])
+                result = {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "model": request["body"].get("model"),
+                            "choices": [
+                                {"index": 0, "message": {"role": "assistant", "content": content}}
+                            ],
+                            "usage": {},
+                        },
+                    },
+                    "error": None,
+                }
+            except Exception as exc:
+                result = {
+                    "custom_id": request["custom_id"],
+                    "response": None,
+                    "error": {"message": str(exc)},
+                }
+            out_lines.append(json.dumps(result))
+        (self._dir / f"{batch_id}.output.jsonl").write_text(
+            "\n".join(out_lines) + "\n", encoding="utf-8"
+        )
+        return batch_id
+
+    def poll(self, batch_id: str) -> str:
+        return "completed" if (self._dir / f"{batch_id}.output.jsonl").exists() else "failed"
+
+    def results(self, batch_id: str) -> list[dict]:
+        text = (self._dir / f"{batch_id}.output.jsonl").read_text(encoding="utf-8")
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class BatchQueue:
+    """Collects chat-completion requests and submits them as batch jobs.
+
+    A batch is flushed when it reaches ``max_batch_size`` requests or when no
+    new request has arrived for ``flush_interval`` seconds. Each flushed batch
+    is submitted and polled on its own worker thread, so a slow batch does not
+    hold up the collection of the next one.
+    """
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        job_dir: str | Path,
+        max_batch_size: int = 500,
+        flush_interval: float = 5.0,
+        poll_interval: float = 60.0,
+        timeout: float | None = 24 * 3600,
+    ) -> None:
+        self._backend = backend
+        self._job_dir = Path(job_dir)
+        self._job_dir.mkdir(parents=True, exist_ok=True)
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._cond = threading.Condition()
+        self._pending: list[tuple[str, dict, Future]] = []
+        self._last_enqueue = 0.0
+        self._ids = itertools.count(1)
+        self._dispatcher: threading.Thread | None = None
+        self._closed = False
+        self.batches_submitted = 0
+        self.requests_submitted = 0
+
+    def submit(self, body: dict) -> Future:
+        """Queue a ``/v1/chat/completions`` request body; resolve to the response body."""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise BatchError("BatchQueue is closed")
+            custom_id = f"req-{next(self._ids)}"
+            self._pending.append((custom_id, body, future))
+            self._last_enqueue = time.monotonic()
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="llm-batch-dispatcher", daemon=True
+                )
+                self._dispatcher.start()
+            self._cond.notify()
+        return future
+
+    def flush(self) -> None:
+        """Submit whatever is pending right now, without waiting for the interval."""
+        with self._cond:
+            batch = self._take_pending()
+        if batch:
+            self._start_worker(batch)
+
+    def close(self) -> None:
+        """Flush remaining requests and stop the dispatcher thread."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "batches_submitted": self.batches_submitted,
+            "requests_submitted": self.requests_submitted,
+            "pending": len(self._pending),
+        }
+
+    # ------------------------------------------------------------------
+
+    def _take_pending(self) -> list[tuple[str, dict, Future]]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                idle = time.monotonic() - self._last_enqueue
+                if len(self._pending) < self._max_batch_size and idle < self._flush_interval:
+                    self._cond.wait(self._flush_interval - idle)
+                    continue
+                batch = self._take_pending()
+            self._start_worker(batch)
+
+    def _start_worker(self, batch: list[tuple[str, dict, Future]]) -> None:
+        for start in range(0, len(batch), self._max_batch_size):
+            chunk = batch[start : start + self._max_batch_size]
+            threading.Thread(
+                target=self._process, args=(chunk,), name="llm-batch-worker", daemon=True
+            ).start()
+
+    def _process(self, batch: list[tuple[str, dict, Future]]) -> None:
+        futures = {custom_id: future for custom_id, _, future in batch}
+        try:
+            job_file = self._write_job(batch)
+            batch_id = self._backend.submit(job_file)
+            self.batches_submitted += 1
+            self.requests_submitted += len(batch)
+            logger.info("Submitted LLM batch %s with %d requests", batch_id, len(batch))
+            self._wait(batch_id)
+            for line in self._backend.results(batch_id):
+                future = futures.pop(line.get("custom_id"), None)
+                if future is None:
+                    continue
+                response = line.get("response") or {}
+                if line.get("error") or response.get("status_code") != 200:
+                    future.set_exception(
+                        BatchError(f"Batch request failed: {line.get('error') or response}")
+                    )
+                else:
+                    future.set_result(response["body"])
+        except Exception as exc:
+            logger.error("LLM batch failed: %s", exc)
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(BatchError(str(exc)))
+            futures.clear()
+        for future in futures.values():
+            future.set_exception(BatchError("No result returned for batch request"))
+
+    def _write_job(self, batch: list[tuple[str, dict, Future]]) -> Path:
+        job_file = self._job_dir / f"job_{int(time.time())}_{uuid.uuid4().hex[:8]}.jsonl"
+        with open(job_file, "w", encoding="utf-8") as fh:
+            for custom_id, body, _ in batch:
+                line = {"custom_id": custom_id, "method": "POST", "url": _ENDPOINT, "body": body}
+                fh.write(json.dumps(line) + "\n")
+        return job_file
+
+    def _wait(self, batch_id: str) -> None:
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        while True:
+            status = self._backend.poll(batch_id)
+            if status == "completed":
+                return
+            if status == "failed":
+                raise BatchError(f"Batch {batch_id} failed")
+            if deadline is not None and time.monotonic() > deadline:
+                raise BatchError(f"Batch {batch_id} timed out")
+            time.sleep(self._poll_interval)
+
+
+def fan_out(fn: Callable[[T], R], items: Iterable[T], max_workers: int = 32) -> list[R]:
+    """Call *fn* on each item on its own thread and return the results in order.
+
+    Items are submitted as *items* yields them. Under a :class:`BatchQueue`
+    the calls are all pending together and land in one job; without one they
+    simply run concurrently. Each call gets a copy of the caller's context,
+    so LLM metrics still count toward the running bot. The first exception
+    is re-raised once every call has finished.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-fan-out") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+_SHARED_QUEUE: BatchQueue | None = None
+_SHARED_QUEUE_LOCK = threading.Lock()
+
+
+def get_batch_queue() -> BatchQueue:
+    """Return the process-wide BatchQueue configured from settings."""
+    global _SHARED_QUEUE
+    with _SHARED_QUEUE_LOCK:
+        if _SHARED_QUEUE is None:
+            from common.config import get_settings
+
+            settings = get_settings()
+            job_dir = Path(settings.llm_batch_dir)
+            backend: BatchBackend
+            if settings.llm_batch_backend == "local":
+                backend = LocalBatchBackend(job_dir / "local")
+            else:
+                backend = OpenAIBatchBackend(api_key=settings.openai_api_key)
+            _SHARED_QUEUE = BatchQueue(
+                backend,
+                job_dir,
+                flush_interval=settings.llm_batch_flush_seconds,
+                poll_interval=settings.llm_batch_poll_seconds,
+            )
+        return _SHARED_QUEUE
@@ -0,0 +1,198 @@
+"""Token-aware fitting of variable prompt sections into a per-model budget."""
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+from typing import Any
+
+from common.llm.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "\n... (truncated)"
+
+# Context windows by model-name prefix; the longest matching prefix wins.
+_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4.1": 1_000_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+}
+_DEFAULT_CONTEXT_WINDOW = 16_000
+
+
+def context_window(model: str) -> int:
+    """Return the context window of *model*, or a conservative default if unknown."""
+    matches = [prefix for prefix in _CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return _DEFAULT_CONTEXT_WINDOW
+    return _CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+@dataclasses.dataclass
+class Section:
+    """A variable part of a prompt template that may be trimmed to fit.
+
+    *value* is either text or a JSON-serialisable object. Objects are shrunk
+    structurally (long lists and strings are cut) so the result stays valid
+    JSON. Sections with a higher *priority* are filled first; sections of
+    equal priority are trimmed in proportion to their size.
+    """
+
+    value: Any
+    priority: int = 0
+    min_tokens: int = 0
+
+    @property
+    def is_json(self) -> bool:
+        return not isinstance(self.value, str)
+
+
+class PromptBudget:
+    """Fits the :class:`Section` values of a prompt template into a token budget.
+
+    The budget is the smaller of ``max_prompt_tokens`` (the spend cap, from
+    ``LLM_PROMPT_TOKEN_BUDGET`` by default) and the model's context window
+    minus ``completion_tokens``.
+    """
+
+    def __init__(
+        self,
+        model: str | None = None,
+        max_prompt_tokens: int | None = None,
+        completion_tokens: int = 2000,
+    ) -> None:
+        from common.config import get_settings
+
+        settings = get_settings()
+        self.model = model or settings.openai_model
+        cap = settings.llm_prompt_token_budget if max_prompt_tokens is None else max_prompt_tokens
+        window = context_window(self.model) - completion_tokens
+        self.max_tokens = min(cap, window) if cap > 0 else window
+
+    def render(self, template: str, **values: Any) -> str:
+        """Format *template* with *values*, trimming :class:`Section` values to fit."""
+        sections = {name: v for name, v in values.items() if isinstance(v, Section)}
+        fixed = {name: v for name, v in values.items() if not isinstance(v, Section)}
+        base = estimate_tokens(template.format(**fixed, **{n: "" for n in sections}), self.model)
+        fitted = self.fit(sections, self.max_tokens - base)
+        return template.format(**fixed, **fitted)
+
+    def fit(self, sections: dict[str, Section], available: int) -> dict[str, str]:
+        """Return each section rendered as text, together using at most *available* tokens."""
+        rendered = {name: self._serialise(section.value) for name, section in sections.items()}
+        needs = {name: estimate_tokens(text, self.model) for name, text in rendered.items()}
+        if sum(needs.values()) <= available:
+            return rendered
+
+        allocation = self._allocate(sections, needs, max(0, available))
+        result = {}
+        for name, section in sections.items():
+            if needs[name] <= allocation[name]:
+                result[name] = rendered[name]
+            else:
+                result[name] = self._shrink(section, allocation[name])
+                logger.debug(
+                    "Prompt section %r trimmed from %d to %d tokens",
+                    name,
+                    needs[name],
+                    allocation[name],
+                )
+        return result
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _allocate(
+        sections: dict[str, Section], needs: dict[str, int], available: int
+    ) -> dict[str, int]:
+        """Hand out *available* tokens by priority tier, proportionally within a tier."""
+        allocation = {name: min(needs[name], s.min_tokens) for name, s in sections.items()}
+        remaining = available - sum(allocation.values())
+        for priority in sorted({s.priority for s in sections.values()}, reverse=True):
+            tier = [name for name, s in sections.items() if s.priority == priority]
+            wanted = {name: needs[name] - allocation[name] for name in tier}
+            total = sum(wanted.values())
+            if total <= 0:
+                continue
+            share = min(1.0, max(0, remaining) / total)
+            for name in tier:
+                grant = int(wanted[name] * share)
+                allocation[name] += grant
+                remaining -= grant
+        return allocation
+
+    def _serialise(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        # Compact separators: indentation costs tokens and adds nothing for the model.
+        # Sorted keys keep the text identical between calls for prompt caching.
+        return json.dumps(
+            value, ensure_ascii=False, default=str, sort_keys=True, separators=(",", ":")
+        )
+
+    def _shrink(self, section: Section, max_tokens: int) -> str:
+        if not section.is_json:
+            return self._shrink_text(section.value, max_tokens)
+        return self._shrink_json(section.value, max_tokens)
+
+    def _shrink_text(self, text: str, max_tokens: int) -> str:
+        marker_tokens = estimate_tokens(TRUNCATION_MARKER, self.model)
+        return truncate_to_tokens(text, max_tokens - marker_tokens, self.model) + TRUNCATION_MARKER
+
+    def _shrink_json(self, value: Any, max_tokens: int) -> str:
+        """Binary-search the largest list/string caps whose serialisation fits."""
+        longest_list, longest_string = _extents(value)
+        best: str | None = None
+        low, high = 0.0, 1.0
+        for _ in range(10):
+            scale = (low + high) / 2
+            max_items = max(1, int(longest_list * scale))
+            max_chars = max(16, int(longest_string * scale))
+            text = self._serialise(_cap(value, max_items, max_chars))
+            if estimate_tokens(text, self.model) <= max_tokens:
+                best, low = text, scale
+            else:
+                high = scale
+        if best is None:
+            # Even the smallest structure does not fit; fall back to plain text.
+            return self._shrink_text(self._serialise(_cap(value, 1, 16)), max_tokens)
+        return best
+
+
+def _extents(value: Any) -> tuple[int, int]:
+    """Return the longest list length and longest string length inside *value*."""
+    if isinstance(value, str):
+        return 0, len(value)
+    if isinstance(value, dict):
+        children = list(value.values())
+    elif isinstance(value, (list, tuple)):
+        children = list(value)
+    else:
+        return 0, 0
+    longest_list = len(children) if isinstance(value, (list, tuple)) else 0
+    longest_string = 0
+    for child in children:
+        child_list, child_string = _extents(child)
+        longest_list = max(longest_list, child_list)
+        longest_string = max(longest_string, child_string)
+    return longest_list, longest_string
+
+
+def _cap(value: Any, max_items: int, max_chars: int) -> Any:
+    """Copy *value* keeping at most *max_items* per list and *max_chars* per string."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars].rstrip() + "..."
+    if isinstance(value, dict):
+        return {key: _cap(item, max_items, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_cap(item, max_items, max_chars) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... ({len(value) - max_items} more)")
+        return items
+    return value
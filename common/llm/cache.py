@@ -0,0 +1,178 @@
+"""Persistent, content-addressed cache for LLM responses."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+def make_cache_key(
+    model: str,
+    messages: list[dict],
+    temperature: float | None = None,
+    max_tokens: int | None = None,
+    response_format: type[BaseModel] | None = None,
+) -> str:
+    """Return a stable SHA-256 key for a completion request.
+
+    The response schema (not just its class name) is part of the key, so
+    changing a Pydantic model invalidates the entries produced for it.
+    """
+    payload: dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "schema": response_format.model_json_schema() if response_format else None,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL and LRU/size-based eviction.
+
+    Safe to share between threads; every operation holds a single lock around
+    its own short transaction.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: float | None = 7 * 24 * 3600,
+        max_entries: int | None = 5000,
+        max_bytes: int | None = None,
+    ) -> None:
+        self._path = Path(path)
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if str(path) != ":memory:":
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for *key*, or None on a miss or expiry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self._ttl is not None and now - created_at > self._ttl:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store *value* under *key* and evict old entries if over budget."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    # ------------------------------------------------------------------
+
+    def _evict(self) -> None:
+        """Drop expired rows, then least-recently-used rows until within budget."""
+        if self._ttl is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self._ttl,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        if self._max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            if count > self._max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self._max_entries,),
+                )
+                self.evictions += max(cursor.rowcount, 0)
+
+        if self._max_bytes is not None:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+            if total > self._max_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM llm_responses ORDER BY accessed_at ASC"
+                ).fetchall()
+                doomed: list[str] = []
+                for key, size in rows:
+                    if total <= self._max_bytes:
+                        break
+                    doomed.append(key)
+                    total -= size
+                self._conn.executemany(
+                    "DELETE FROM llm_responses WHERE key = ?", [(k,) for k in doomed]
+                )
+                self.evictions += len(doomed)
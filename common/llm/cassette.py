@@ -0,0 +1,291 @@
+"""Record/replay cassettes of LLM traffic for offline benchmarking."""
+from __future__ import annotations
+
+import asyncio
+import collections
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from common.llm.cache import make_cache_key
+from common.llm.metrics import mark_first_byte
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+LatencyModel = Callable[[dict], float]
+
+
+class CassetteMissError(LookupError):
+    """Replay found no recorded response for a request."""
+
+
+class Cassette:
+    """An append-only JSON-lines file of request/response pairs.
+
+    Entries are keyed like the response cache (model, messages, sampling
+    parameters and schema), so a replay matches only the exact same request.
+    Only the response and a short prompt preview are stored, not the full
+    prompt. A ``.gz`` suffix compresses the file.
+
+    Identical requests recorded several times are replayed in recorded order;
+    once exhausted, the last response for that key is repeated. *latency*
+    (see :func:`parse_latency`) delays each replayed response.
+    """
+
+    def __init__(
+        self, path: str | Path, mode: str = REPLAY, latency: LatencyModel | None = None
+    ) -> None:
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be {RECORD!r} or {REPLAY!r}, not {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: dict[str, list[dict]] = collections.defaultdict(list)
+        self._cursor: collections.Counter[str] = collections.Counter()
+        if mode == REPLAY:
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @staticmethod
+    def key_for(endpoint: str, request: dict) -> str:
+        return make_cache_key(
+            request["model"],
+            request["messages"],
+            request.get("temperature"),
+            request.get("max_tokens"),
+            request.get("response_format") if endpoint == "parse" else None,
+        )
+
+    def record(self, endpoint: str, request: dict, response: Any, latency: float) -> None:
+        message = response.choices[0].message
+        preview = str(request["messages"][-1].get("content") or "")[:80]
+        entry = {
+            "key": self.key_for(endpoint, request),
+            "endpoint": endpoint,
+            "model": request["model"],
+            "preview": preview,
+            "content": message.content,
+            "refusal": getattr(message, "refusal", None),
+            "finish_reason": getattr(response.choices[0], "finish_reason", None),
+            "usage": _usage_dict(getattr(response, "usage", None)),
+            "latency": round(latency, 4),
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._entries[entry["key"]].append(entry)
+            with self._open("at") as handle:
+                handle.write(line)
+
+    def lookup(self, endpoint: str, request: dict) -> dict:
+        key = self.key_for(endpoint, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                preview = str(request["messages"][-1].get("content") or "")[:80]
+                raise CassetteMissError(
+                    f"No recorded {endpoint} response for {request['model']} ({preview!r})"
+                )
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            return entries[index]
+
+    def rewind(self) -> None:
+        """Start serving repeated requests from their first recording again."""
+        with self._lock:
+            self._cursor.clear()
+
+    # ------------------------------------------------------------------
+
+    def _open(self, mode: str):
+        if self.path.suffix == ".gz":
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with self._open("rt") as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logger.info("Loaded %d cassette entries from %s", len(self), self.path)
+
+
+# ---------------------------------------------------------------------------
+# Latency models
+# ---------------------------------------------------------------------------
+
+
+def recorded_latency(scale: float = 1.0) -> LatencyModel:
+    """Replay each response after its recorded latency, times *scale*."""
+    return lambda entry: entry.get("latency", 0.0) * scale
+
+
+def lognormal_latency(
+    median: float, sigma: float = 0.5, seed: int | None = None
+) -> LatencyModel:
+    """Draw latencies from a log-normal distribution, the usual shape of LLM latency."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def _draw(entry: dict) -> float:
+        with lock:
+            return median * rng.lognormvariate(0.0, sigma)
+
+    return _draw
+
+
+def parse_latency(spec: str) -> LatencyModel | None:
+    """Parse ``""``, ``"recorded"``, ``"recorded:0.5"`` or ``"lognormal:0.8:0.4"``."""
+    if not spec:
+        return None
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(":") if v]
+    if kind == "recorded":
+        return recorded_latency(*values)
+    if kind == "lognormal":
+        return lognormal_latency(*values)
+    raise ValueError(f"Unknown latency model {spec!r}")
+
+
+# ---------------------------------------------------------------------------
+# OpenAI client stand-ins
+# ---------------------------------------------------------------------------
+
+
+class CassetteClient:
+    """Drop-in for ``openai.OpenAI`` that records to or replays from a cassette.
+
+    In record mode requests go to *inner* (the real client) and each response
+    is appended to the cassette; in replay mode no network is used.
+    """
+
+    def __init__(self, cassette: Cassette, inner: Any = None) -> None:
+        if cassette.mode == RECORD and inner is None:
+            raise ValueError("Recording needs the real client to forward requests to")
+        self.cassette = cassette
+        self._inner = inner
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self._parse))
+        )
+
+    def _create(self, **kwargs: Any) -> Any:
+        return self._handle("create", kwargs)
+
+    def _parse(self, **kwargs: Any) -> Any:
+        return self._handle("parse", kwargs)
+
+    def _handle(self, endpoint: str, kwargs: dict) -> Any:
+        if self.cassette.mode == RECORD:
+            send = _endpoint(self._inner, endpoint)
+            started = time.monotonic()
+            response = send(**kwargs)
+            self.cassette.record(endpoint, kwargs, response, time.monotonic() - started)
+            return response
+        entry = self.cassette.lookup(endpoint, kwargs)
+        if self.cassette.latency is not None:
+            time.sleep(self.cassette.latency(entry))
+        mark_first_byte()
+        return _response(entry, kwargs)
+
+
+class AsyncCassetteClient(CassetteClient):
+    """Drop-in for ``openai.AsyncOpenAI``; see :class:`CassetteClient`."""
+
+    async def _create(self, **kwargs: Any) -> Any:
+        return await self._ahandle("create", kwargs)
+
+    async def _parse(self, **kwargs: Any) -> Any:
+        return await self._ahandle("parse", kwargs)
+
+    async def _ahandle(self, endpoint: str, kwargs: dict) -> Any:
+        if self.cassette.mode == RECORD:
+            send = _endpoint(self._inner, endpoint)
+            started = time.monotonic()
+            response = await send(**kwargs)
+            self.cassette.record(endpoint, kwargs, response, time.monotonic() - started)
+            return response
+        entry = self.cassette.lookup(endpoint, kwargs)
+        if self.cassette.latency is not None:
+            await asyncio.sleep(self.cassette.latency(entry))
+        mark_first_byte()
+        return _response(entry, kwargs)
+
+
+def _endpoint(client: Any, endpoint: str) -> Callable[..., Any]:
+    if endpoint == "parse":
+        return client.beta.chat.completions.parse
+    return client.chat.completions.create
+
+
+def _usage_dict(usage: Any) -> dict | None:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _response(entry: dict, request: dict) -> SimpleNamespace:
+    """Rebuild an SDK-shaped response from a cassette entry."""
+    parsed = None
+    response_format = request.get("response_format")
+    if entry["endpoint"] == "parse" and entry["content"] and response_format is not None:
+        try:
+            parsed = response_format.model_validate_json(entry["content"])
+        except ValueError:
+            parsed = None
+    message = SimpleNamespace(
+        content=entry["content"], refusal=entry.get("refusal"), parsed=parsed
+    )
+    usage = entry.get("usage") or {}
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message, finish_reason=entry.get("finish_reason"))],
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens", 0)),
+        ),
+    )
+
+
+_SHARED_CASSETTE: Cassette | None = None
+_SHARED_CASSETTE_LOCK = threading.Lock()
+
+
+def get_cassette() -> Cassette | None:
+    """Return the process-wide Cassette from settings, or None when not configured."""
+    global _SHARED_CASSETTE
+    from common.config import get_settings
+
+    settings = get_settings()
+    if not settings.llm_cassette_mode:
+        return None
+    with _SHARED_CASSETTE_LOCK:
+        if _SHARED_CASSETTE is None:
+            _SHARED_CASSETTE = Cassette(
+                settings.llm_cassette_path,
+                mode=settings.llm_cassette_mode,
+                latency=parse_latency(settings.llm_cassette_latency),
+            )
+        return _SHARED_CASSETTE
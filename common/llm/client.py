@@ -1,36 +1,232 @@
 """LLM client wrapping OpenAI."""
 from __future__ import annotations
 
-import json
 import logging
+import threading
+from collections.abc import Callable, Iterator
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from common.config import get_settings
+from common.llm.batch import BatchQueue
+from common.llm.cache import ResponseCache, make_cache_key
+from common.llm.cassette import REPLAY, Cassette, CassetteClient, get_cassette
+from common.llm.hedging import HedgePolicy, get_hedge_policy
+from common.llm.metrics import (
+    MetricsRegistry,
+    current_record,
+    get_metrics,
+    note,
+    note_retries,
+    note_usage,
+)
+from common.llm.rate_limit import RateLimiter, get_rate_limiter
+from common.llm.retry import (
+    CircuitBreaker,
+    RetryPolicy,
+    RetryStats,
+    get_circuit_breaker,
+    retry_policy_from_settings,
+)
+from common.llm.routing import Route, resolve_route, routes_from_settings
+from common.llm.singleflight import SingleFlight, get_single_flight
+from common.llm.streaming import JsonArrayStream, StructuredStream, list_item_type
+from common.llm.structured import (
+    is_unsupported_error,
+    json_mode_messages,
+    mark_native_unsupported,
+    native_supported,
+    parse_json_reply,
+    truncated_reply,
+)
+from common.llm.tokens import estimate_message_tokens
+from common.llm.transport import connection_stats, get_http_client
 
 logger = logging.getLogger(__name__)
 
+# Completion cap for calls that name neither max_tokens nor a call class.
+DEFAULT_MAX_TOKENS = 2000
+
+_CACHES: dict[str, ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def _shared_cache(path: str, ttl_seconds: int, max_entries: int) -> ResponseCache:
+    """Return the process-wide ResponseCache for *path*, creating it on first use."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            cache = ResponseCache(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+            _CACHES[path] = cache
+        return cache
+
 
 class LLMClient:
     """Thin wrapper around the OpenAI client."""
 
-    def __init__(self, api_key: str | None = None, model: str | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str | None = None,
+        cache: ResponseCache | None = None,
+        batch: BatchQueue | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        single_flight: SingleFlight | None = None,
+        metrics: MetricsRegistry | None = None,
+        cassette: Cassette | None = None,
+        hedge_policy: HedgePolicy | None = None,
+    ) -> None:
         settings = get_settings()
         self._api_key = api_key or settings.openai_api_key
+        self._base_url = settings.openai_base_url or None
         self._default_model = model or settings.openai_model
         self._client: Any = None
+        if cache is None and settings.llm_cache_enabled:
+            cache = _shared_cache(
+                settings.llm_cache_path,
+                settings.llm_cache_ttl_seconds,
+                settings.llm_cache_max_entries,
+            )
+        self._cache = cache
+        self._batch = batch
+        self._rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self._retry_policy = retry_policy or retry_policy_from_settings()
+        self._breaker = circuit_breaker or get_circuit_breaker()
+        self._single_flight = single_flight if single_flight is not None else get_single_flight()
+        self._routes = routes_from_settings()
+        self._metrics = metrics or get_metrics()
+        self._cassette = cassette if cassette is not None else get_cassette()
+        self._hedge = hedge_policy or get_hedge_policy()
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """Per-call latency, token and fallback-path metrics."""
+        return self._metrics
+
+    @property
+    def cache(self) -> ResponseCache | None:
+        """The response cache in use, or None when caching is disabled."""
+        return self._cache
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache, rate-limit, retry, breaker, coalescing, hedging and connection counters."""
+        return {
+            "cache": self._cache.stats() if self._cache is not None else None,
+            "rate_limit": self._rate_limiter.stats() if self._rate_limiter is not None else None,
+            "retry": self._retry_policy.stats(),
+            "circuit": self._breaker.state,
+            "single_flight": (
+                self._single_flight.stats() if self._single_flight is not None else None
+            ),
+            "hedging": self._hedge.stats(),
+            "transport": connection_stats().snapshot(),
+        }
 
     def _get_client(self) -> Any:
+        if self._client is None and self._cassette is not None and self._cassette.mode == REPLAY:
+            self._client = CassetteClient(self._cassette)
         if self._client is None:
             try:
                 import openai
 
-                self._client = openai.OpenAI(api_key=self._api_key)
+                # Retries are handled by our RetryPolicy, not the SDK. The
+                # connection pool is shared by every client in the process.
+                self._client = openai.OpenAI(
+                    api_key=self._api_key,
+                    base_url=self._base_url,
+                    max_retries=0,
+                    http_client=get_http_client(),
+                )
             except ImportError as exc:
                 raise RuntimeError("openai package is required") from exc
+            if self._cassette is not None:
+                self._client = CassetteClient(self._cassette, self._client)
         return self._client
 
+    def completion_cap(self, call_class: str | None = None) -> int:
+        """The ``max_tokens`` a call of *call_class* gets when it does not name one."""
+        route = resolve_route(self._routes, call_class)
+        return route.max_tokens if route is not None else DEFAULT_MAX_TOKENS
+
+    def _route(self, call_class: str | None, model: str | None) -> tuple[str, Route | None]:
+        """Resolve the model for a call: explicit *model*, then the class route, then default."""
+        route = resolve_route(self._routes, call_class)
+        used_model = model or (route.model if route is not None else "") or self._default_model
+        return used_model, route
+
+    def _throttle_tokens(self, request: dict) -> int:
+        """Tokens to reserve for *request*: estimated prompt plus the completion cap.
+
+        This mirrors how providers count a request against a TPM budget.
+        """
+        prompt = estimate_message_tokens(request["messages"], request["model"])
+        return prompt + (request.get("max_tokens") or 0)
+
+    def _send_chat(
+        self,
+        request: dict,
+        deadline: float | None = None,
+        stats: RetryStats | None = None,
+        hedge: bool = False,
+    ) -> Any:
+        """Send one ``chat.completions.create`` request upstream, with retries.
+
+        With *hedge*, a slow request is raced against a duplicate (see
+        :class:`~common.llm.hedging.HedgePolicy`); each runs its own retries.
+        """
+
+        def _send() -> Any:
+            return self._send_with_retries(
+                lambda **kw: self._get_client().chat.completions.create(**kw),
+                request,
+                deadline,
+                # Racing requests count their attempts separately.
+                None if hedge else stats,
+            )
+
+        if hedge:
+            return self._hedge.call(request["model"], _send)
+        return _send()
+
+    def _send_parse(
+        self, request: dict, deadline: float | None = None, stats: RetryStats | None = None
+    ) -> Any:
+        """Send one ``beta.chat.completions.parse`` request upstream, with retries."""
+        return self._send_with_retries(
+            lambda **kw: self._get_client().beta.chat.completions.parse(**kw),
+            request,
+            deadline,
+            stats,
+        )
+
+    def _send_with_retries(
+        self,
+        send: Callable[..., Any],
+        request: dict,
+        deadline: float | None,
+        stats: RetryStats | None,
+    ) -> Any:
+        def _attempt(timeout: float | None) -> Any:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(request["model"], self._throttle_tokens(request))
+            kwargs = dict(request)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            return send(**kwargs)
+
+        stats = stats if stats is not None else RetryStats()
+        try:
+            response = self._retry_policy.call(
+                _attempt, breaker=self._breaker, deadline=deadline, stats=stats
+            )
+        finally:
+            note_retries(stats.retries)
+        note_usage(getattr(response, "usage", None))
+        return response
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
@@ -40,69 +236,290 @@ class LLMClient:
         messages: list[dict],
         model: str | None = None,
         temperature: float = 0.7,
-        max_tokens: int = 2000,
+        max_tokens: int | None = None,
+        use_cache: bool = True,
+        deadline: float | None = None,
+        call_class: str | None = None,
+        hedge: bool = False,
     ) -> str:
-        """Return the assistant's text reply."""
-        client = self._get_client()
-        used_model = model or self._default_model
-        try:
-            response = client.chat.completions.create(
-                model=used_model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            return response.choices[0].message.content or ""
-        except Exception as exc:
-            logger.error("chat_completion failed: %s", exc)
-            raise
+        """Return the assistant's text reply.
+
+        *call_class* ("classify", "extract", "generate" or "summarize") routes
+        the call to the model and completion cap configured for that class;
+        an explicit *model* or *max_tokens* still wins.
+        Pass ``use_cache=False`` to bypass the response cache for this call;
+        such calls are also never coalesced with concurrent identical ones.
+        *deadline* (seconds) bounds the call including retries; it defaults to
+        ``LLM_CALL_DEADLINE_SECONDS``.
+        Pass ``hedge=True`` on latency-sensitive paths to send a duplicate
+        request when this one is slower than usual; the first reply wins.
+        """
+        used_model, route = self._route(call_class, model)
+        if max_tokens is None:
+            max_tokens = route.max_tokens if route is not None else DEFAULT_MAX_TOKENS
+        # The JSON-mode fallback of structured_completion lands here too; it
+        # belongs to the structured call's record and must not relabel it.
+        nested = current_record() is not None
+        with self._metrics.track(used_model, call_class) as record:
+            key = None
+            if use_cache:
+                key = make_cache_key(used_model, messages, temperature, max_tokens)
+            elif not nested:
+                record.cache = "bypass"
+            if key is not None and self._cache is not None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    record.cache = "hit"
+                    return cached
+
+            request = {
+                "model": used_model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            }
+
+            def _call() -> str:
+                try:
+                    if self._batch is not None:
+                        if not nested:
+                            note(path="batch")
+                        body = self._batch.submit(request).result()
+                        note_usage(body.get("usage"))
+                        content = body["choices"][0]["message"].get("content") or ""
+                    else:
+                        response = self._send_chat(request, deadline=deadline, hedge=hedge)
+                        content = response.choices[0].message.content or ""
+                except Exception as exc:
+                    logger.error("chat_completion failed: %s", exc)
+                    raise
+                if key is not None and self._cache is not None and content:
+                    self._cache.set(key, content)
+                return content
+
+            if key is None or self._single_flight is None:
+                return _call()
+            content, shared = self._single_flight.do(key, _call)
+            if shared:
+                record.cache = "coalesced"
+            return content
 
     def structured_completion(
         self,
         messages: list[dict],
         response_format: type[BaseModel],
         model: str | None = None,
+        use_cache: bool = True,
+        deadline: float | None = None,
+        call_class: str | None = None,
     ) -> BaseModel:
         """Return a parsed Pydantic model from the LLM response.
 
-        Tries OpenAI's beta structured-output endpoint first; falls back to
-        asking for JSON in the prompt and parsing manually.
+        Uses OpenAI's native structured-output endpoint where the model
+        supports it, otherwise JSON mode. The prompt is never sent twice: a
+        reply that fails validation is repaired locally, and if that fails
+        :class:`StructuredOutputError` is raised with the raw text so callers
+        can salvage it. Only successfully validated results are cached.
+        *call_class* routes the call as in :meth:`chat_completion`.
         """
-        client = self._get_client()
-        used_model = model or self._default_model
+        used_model, route = self._route(call_class, model)
+        max_tokens = route.max_tokens if route is not None else None
+        with self._metrics.track(used_model, call_class) as record:
+            key = None
+            if use_cache:
+                key = make_cache_key(
+                    used_model, messages, max_tokens=max_tokens, response_format=response_format
+                )
+            else:
+                record.cache = "bypass"
+            if key is not None and self._cache is not None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    try:
+                        result = response_format.model_validate_json(cached)
+                    except Exception as exc:
+                        logger.debug("Discarding unparseable cache entry: %s", exc)
+                    else:
+                        record.cache = "hit"
+                        return result
 
-        # Attempt 1: openai.beta.chat.completions.parse (SDK >= 1.40)
-        try:
-            response = client.beta.chat.completions.parse(
-                model=used_model,
-                messages=messages,
-                response_format=response_format,
+            def _call() -> BaseModel:
+                result = self._structured_uncached(
+                    messages, response_format, used_model, deadline, max_tokens
+                )
+                if key is not None and self._cache is not None:
+                    self._cache.set(key, result.model_dump_json())
+                return result
+
+            if key is None or self._single_flight is None:
+                return _call()
+            result, shared = self._single_flight.do(key, _call)
+            if not shared:
+                return result
+            record.cache = "coalesced"
+            # Each caller gets its own instance, as it would from the cache.
+            return result.model_copy(deep=True)
+
+    def stream_structured(
+        self,
+        messages: list[dict],
+        response_format: type[BaseModel],
+        field: str,
+        model: str | None = None,
+        use_cache: bool = True,
+        deadline: float | None = None,
+        call_class: str | None = None,
+    ) -> StructuredStream:
+        """Stream a structured completion, yielding elements of its list *field* early.
+
+        The reply is requested in JSON mode with ``stream=True`` and decoded
+        incrementally: each element of ``response_format.<field>`` (a
+        ``list[X]`` field) is validated as ``X`` and yielded as soon as it is
+        complete, so callers can start on it while the rest is generated.
+        After iteration the returned stream's ``result`` holds the whole
+        validated model; if the full reply does not validate,
+        :class:`StructuredOutputError` is raised at the end of iteration.
+
+        Cache hits replay the cached result's elements. Streams are never
+        coalesced. Under a batch queue or cassette the call falls back to
+        :meth:`structured_completion` and yields the elements afterwards.
+        """
+        adapter = TypeAdapter(list_item_type(response_format, field))
+        return StructuredStream(
+            self._stream_structured(
+                messages, response_format, field, adapter, model, use_cache, deadline, call_class
             )
-            parsed = response.choices[0].message.parsed
-            if parsed is not None:
-                return parsed
-        except Exception as exc:
-            logger.debug("structured_completion (beta.parse) failed: %s – falling back", exc)
-
-        # Attempt 2: JSON mode + manual parsing
-        json_messages = list(messages) + [
-            {
-                "role": "system",
-                "content": (
-                    "Respond with valid JSON only that matches the requested schema. "
-                    "Do not include markdown fences or extra text."
-                ),
+        )
+
+    def _stream_structured(
+        self,
+        messages: list[dict],
+        response_format: type[BaseModel],
+        field: str,
+        adapter: TypeAdapter,
+        model: str | None,
+        use_cache: bool,
+        deadline: float | None,
+        call_class: str | None,
+    ) -> Iterator[Any]:
+        if self._batch is not None or self._cassette is not None:
+            result = self.structured_completion(
+                messages,
+                response_format,
+                model=model,
+                use_cache=use_cache,
+                deadline=deadline,
+                call_class=call_class,
+            )
+            yield from getattr(result, field)
+            return result
+
+        used_model, route = self._route(call_class, model)
+        max_tokens = route.max_tokens if route is not None else None
+        with self._metrics.track(used_model, call_class) as record:
+            key = None
+            if use_cache:
+                key = make_cache_key(
+                    used_model, messages, max_tokens=max_tokens, response_format=response_format
+                )
+            else:
+                record.cache = "bypass"
+            if key is not None and self._cache is not None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    try:
+                        result = response_format.model_validate_json(cached)
+                    except Exception as exc:
+                        logger.debug("Discarding unparseable cache entry: %s", exc)
+                    else:
+                        record.cache = "hit"
+                        yield from getattr(result, field)
+                        return result
+
+            request = {
+                "model": used_model,
+                "messages": json_mode_messages(messages),
+                "temperature": 0.2,
+                "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
+                "stream": True,
+                "stream_options": {"include_usage": True},
             }
-        ]
-        try:
-            raw = self.chat_completion(json_messages, model=used_model, temperature=0.2)
-            # Strip possible ```json fences
-            raw = raw.strip()
-            if raw.startswith("```"):
-                raw = raw.split("\n", 1)[-1]
-                raw = raw.rsplit("```", 1)[0]
-            data = json.loads(raw)
-            return response_format.model_validate(data)
-        except Exception as exc:
-            logger.error("structured_completion fallback failed: %s", exc)
-            raise
+            note(path="stream")
+            # Retries cover opening the stream; a failure mid-stream is raised.
+            stream = self._send_chat(request, deadline=deadline)
+            decoder = JsonArrayStream(field)
+            parts: list[str] = []
+            try:
+                for chunk in stream:
+                    note_usage(getattr(chunk, "usage", None))
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content or ""
+                    if not text:
+                        continue
+                    parts.append(text)
+                    for element in decoder.feed(text):
+                        try:
+                            item = adapter.validate_python(element)
+                        except ValidationError as exc:
+                            logger.debug("Skipping invalid streamed %s element: %s", field, exc)
+                            continue
+                        yield item
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+            result = parse_json_reply("".join(parts), response_format)
+            if key is not None and self._cache is not None:
+                self._cache.set(key, result.model_dump_json())
+            return result
+
+    def _structured_uncached(
+        self,
+        messages: list[dict],
+        response_format: type[BaseModel],
+        used_model: str,
+        deadline: float | None = None,
+        max_tokens: int | None = None,
+    ) -> BaseModel:
+        # Native path: openai.beta.chat.completions.parse (SDK >= 1.40). The
+        # batch endpoint only accepts plain create bodies, so batch mode goes
+        # straight to JSON mode, as do models known to reject the schema.
+        if self._batch is None and native_supported(used_model, response_format):
+            request = {
+                "model": used_model,
+                "messages": messages,
+                "response_format": response_format,
+            }
+            if max_tokens is not None:
+                request["max_tokens"] = max_tokens
+            note(path="native")
+            try:
+                response = self._send_parse(request, deadline=deadline)
+            except Exception as exc:
+                partial = truncated_reply(exc)
+                if partial is not None:
+                    note(path="native_repaired")
+                    return parse_json_reply(partial, response_format)
+                if not is_unsupported_error(exc):
+                    raise
+                mark_native_unsupported(used_model, response_format)
+            else:
+                message = response.choices[0].message
+                if message.parsed is not None:
+                    return message.parsed
+                note(path="native_repaired")
+                raw = message.content or getattr(message, "refusal", None) or ""
+                return parse_json_reply(raw, response_format)
+
+        # JSON mode + local repair
+        note(path="json_mode")
+        raw = self.chat_completion(
+            json_mode_messages(messages),
+            model=used_model,
+            temperature=0.2,
+            max_tokens=max_tokens,
+            use_cache=False,
+            deadline=deadline,
+        )
+        return parse_json_reply(raw, response_format)
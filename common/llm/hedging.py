@@ -0,0 +1,226 @@
+"""Hedged requests: race a duplicate against a slow LLM call to cut tail latency."""
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Hedged requests run on their own threads so the caller can wait on both.
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgePolicy:
+    """Fires a duplicate request when a call is slower than most recent calls.
+
+    Successful request latencies are kept per model (the last ``window``).
+    Once ``min_samples`` are known, a call that has not returned after the
+    ``percentile`` latency (but at least ``min_delay`` seconds) gets a second,
+    identical request; whichever succeeds first wins and the other is
+    cancelled. At most ``max_rate`` of the last ``window`` calls are hedged,
+    so a provider-wide slowdown cannot double the load; ``max_rate=0``
+    disables hedging.
+
+    Async losers are cancelled, which closes their connection. A sync loser
+    cannot be interrupted: it finishes in the background and is discarded.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_rate: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay: float = 0.05,
+    ) -> None:
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._latencies: dict[str, collections.deque[float]] = collections.defaultdict(
+            lambda: collections.deque(maxlen=window)
+        )
+        # Recent calls (False) and the hedges fired for them (True).
+        self._recent: collections.deque[bool] = collections.deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.hedges_capped = 0
+
+    def hedge_delay(self, model: str) -> float | None:
+        """Seconds to wait before hedging a call to *model*, or None while warming up."""
+        with self._lock:
+            samples = sorted(self._latencies[model])
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(self.percentile * len(samples)))
+        return max(self.min_delay, samples[index])
+
+    def observe(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies[model].append(seconds)
+
+    def call(self, model: str, fn: Callable[[], T]) -> T:
+        """Run ``fn()``, hedging it with a second ``fn()`` if it is slow."""
+        delay = self._start_call(model)
+        if delay is None:
+            return self._timed(model, fn)
+        primary = self._submit(model, fn)
+        # wait() rather than result(timeout=...): the call may raise TimeoutError itself.
+        done, _ = concurrent.futures.wait({primary}, timeout=delay)
+        if done or not self._allow_hedge():
+            return primary.result()
+        logger.debug("Hedging %s call after %.2fs", model, delay)
+        secondary = self._submit(model, fn)
+        pending = {primary, secondary}
+        error: BaseException | None = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    self._record_winner(future is secondary)
+                    return future.result()
+                if error is None or future is primary:
+                    error = future.exception()
+        raise error
+
+    async def acall(self, model: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async version of :meth:`call`."""
+        delay = self._start_call(model)
+        if delay is None:
+            started = time.monotonic()
+            result = await fn()
+            self.observe(model, time.monotonic() - started)
+            return result
+        primary = self._spawn(model, fn)
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self._allow_hedge():
+                return await primary
+            logger.debug("Hedging %s call after %.2fs", model, delay)
+            secondary = self._spawn(model, fn)
+            pending.add(secondary)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record_winner(task is secondary)
+                        return task.result()
+                    if error is None or task is primary:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "hedges_capped": self.hedges_capped,
+                "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+                "win_rate": round(self.hedges_won / self.hedges, 4) if self.hedges else 0.0,
+            }
+
+    def to_prometheus(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, key, help_text in (
+            ("llm_hedge_calls_total", "calls", "Calls made with hedging enabled."),
+            ("llm_hedges_total", "hedges", "Duplicate requests fired for slow calls."),
+            ("llm_hedges_won_total", "hedges_won", "Hedges that returned before the original."),
+            ("llm_hedges_capped_total", "hedges_capped", "Hedges skipped by the rate cap."),
+        ):
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {stats[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    # ------------------------------------------------------------------
+
+    def _start_call(self, model: str) -> float | None:
+        delay = self.hedge_delay(model) if self.max_rate > 0 else None
+        with self._lock:
+            self.calls += 1
+            self._recent.append(False)
+        return delay
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            hedged = sum(self._recent)
+            if hedged + 1 > self.max_rate * (len(self._recent) - hedged):
+                self.hedges_capped += 1
+                return False
+            self._recent.append(True)
+            self.hedges += 1
+            return True
+
+    def _record_winner(self, hedge_won: bool) -> None:
+        if hedge_won:
+            with self._lock:
+                self.hedges_won += 1
+
+    def _timed(self, model: str, fn: Callable[[], T]) -> T:
+        started = time.monotonic()
+        result = fn()
+        self.observe(model, time.monotonic() - started)
+        return result
+
+    def _submit(self, model: str, fn: Callable[[], T]) -> concurrent.futures.Future:
+        # Each request gets its own copy of the caller's context, so metrics
+        # and first-byte hooks still see the caller's call record.
+        context = contextvars.copy_context()
+        started = time.monotonic()
+        future = _EXECUTOR.submit(context.run, fn)
+        future.add_done_callback(lambda f: self._observe_done(model, started, f))
+        return future
+
+    def _spawn(self, model: str, fn: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        started = time.monotonic()
+        task = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda t: self._observe_done(model, started, t))
+        return task
+
+    def _observe_done(self, model: str, started: float, future: Any) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self.observe(model, time.monotonic() - started)
+
+
+_SHARED_POLICY: HedgePolicy | None = None
+_SHARED_POLICY_LOCK = threading.Lock()
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """Return the process-wide HedgePolicy configured from settings."""
+    global _SHARED_POLICY
+    with _SHARED_POLICY_LOCK:
+        if _SHARED_POLICY is None:
+            from common.config import get_settings
+
+            settings = get_settings()
+            _SHARED_POLICY = HedgePolicy(
+                percentile=settings.llm_hedge_percentile,
+                max_rate=settings.llm_hedge_max_rate,
+                min_samples=settings.llm_hedge_min_samples,
+            )
+        return _SHARED_POLICY
@@ -0,0 +1,394 @@
+"""Per-call LLM instrumentation with Prometheus and JSON export."""
+from __future__ import annotations
+
+import bisect
+import collections
+import contextlib
+import contextvars
+import dataclasses
+import math
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+# Latency buckets in seconds, from cache hits to long generations.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_LABELS = ("bot", "call_site", "model")
+
+
+@dataclasses.dataclass
+class CallRecord:
+    """One public LLMClient call, from entry to return or raise."""
+
+    bot: str
+    call_site: str
+    model: str
+    call_class: str = ""
+    started_at: float = dataclasses.field(default_factory=time.monotonic)
+    first_byte_at: float | None = None
+    total_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    path: str = "chat"
+    cache: str = "miss"
+    outcome: str = "ok"
+
+    @property
+    def ttfb_seconds(self) -> float:
+        """Time to the first response byte, or the total when no response arrived."""
+        if self.first_byte_at is None:
+            return self.total_seconds
+        return max(0.0, self.first_byte_at - self.started_at)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = dataclasses.asdict(self)
+        del data["started_at"], data["first_byte_at"]
+        data["ttfb_seconds"] = round(self.ttfb_seconds, 4)
+        data["total_seconds"] = round(self.total_seconds, 4)
+        return data
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == math.inf else _format_number(bound), total))
+        return rows
+
+
+class RunMetrics:
+    """The calls made during one bot run, summarised into its saved output."""
+
+    def __init__(self, bot: str) -> None:
+        self.bot = bot
+        self.records: list[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: CallRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            return summarize(self.records)
+
+
+class MetricsRegistry:
+    """In-memory counters and histograms over every recorded LLM call.
+
+    ``keep_records`` recent records are retained for :meth:`summary`; the
+    counters and histograms behind :meth:`to_prometheus` cover all calls.
+    """
+
+    def __init__(self, keep_records: int = 10_000) -> None:
+        self._lock = threading.Lock()
+        self._records: collections.deque[CallRecord] = collections.deque(maxlen=keep_records)
+        self._calls: collections.Counter[tuple[str, ...]] = collections.Counter()
+        self._tokens: collections.Counter[tuple[str, ...]] = collections.Counter()
+        self._retries: collections.Counter[tuple[str, ...]] = collections.Counter()
+        self._latency: dict[tuple[str, ...], Histogram] = {}
+        self._ttfb: dict[tuple[str, ...], Histogram] = {}
+
+    @contextlib.contextmanager
+    def track(self, model: str, call_class: str | None = None) -> Iterator[CallRecord]:
+        """Record the enclosed call; nested calls add to the outer record.
+
+        Nesting happens when the structured path falls back to JSON mode
+        through ``chat_completion``: that is one logical call, not two.
+        """
+        outer = _CURRENT_RECORD.get()
+        if outer is not None:
+            yield outer
+            return
+        run = _CURRENT_RUN.get()
+        record = CallRecord(
+            bot=run.bot if run is not None else "-",
+            call_site=_call_site(),
+            model=model,
+            call_class=call_class or "",
+        )
+        token = _CURRENT_RECORD.set(record)
+        try:
+            yield record
+        except BaseException:
+            record.outcome = "error"
+            raise
+        finally:
+            _CURRENT_RECORD.reset(token)
+            record.total_seconds = time.monotonic() - record.started_at
+            self.record(record)
+            if run is not None:
+                run.add(record)
+
+    def record(self, record: CallRecord) -> None:
+        labels = (record.bot, record.call_site, record.model)
+        with self._lock:
+            self._records.append(record)
+            self._calls[labels + (record.path, record.cache, record.outcome)] += 1
+            self._tokens[labels + ("prompt",)] += record.prompt_tokens
+            self._tokens[labels + ("completion",)] += record.completion_tokens
+            self._tokens[labels + ("cached",)] += record.cached_tokens
+            self._retries[labels] += record.retries
+            if record.cache != "hit":
+                self._latency.setdefault(labels, Histogram()).observe(record.total_seconds)
+                self._ttfb.setdefault(labels, Histogram()).observe(record.ttfb_seconds)
+
+    def summary(self, bot: str | None = None) -> dict[str, Any]:
+        """JSON-friendly summary of the retained records, optionally for one bot."""
+        with self._lock:
+            records = [r for r in self._records if bot is None or r.bot == bot]
+        return summarize(records)
+
+    def to_prometheus(self) -> str:
+        """Render all counters and histograms in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            _counter(
+                lines,
+                "llm_calls_total",
+                "LLM calls by fallback path, cache status and outcome.",
+                _LABELS + ("path", "cache", "outcome"),
+                self._calls,
+            )
+            _counter(
+                lines,
+                "llm_tokens_total",
+                "Prompt, completion and provider-cached prompt tokens.",
+                _LABELS + ("kind",),
+                self._tokens,
+            )
+            _counter(lines, "llm_retries_total", "Retried LLM attempts.", _LABELS, self._retries)
+            _histogram(
+                lines,
+                "llm_call_duration_seconds",
+                "Total LLM call latency including retries (cache hits excluded).",
+                self._latency,
+            )
+            _histogram(
+                lines,
+                "llm_time_to_first_byte_seconds",
+                "Time from call start to the first response byte.",
+                self._ttfb,
+            )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._calls.clear()
+            self._tokens.clear()
+            self._retries.clear()
+            self._latency.clear()
+            self._ttfb.clear()
+
+
+# ---------------------------------------------------------------------------
+# Call context
+# ---------------------------------------------------------------------------
+
+_CURRENT_RECORD: contextvars.ContextVar[CallRecord | None] = contextvars.ContextVar(
+    "llm_call_record", default=None
+)
+_CURRENT_RUN: contextvars.ContextVar[RunMetrics | None] = contextvars.ContextVar(
+    "llm_bot_run", default=None
+)
+
+# Frames from these modules are skipped when looking for the calling bot method.
+_INTERNAL_MODULES = ("common.llm", "asyncio", "contextlib", "concurrent.futures", "threading")
+
+
+@contextlib.contextmanager
+def bot_scope(bot: str) -> Iterator[RunMetrics]:
+    """Attribute LLM calls made inside the block (and its tasks) to *bot*."""
+    run = RunMetrics(bot)
+    token = _CURRENT_RUN.set(run)
+    try:
+        yield run
+    finally:
+        _CURRENT_RUN.reset(token)
+
+
+def current_run() -> RunMetrics | None:
+    return _CURRENT_RUN.get()
+
+
+def current_record() -> CallRecord | None:
+    return _CURRENT_RECORD.get()
+
+
+def note_usage(usage: Any) -> None:
+    """Add a response's ``usage`` (SDK object or batch dict) to the current record."""
+    record = _CURRENT_RECORD.get()
+    if record is None or usage is None:
+        return
+    if isinstance(usage, dict):
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+    else:
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    record.prompt_tokens += prompt or 0
+    record.completion_tokens += completion or 0
+    record.cached_tokens += cached or 0
+
+
+def note(**fields: Any) -> None:
+    """Set fields (``path``, ``cache``) on the current record, if any."""
+    record = _CURRENT_RECORD.get()
+    if record is not None:
+        for name, value in fields.items():
+            setattr(record, name, value)
+
+
+def note_retries(retries: int) -> None:
+    record = _CURRENT_RECORD.get()
+    if record is not None:
+        record.retries += retries
+
+
+def mark_first_byte(*_: Any) -> None:
+    """httpx response hook: the response headers of the current call have arrived."""
+    record = _CURRENT_RECORD.get()
+    if record is not None:
+        record.first_byte_at = time.monotonic()
+
+
+async def amark_first_byte(*_: Any) -> None:
+    mark_first_byte()
+
+
+def _call_site() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_INTERNAL_MODULES):
+            return frame.f_code.co_qualname
+        frame = frame.f_back
+    return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Summaries and exposition
+# ---------------------------------------------------------------------------
+
+
+def summarize(records: list[CallRecord]) -> dict[str, Any]:
+    """Totals plus per-call-site latency percentiles for *records*."""
+    by_site: dict[str, list[CallRecord]] = collections.defaultdict(list)
+    for record in records:
+        by_site[record.call_site].append(record)
+    return {
+        **_totals(records),
+        "call_sites": {
+            site: {
+                **_totals(group),
+                "models": sorted({r.model for r in group}),
+                "paths": dict(collections.Counter(r.path for r in group)),
+                "total_seconds": _distribution([r.total_seconds for r in group]),
+                "ttfb_seconds": _distribution([r.ttfb_seconds for r in group]),
+            }
+            for site, group in sorted(
+                by_site.items(), key=lambda item: -sum(r.total_seconds for r in item[1])
+            )
+        },
+    }
+
+
+def _totals(records: list[CallRecord]) -> dict[str, Any]:
+    prompt_tokens = sum(r.prompt_tokens for r in records)
+    cached_tokens = sum(r.cached_tokens for r in records)
+    return {
+        "calls": len(records),
+        "errors": sum(r.outcome != "ok" for r in records),
+        "cache_hits": sum(r.cache == "hit" for r in records),
+        "coalesced": sum(r.cache == "coalesced" for r in records),
+        "retries": sum(r.retries for r in records),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": sum(r.completion_tokens for r in records),
+        "cached_tokens": cached_tokens,
+        # Share of prompt tokens served from the provider's prompt cache.
+        "prompt_cache_ratio": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+        "seconds": round(sum(r.total_seconds for r in records), 3),
+    }
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+
+    def _pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4)
+
+    return {"p50": _pct(0.5), "p95": _pct(0.95), "max": round(ordered[-1], 4)}
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _label_text(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _counter(
+    lines: list[str],
+    name: str,
+    help_text: str,
+    label_names: tuple[str, ...],
+    values: collections.Counter[tuple[str, ...]],
+) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_label_text(label_names, labels)} {value}")
+
+
+def _histogram(
+    lines: list[str], name: str, help_text: str, values: dict[tuple[str, ...], Histogram]
+) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in sorted(values.items()):
+        for bound, count in histogram.cumulative():
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_label_text(_LABELS, labels, le)} {count}")
+        lines.append(f"{name}_sum{_label_text(_LABELS, labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_label_text(_LABELS, labels)} {histogram.count}")
+
+
+_SHARED_METRICS: MetricsRegistry | None = None
+_SHARED_METRICS_LOCK = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide MetricsRegistry."""
+    global _SHARED_METRICS
+    with _SHARED_METRICS_LOCK:
+        if _SHARED_METRICS is None:
+            _SHARED_METRICS = MetricsRegistry()
+        return _SHARED_METRICS
@@ -0,0 +1,130 @@
+"""Packing of many small, homogeneous prompts into one LLM call."""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from common.llm.structured import repair_json
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+_PACK_INSTRUCTIONS = """You will receive {count} independent tasks, numbered from 0.
+Complete every task on its own; do not let one task influence another.
+
+Return a JSON object with key "results" containing one entry per task, each with:
+- "index": the task number
+- "result": the JSON object that task asks for, matching this schema:
+{schema}
+
+Respond with valid JSON only.
+"""
+
+
+def packed_completion(
+    llm: Any,
+    prompts: list[str],
+    item_schema: type[M],
+    *,
+    model: str | None = None,
+    temperature: float = 0.7,
+    call_class: str | None = None,
+    instructions: str | None = None,
+    max_items_per_call: int = 20,
+    max_tokens_per_item: int = 500,
+    max_rounds: int = 2,
+) -> list[M | None]:
+    """Answer many small *prompts* with as few LLM calls as possible.
+
+    The prompts are sent together, asking for an indexed array of results.
+    Each result is validated against *item_schema* on its own. Only the
+    items that are missing or invalid are re-sent, in the next round. The
+    returned list is aligned with *prompts*; items still failing after
+    *max_rounds* are None.
+
+    *instructions* shared by every prompt are sent once, as the system
+    message, so each prompt only needs to carry its own data.
+
+    *llm* is an :class:`~common.llm.client.LLMClient`; the call goes through
+    its usual routing, cache, retries and metrics. A call never asks for
+    more than the routed call class's ``max_tokens``: fewer items are packed
+    into each call instead.
+    """
+    cap = llm.completion_cap(call_class)
+    max_items_per_call = max(1, min(max_items_per_call, cap // max_tokens_per_item))
+    results: list[M | None] = [None] * len(prompts)
+    pending = list(range(len(prompts)))
+    for round_number in range(max_rounds):
+        if not pending:
+            break
+        failed: list[int] = []
+        for start in range(0, len(pending), max_items_per_call):
+            chunk = pending[start : start + max_items_per_call]
+            failed.extend(
+                _complete_chunk(
+                    llm,
+                    prompts,
+                    chunk,
+                    item_schema,
+                    results,
+                    model=model,
+                    temperature=temperature,
+                    call_class=call_class,
+                    instructions=instructions,
+                    max_tokens=min(cap, max_tokens_per_item * len(chunk)),
+                    # A cached reply is what failed; re-issued rounds must reach the model.
+                    use_cache=round_number == 0,
+                )
+            )
+        if failed and round_number + 1 < max_rounds:
+            logger.debug("Re-issuing %d of %d packed items", len(failed), len(pending))
+        pending = failed
+    if pending:
+        logger.warning("%d of %d packed items failed validation", len(pending), len(prompts))
+    return results
+
+
+def _complete_chunk(
+    llm: Any,
+    prompts: list[str],
+    chunk: list[int],
+    item_schema: type[M],
+    results: list[M | None],
+    instructions: str | None = None,
+    **call_kwargs: Any,
+) -> list[int]:
+    """Send the prompts at indices *chunk* as one call; fill *results*, return failures."""
+    schema = json.dumps(item_schema.model_json_schema(), separators=(",", ":"))
+    tasks = "\n\n".join(f"### Task {n}\n{prompts[index]}" for n, index in enumerate(chunk))
+    content = _PACK_INSTRUCTIONS.format(count=len(chunk), schema=schema) + "\n" + tasks
+    messages = [{"role": "user", "content": content}]
+    if instructions:
+        messages.insert(0, {"role": "system", "content": instructions.strip()})
+    try:
+        raw = llm.chat_completion(messages, **call_kwargs)
+        data = repair_json(raw)
+    except Exception as exc:
+        logger.error("Packed call for %d items failed: %s", len(chunk), exc)
+        return chunk
+
+    entries = data.get("results", []) if isinstance(data, dict) else data
+    done: set[int] = set()
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        n = entry.get("index")
+        if not isinstance(n, int) or not 0 <= n < len(chunk) or n in done:
+            continue
+        # Tolerate results flattened into the entry instead of nested under "result".
+        payload = entry.get("result", {k: v for k, v in entry.items() if k != "index"})
+        try:
+            results[chunk[n]] = item_schema.model_validate(payload)
+        except ValidationError as exc:
+            logger.debug("Packed item %d invalid: %s", n, exc)
+            continue
+        done.add(n)
+    return [index for n, index in enumerate(chunk) if n not in done]
@@ -0,0 +1,85 @@
+"""Prefix-stable prompt layout: static instructions first, variable data last.
+
+Providers cache the longest prompt prefix they have seen recently, so a
+prompt only benefits when everything before its first per-request value is
+byte-identical between calls. :class:`PromptTemplate` keeps instructions and
+output schemas in a fixed prefix and appends the request's data after it,
+serialised deterministically.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+from typing import Any
+
+from common.llm.budget import PromptBudget, Section
+from common.llm.tokens import estimate_tokens
+
+DATA_HEADER = "## Input"
+
+
+def stable_json(value: Any) -> str:
+    """Serialise *value* the same way every time: sorted keys, compact separators."""
+    return json.dumps(
+        value, ensure_ascii=False, default=str, sort_keys=True, separators=(",", ":")
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class PromptTemplate:
+    """Static *instructions* followed by labelled data *fields* in a fixed order.
+
+    ``fields`` pairs each value name with the label shown to the model.
+    Values may be text, JSON-serialisable objects (see :func:`stable_json`)
+    or :class:`~common.llm.budget.Section` instances, which are trimmed to
+    the *budget* passed to :meth:`render`.
+    """
+
+    instructions: str
+    fields: tuple[tuple[str, str], ...] = ()
+
+    def render(self, budget: PromptBudget | None = None, **values: Any) -> str:
+        return self._compose(self._field_text(budget, values))
+
+    def render_input(self, budget: PromptBudget | None = None, **values: Any) -> str:
+        """Just the data part of :meth:`render`, for prompts whose instructions go elsewhere.
+
+        Used with :func:`~common.llm.packing.packed_completion`, which sends
+        the shared *instructions* once as the system message.
+        """
+        return self._compose(self._field_text(budget, values), with_instructions=False)
+
+    def _field_text(self, budget: PromptBudget | None, values: dict[str, Any]) -> dict[str, str]:
+        names = [name for name, _ in self.fields]
+        missing = set(names) - set(values)
+        unknown = set(values) - set(names)
+        if missing or unknown:
+            raise KeyError(
+                f"Prompt values do not match its fields "
+                f"(missing {sorted(missing)}, unexpected {sorted(unknown)})"
+            )
+        sections = {name: v for name, v in values.items() if isinstance(v, Section)}
+        text = {
+            name: v if isinstance(v, str) else stable_json(v)
+            for name, v in values.items()
+            if not isinstance(v, Section)
+        }
+        if sections:
+            budget = budget or PromptBudget()
+            # A newline reserves the quoting a multi-line section is rendered with.
+            skeleton = self._compose({**text, **dict.fromkeys(sections, "\n")})
+            base = estimate_tokens(skeleton, budget.model)
+            text.update(budget.fit(sections, budget.max_tokens - base))
+        return text
+
+    def _compose(self, text: dict[str, str], with_instructions: bool = True) -> str:
+        if not self.fields:
+            return self.instructions.strip() + "\n" if with_instructions else ""
+        lines = [self.instructions.strip(), "", DATA_HEADER] if with_instructions else [DATA_HEADER]
+        for name, label in self.fields:
+            value = text[name]
+            if "\n" in value:
+                lines += [f"{label}:", '"""', value, '"""']
+            else:
+                lines.append(f"{label}: {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,197 @@
+"""Token-bucket rate limiting for requests-per-minute and tokens-per-minute budgets."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """A continuously refilling bucket that hands out reservations.
+
+    :meth:`reserve` always succeeds immediately by letting the level go
+    negative; the returned wait time is how long the caller must sleep before
+    the reservation is covered. This keeps callers first-come-first-served
+    without a background refill thread.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else float(per_minute)
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount: float, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        # A single request larger than the whole budget would otherwise wait forever.
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+class RateLimiter:
+    """Per-model RPM/TPM budgets shared by every LLMClient in the process.
+
+    A limit of 0 disables that dimension. ``per_model`` overrides the default
+    ``(rpm, tpm)`` pair for specific model names.
+    """
+
+    def __init__(
+        self,
+        rpm: int = 0,
+        tpm: int = 0,
+        per_model: dict[str, tuple[int, int]] | None = None,
+    ) -> None:
+        self._default = (rpm, tpm)
+        self._per_model = dict(per_model or {})
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def limits_for(self, model: str) -> tuple[int, int]:
+        return self._per_model.get(model, self._default)
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Reserve one request and *tokens* tokens; return the seconds to wait."""
+        rpm, tpm = self.limits_for(model)
+        wait = 0.0
+        if rpm > 0:
+            wait = max(wait, self._reserve_bucket(model, "requests", rpm, 1))
+        if tpm > 0:
+            wait = max(wait, self._reserve_bucket(model, "tokens", tpm, tokens))
+        if wait > 0:
+            with self._lock:
+                self.waits += 1
+                self.wait_seconds += wait
+            logger.debug("Rate limit: waiting %.2fs for %s", wait, model)
+        return wait
+
+    def acquire(self, model: str, tokens: int) -> float:
+        """Block until the reservation is covered; return the time waited."""
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, model: str, tokens: int) -> float:
+        """Async version of :meth:`acquire`."""
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> dict[str, Any]:
+        return {"waits": self.waits, "wait_seconds": round(self.wait_seconds, 3)}
+
+    # ------------------------------------------------------------------
+
+    def _reserve_bucket(self, model: str, kind: str, per_minute: int, amount: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get((model, kind))
+            if bucket is None:
+                bucket = TokenBucket(per_minute)
+                self._buckets[(model, kind)] = bucket
+            return bucket.reserve(amount)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """RateLimiter whose buckets live in a SQLite file shared by several processes.
+
+    Each reservation is a single ``BEGIN IMMEDIATE`` transaction, so worker
+    processes on the same host draw from one budget.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        rpm: int = 0,
+        tpm: int = 0,
+        per_model: dict[str, tuple[int, int]] | None = None,
+    ) -> None:
+        super().__init__(rpm=rpm, tpm=tpm, per_model=per_model)
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self._path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "model TEXT NOT NULL, kind TEXT NOT NULL, level REAL NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (model, kind))"
+        )
+
+    def _reserve_bucket(self, model: str, kind: str, per_minute: int, amount: float) -> float:
+        # Wall-clock time, since monotonic clocks are not comparable across processes.
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT level, updated_at FROM rate_buckets WHERE model = ? AND kind = ?",
+                    (model, kind),
+                ).fetchone()
+                bucket = TokenBucket(per_minute)
+                if row is not None:
+                    bucket.level, bucket.updated_at = row
+                else:
+                    bucket.updated_at = now
+                wait = bucket.reserve(amount, now=now)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (model, kind, level, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (model, kind, bucket.level, bucket.updated_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+
+def parse_model_limits(spec: str) -> dict[str, tuple[int, int]]:
+    """Parse ``"gpt-4o=500:300000,gpt-4o-mini=5000:2000000"`` into per-model limits."""
+    limits: dict[str, tuple[int, int]] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(rpm or 0), int(tpm or 0))
+    return limits
+
+
+_SHARED_LIMITER: RateLimiter | None = None
+_SHARED_LIMITER_LOCK = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """Return the process-wide RateLimiter from settings, or None if no limits are set."""
+    global _SHARED_LIMITER
+    from common.config import get_settings
+
+    settings = get_settings()
+    per_model = parse_model_limits(settings.llm_model_rate_limits)
+    if not (settings.llm_rpm_limit or settings.llm_tpm_limit or per_model):
+        return None
+    with _SHARED_LIMITER_LOCK:
+        if _SHARED_LIMITER is None:
+            if settings.llm_rate_limit_path:
+                _SHARED_LIMITER = SQLiteRateLimiter(
+                    settings.llm_rate_limit_path,
+                    rpm=settings.llm_rpm_limit,
+                    tpm=settings.llm_tpm_limit,
+                    per_model=per_model,
+                )
+            else:
+                _SHARED_LIMITER = RateLimiter(
+                    rpm=settings.llm_rpm_limit,
+                    tpm=settings.llm_tpm_limit,
+                    per_model=per_model,
+                )
+        return _SHARED_LIMITER
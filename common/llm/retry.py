@@ -0,0 +1,310 @@
+"""Retry policy, error classification and circuit breaking for LLM calls."""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors.
+_RETRYABLE_STATUSES = {408, 409, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call's deadline leaves no time for another attempt."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for transient provider/network errors, False for fatal ones.
+
+    Fatal errors (bad request, auth, permissions, not found, validation)
+    will fail the same way on every attempt and are raised immediately.
+    """
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRYABLE_STATUSES or status >= 500
+    try:
+        import openai
+
+        if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+            return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Return the provider's requested delay from Retry-After headers, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+@dataclasses.dataclass
+class RetryStats:
+    """Per-call retry accounting, filled in by :meth:`RetryPolicy.call`."""
+
+    attempts: int = 0
+    retries: int = 0
+    backoff_seconds: float = 0.0
+
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures, then probes for recovery.
+
+    After ``failure_threshold`` consecutive retryable failures the circuit
+    opens and calls raise :class:`CircuitOpenError` for ``reset_timeout``
+    seconds. The first call after that is let through as a probe; success
+    closes the circuit, failure re-opens it. A probe that never finishes
+    (cancelled, interrupted) is abandoned so the next call can probe instead.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self._reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call must fail fast; return True for a probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self._reset_timeout or self._probing:
+                raise CircuitOpenError("LLM provider circuit is open; failing fast")
+            self._probing = True
+            return True
+
+    def abandon_probe(self) -> None:
+        """Forget a probe that ended without a result; the circuit stays half-open."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self._threshold):
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+            self._probing = False
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, Retry-After support and a deadline."""
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    deadline: float | None = 120.0
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self.total_retries = 0
+        self.total_backoff_seconds = 0.0
+        self.giveups = 0
+
+    def backoff(self, retry_number: int) -> float:
+        """Full-jitter delay before retry number *retry_number* (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**retry_number)))
+
+    def call(
+        self,
+        fn: Callable[[float | None], T],
+        breaker: CircuitBreaker | None = None,
+        deadline: float | None = None,
+        stats: RetryStats | None = None,
+    ) -> T:
+        """Call ``fn(timeout)`` until it succeeds, a fatal error occurs or time runs out.
+
+        *timeout* is the time remaining before the deadline (None if unbounded),
+        for the caller to pass on as the request timeout.
+        """
+        stats = stats if stats is not None else RetryStats()
+        end = self._end_time(deadline)
+        while True:
+            probe = breaker.before_call() if breaker is not None else False
+            stats.attempts += 1
+            try:
+                result = fn(self._remaining(end))
+            except Exception as exc:
+                delay = self._handle_failure(exc, breaker, stats, end)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                if probe and breaker is not None:
+                    breaker.abandon_probe()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[float | None], Awaitable[T]],
+        breaker: CircuitBreaker | None = None,
+        deadline: float | None = None,
+        stats: RetryStats | None = None,
+    ) -> T:
+        """Async version of :meth:`call`."""
+        stats = stats if stats is not None else RetryStats()
+        end = self._end_time(deadline)
+        while True:
+            probe = breaker.before_call() if breaker is not None else False
+            stats.attempts += 1
+            try:
+                result = await fn(self._remaining(end))
+            except Exception as exc:
+                delay = self._handle_failure(exc, breaker, stats, end)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if probe and breaker is not None:
+                    breaker.abandon_probe()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "retries": self.total_retries,
+            "backoff_seconds": round(self.total_backoff_seconds, 3),
+            "giveups": self.giveups,
+        }
+
+    # ------------------------------------------------------------------
+
+    def _end_time(self, deadline: float | None) -> float | None:
+        budget = deadline if deadline is not None else self.deadline
+        return None if budget is None else time.monotonic() + budget
+
+    @staticmethod
+    def _remaining(end: float | None) -> float | None:
+        return None if end is None else max(0.0, end - time.monotonic())
+
+    def _handle_failure(
+        self,
+        exc: Exception,
+        breaker: CircuitBreaker | None,
+        stats: RetryStats,
+        end: float | None,
+    ) -> float:
+        """Decide whether to retry *exc*; return the delay or re-raise."""
+        if not is_retryable(exc):
+            # The provider answered, so it is up; the request itself is at fault.
+            if breaker is not None:
+                breaker.record_success()
+            raise exc
+        if breaker is not None:
+            breaker.record_failure()
+        if stats.attempts >= self.max_attempts:
+            with self._lock:
+                self.giveups += 1
+            raise exc
+        delay = self.backoff(stats.retries)
+        requested = retry_after_seconds(exc)
+        if requested is not None:
+            delay = max(delay, requested)
+        remaining = self._remaining(end)
+        if remaining is not None and delay >= remaining:
+            with self._lock:
+                self.giveups += 1
+            raise DeadlineExceededError(
+                f"LLM call deadline exceeded after {stats.attempts} attempt(s)"
+            ) from exc
+        logger.warning(
+            "LLM call failed (%s); retry %d in %.2fs", exc, stats.retries + 1, delay
+        )
+        stats.retries += 1
+        stats.backoff_seconds += delay
+        with self._lock:
+            self.total_retries += 1
+            self.total_backoff_seconds += delay
+        return delay
+
+
+_SHARED_BREAKER: CircuitBreaker | None = None
+_SHARED_BREAKER_LOCK = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker for the LLM provider."""
+    global _SHARED_BREAKER
+    with _SHARED_BREAKER_LOCK:
+        if _SHARED_BREAKER is None:
+            from common.config import get_settings
+
+            settings = get_settings()
+            _SHARED_BREAKER = CircuitBreaker(
+                failure_threshold=settings.llm_breaker_failure_threshold,
+                reset_timeout=settings.llm_breaker_reset_seconds,
+            )
+        return _SHARED_BREAKER
+
+
+def retry_policy_from_settings() -> RetryPolicy:
+    from common.config import get_settings
+
+    settings = get_settings()
+    return RetryPolicy(
+        max_attempts=settings.llm_max_attempts,
+        base_delay=settings.llm_retry_base_delay,
+        max_delay=settings.llm_retry_max_delay,
+        deadline=settings.llm_call_deadline_seconds or None,
+    )
@@ -0,0 +1,45 @@
+"""Routing of named call classes to models and completion token limits."""
+from __future__ import annotations
+
+import dataclasses
+
+# Short label/decision outputs, structured extraction from given text,
+# long-form writing, and condensing existing material, respectively.
+CALL_CLASSES = ("classify", "extract", "generate", "summarize")
+
+
+@dataclasses.dataclass(frozen=True)
+class Route:
+    """Model and completion cap for one call class; empty model means the client default."""
+
+    model: str = ""
+    max_tokens: int = 2000
+
+
+def routes_from_settings() -> dict[str, Route]:
+    """Return the configured Route for every call class."""
+    from common.config import get_settings
+
+    settings = get_settings()
+    return {
+        name: Route(
+            model=getattr(settings, f"llm_{name}_model"),
+            max_tokens=getattr(settings, f"llm_{name}_max_tokens"),
+        )
+        for name in CALL_CLASSES
+    }
+
+
+def resolve_route(routes: dict[str, Route], call_class: str | None) -> Route | None:
+    """Return the Route for *call_class*, None for unrouted calls.
+
+    Raises ValueError for an unknown class, which is always a programming error.
+    """
+    if call_class is None:
+        return None
+    try:
+        return routes[call_class]
+    except KeyError:
+        raise ValueError(
+            f"Unknown call class {call_class!r}; expected one of {', '.join(CALL_CLASSES)}"
+        ) from None
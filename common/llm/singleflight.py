@@ -0,0 +1,124 @@
+"""Single-flight coalescing of identical in-flight LLM requests."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One upstream call that any number of threads can wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one upstream call.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait and receive the same result or
+    exception. Once the call finishes the key is forgotten, so later callers
+    start a fresh call (or hit the response cache).
+
+    Threads and asyncio tasks are coalesced separately: :meth:`do` groups
+    threads, :meth:`ado` groups tasks on the same event loop.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._tasks: dict[tuple[int, str], asyncio.Task] = {}
+        self.calls = 0
+        self.saved_calls = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run ``fn()`` once per key among concurrent callers.
+
+        Returns ``(result, shared)``; *shared* is True for callers that were
+        served by another caller's call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.saved_calls += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Async version of :meth:`do`.
+
+        The call runs in its own task, so cancelling one waiter does not
+        cancel the request for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            shared = task is not None
+            if shared:
+                self.saved_calls += 1
+            else:
+                task = loop.create_task(fn())
+                self._tasks[task_key] = task
+                self.calls += 1
+                task.add_done_callback(lambda _: self._forget(task_key))
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "saved_calls": self.saved_calls,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+    def _forget(self, task_key: tuple[int, str]) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+
+_SHARED_GROUP: SingleFlight | None = None
+_SHARED_GROUP_LOCK = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight | None:
+    """Return the process-wide SingleFlight group, or None when disabled in settings."""
+    global _SHARED_GROUP
+    from common.config import get_settings
+
+    if not get_settings().llm_single_flight_enabled:
+        return None
+    with _SHARED_GROUP_LOCK:
+        if _SHARED_GROUP is None:
+            _SHARED_GROUP = SingleFlight()
+        return _SHARED_GROUP
@@ -0,0 +1,141 @@
+"""Incremental JSON decoding for streamed structured completions."""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import typing
+from collections.abc import Iterator
+from typing import Any
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class JsonArrayStream:
+    """Pull complete elements out of a JSON array while the document is still arriving.
+
+    Feed text chunks with :meth:`feed`; each call returns the elements of the
+    array under the top-level key *field* that were completed by that chunk.
+    With ``field=None`` the document itself is expected to be the array.
+    Text before the first ``{`` or ``[`` (a markdown fence, say) is ignored.
+    """
+
+    def __init__(self, field: str | None) -> None:
+        self.field = field
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = self._escaped = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._key: str | None = None
+        self._array_depth: int | None = None
+        self._element_start: int | None = None
+        self._done = False
+
+    def feed(self, chunk: str) -> list[Any]:
+        self._buffer += chunk
+        elements: list[Any] = []
+        text = self._buffer
+        while self._pos < len(text) and not self._done:
+            index = self._pos
+            char = text[index]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start : index + 1]
+                continue
+            in_array = self._array_depth is not None and len(self._stack) == self._array_depth
+            if in_array and self._element_start is None and char not in " \t\r\n,]":
+                self._element_start = index
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":" and len(self._stack) == 1 and self._last_string is not None:
+                self._key = json.loads(self._last_string)
+            elif char in "{[":
+                if char == "[" and self._array_depth is None and self._is_target():
+                    self._array_depth = len(self._stack) + 1
+                self._stack.append(char)
+            elif char in "}]":
+                if in_array:
+                    self._emit(text, index, elements)
+                    self._done = char == "]"
+                if self._stack:
+                    self._stack.pop()
+                if (
+                    self._array_depth is not None
+                    and len(self._stack) == self._array_depth
+                    and self._element_start is not None
+                ):
+                    self._emit(text, index + 1, elements)
+            elif char == "," and in_array:
+                self._emit(text, index, elements)
+        return elements
+
+    def _is_target(self) -> bool:
+        if self.field is None:
+            return not self._stack
+        return len(self._stack) == 1 and self._stack[0] == "{" and self._key == self.field
+
+    def _emit(self, text: str, end: int, elements: list[Any]) -> None:
+        if self._element_start is None:
+            return
+        raw = text[self._element_start : end].strip()
+        self._element_start = None
+        if not raw:
+            return
+        try:
+            elements.append(json.loads(raw))
+        except ValueError as exc:
+            # Left for the final parse, which repairs or reports the whole reply.
+            logger.debug("Skipping malformed streamed element: %s", exc)
+
+
+def list_item_type(response_format: type[BaseModel], field: str) -> Any:
+    """Return ``X`` for a ``list[X]`` field of *response_format*."""
+    try:
+        annotation = response_format.model_fields[field].annotation
+    except KeyError:
+        raise ValueError(f"{response_format.__name__} has no field {field!r}") from None
+    if typing.get_origin(annotation) is not list:
+        raise ValueError(f"{response_format.__name__}.{field} is not a list field")
+    return typing.get_args(annotation)[0]
+
+
+class StructuredStream:
+    """Iterator over validated list elements of a streamed structured completion.
+
+    Elements are yielded as soon as they are complete. Once iteration ends,
+    :attr:`result` holds the whole response validated against its schema.
+
+    Every step runs in a private copy of the caller's context, so the
+    metrics record of the streaming call is not inherited by LLM calls the
+    caller makes between elements.
+    """
+
+    def __init__(self, generator: Iterator[Any]) -> None:
+        self._generator = generator
+        self._context = contextvars.copy_context()
+        self.result: BaseModel | None = None
+
+    def __iter__(self) -> StructuredStream:
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return self._context.run(next, self._generator)
+        except StopIteration as stop:
+            self.result = stop.value
+            raise StopIteration from None
+
+    def close(self) -> None:
+        self._context.run(self._generator.close)
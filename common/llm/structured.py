@@ -0,0 +1,162 @@
+"""Helpers for the structured-output path: JSON repair and native-support memo."""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from typing import Any
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+_JSON_MODE_INSTRUCTION = (
+    "Respond with valid JSON only that matches the requested schema. "
+    "Do not include markdown fences or extra text."
+)
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class StructuredOutputError(ValueError):
+    """The model replied, but the reply could not be validated against the schema.
+
+    ``raw_text`` carries the reply so callers can repair or salvage it locally
+    instead of sending the same prompt again.
+    """
+
+    def __init__(self, message: str, raw_text: str = "") -> None:
+        super().__init__(message)
+        self.raw_text = raw_text
+
+
+def json_mode_messages(messages: list[dict]) -> list[dict]:
+    """Return *messages* with the JSON-only instruction used by the fallback path."""
+    return list(messages) + [{"role": "system", "content": _JSON_MODE_INSTRUCTION}]
+
+
+def repair_json(raw: str) -> Any:
+    """Parse *raw* as JSON, repairing the usual LLM damage on the way.
+
+    Handles markdown fences, prose around the payload, trailing commas and
+    output truncated by ``max_tokens`` (unterminated strings and unclosed
+    objects/arrays are closed). Raises ValueError if nothing parseable remains.
+    """
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1]
+        text = text.rsplit("```", 1)[0].strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("no JSON object or array in reply")
+    candidate = _balance(text[min(starts):])
+    return json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+
+
+def _balance(text: str) -> str:
+    """Cut *text* after its first complete value, or close it if truncated."""
+    closers: list[str] = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+            if not closers:
+                return text[: index + 1]
+
+    # Truncated: finish the open string, drop a dangling separator, close the rest.
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(closers))
+
+
+def parse_json_reply(raw: str, response_format: type[BaseModel]) -> BaseModel:
+    """Repair and validate *raw* against *response_format*.
+
+    Raises StructuredOutputError (carrying *raw*) when that is not possible.
+    """
+    try:
+        return response_format.model_validate(repair_json(raw))
+    except Exception as exc:
+        raise StructuredOutputError(
+            f"Could not parse reply as {response_format.__name__}: {exc}", raw_text=raw
+        ) from exc
+
+
+# ---------------------------------------------------------------------------
+# Native structured-output support memo
+# ---------------------------------------------------------------------------
+
+# Keyed by (model, schema name): strict-mode compatibility depends on the
+# schema as well as the model, e.g. free-form ``dict`` fields are rejected.
+_NATIVE_UNSUPPORTED: set[tuple[str, str]] = set()
+_NATIVE_LOCK = threading.Lock()
+
+
+def _schema_id(response_format: type[BaseModel]) -> str:
+    return f"{response_format.__module__}.{response_format.__qualname__}"
+
+
+def native_supported(model: str, response_format: type[BaseModel]) -> bool:
+    """Return False once native structured output has been refused for this pair."""
+    with _NATIVE_LOCK:
+        return (model, _schema_id(response_format)) not in _NATIVE_UNSUPPORTED
+
+
+def mark_native_unsupported(model: str, response_format: type[BaseModel]) -> None:
+    with _NATIVE_LOCK:
+        _NATIVE_UNSUPPORTED.add((model, _schema_id(response_format)))
+    logger.info(
+        "Native structured output unavailable for %s / %s; using JSON mode from now on",
+        model,
+        response_format.__name__,
+    )
+
+
+def is_unsupported_error(exc: BaseException) -> bool:
+    """Return True if *exc* is the API rejecting the structured ``response_format``.
+
+    Only a 400 whose error code or param names ``response_format`` (or its
+    ``json_schema``) counts. Anything else, such as auth, transient or
+    context-length errors, would fail JSON mode the same way and is re-raised
+    without giving up on the native path.
+    """
+    if getattr(exc, "status_code", None) != 400:
+        return False
+    return any(
+        isinstance(field, str) and ("response_format" in field or "json_schema" in field)
+        for field in (getattr(exc, "code", None), getattr(exc, "param", None))
+    )
+
+
+def truncated_reply(exc: BaseException) -> str | None:
+    """Return the partial content carried by an SDK length/content-filter error."""
+    completion = getattr(exc, "completion", None)
+    if completion is None:
+        return None
+    try:
+        return completion.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        return None
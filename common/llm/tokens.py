@@ -0,0 +1,70 @@
+"""Offline token estimation for prompts and messages."""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token for English prose on OpenAI's tokenizers.
+CHARS_PER_TOKEN = 4
+# Per-message framing overhead used by the chat format.
+_MESSAGE_OVERHEAD = 4
+_REPLY_PRIMER = 3
+
+
+@lru_cache(maxsize=8)
+def _encoder(model: str) -> Any:
+    """Return a tiktoken encoder for *model*, or None when tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str, model: str | None = None) -> int:
+    """Estimate the token count of *text*.
+
+    Uses tiktoken when it is installed; otherwise falls back to a
+    characters-per-token heuristic, which is close enough for budgeting.
+    """
+    if not text:
+        return 0
+    encoder = _encoder(model or "gpt-4o")
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+
+def estimate_message_tokens(messages: list[dict], model: str | None = None) -> int:
+    """Estimate prompt tokens for a chat ``messages`` list."""
+    total = _REPLY_PRIMER
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = str(content)
+        total += _MESSAGE_OVERHEAD + estimate_tokens(content, model)
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    """Return the longest prefix of *text* within *max_tokens*, cut at a word boundary."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+    encoder = _encoder(model or "gpt-4o")
+    if encoder is not None:
+        prefix = encoder.decode(encoder.encode(text)[:max_tokens])
+    else:
+        prefix = text[: max_tokens * CHARS_PER_TOKEN]
+    # Drop the partial word (or partial multi-byte token) at the cut.
+    boundary = max(prefix.rfind(" "), prefix.rfind("\n"))
+    if boundary > len(prefix) // 2:
+        prefix = prefix[:boundary]
+    return prefix.rstrip()
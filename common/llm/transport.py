@@ -0,0 +1,207 @@
+"""Process-wide pooled HTTP transport shared by every LLM client."""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import threading
+import weakref
+from typing import Any
+
+from common.llm.metrics import amark_first_byte, mark_first_byte
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class TransportConfig:
+    """Connection pool, keep-alive, HTTP/2 and timeout settings for LLM traffic."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 600.0
+
+
+def transport_config_from_settings() -> TransportConfig:
+    from common.config import get_settings
+
+    settings = get_settings()
+    return TransportConfig(
+        max_connections=settings.llm_http_max_connections,
+        max_keepalive_connections=settings.llm_http_max_keepalive,
+        keepalive_expiry=settings.llm_http_keepalive_expiry,
+        http2=settings.llm_http2,
+        connect_timeout=settings.llm_http_connect_timeout,
+        read_timeout=settings.llm_http_read_timeout,
+    )
+
+
+class ConnectionStats:
+    """Counts requests against the connections and TLS handshakes they needed.
+
+    Fed from httpcore's ``trace`` request extension, so it sees what the pool
+    actually did: a request that opened no new connection reused one.
+    *prefix* and *target* name the Prometheus series and what they count.
+    """
+
+    def __init__(self, prefix: str = "llm_http", target: str = "the LLM API") -> None:
+        self.prefix = prefix
+        self.target = target
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def observe(self, event: str) -> None:
+        with self._lock:
+            if event.endswith(".send_request_headers.started"):
+                self.requests += 1
+            elif event.endswith((".connect_tcp.complete", ".connect_unix_socket.complete")):
+                self.connections_opened += 1
+            elif event.endswith(".start_tls.complete"):
+                self.tls_handshakes += 1
+
+    def trace(self, event: str, info: dict) -> None:
+        self.observe(event)
+
+    async def atrace(self, event: str, info: dict) -> None:
+        self.observe(event)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for suffix, key, help_text in (
+            ("requests_total", "requests", f"HTTP requests sent to {self.target}."),
+            (
+                "connections_opened_total",
+                "connections_opened",
+                f"New connections opened to {self.target}.",
+            ),
+            ("tls_handshakes_total", "tls_handshakes", "TLS handshakes performed."),
+        ):
+            name = f"{self.prefix}_{suffix}"
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} counter",
+                f"{name} {snapshot[key]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = self.connections_opened = self.tls_handshakes = 0
+
+
+_STATS = ConnectionStats()
+_LOCK = threading.Lock()
+_SYNC_CLIENT: Any = None
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def connection_stats() -> ConnectionStats:
+    """Connection reuse counters for all traffic through the shared transport."""
+    return _STATS
+
+
+def _client_kwargs(config: TransportConfig) -> dict[str, Any]:
+    import openai
+
+    # Build limits and timeout from the classes the SDK itself uses, so they
+    # match whichever httpx distribution the installed openai depends on.
+    limits_cls = type(openai.DEFAULT_CONNECTION_LIMITS)
+    http2 = config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is missing; using HTTP/1.1")
+            http2 = False
+    return {
+        "limits": limits_cls(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        "timeout": openai.Timeout(config.read_timeout, connect=config.connect_timeout),
+        "http2": http2,
+    }
+
+
+def _install_trace(request: Any) -> None:
+    request.extensions.setdefault("trace", _STATS.trace)
+
+
+async def _ainstall_trace(request: Any) -> None:
+    request.extensions.setdefault("trace", _STATS.atrace)
+
+
+def get_http_client(config: TransportConfig | None = None) -> Any:
+    """Return the process-wide ``httpx.Client`` for OpenAI traffic, creating it on first use.
+
+    *config* only applies to the first call; later calls share that pool.
+    """
+    global _SYNC_CLIENT
+    with _LOCK:
+        if _SYNC_CLIENT is None or _SYNC_CLIENT.is_closed:
+            import openai
+
+            _SYNC_CLIENT = openai.DefaultHttpxClient(
+                **_client_kwargs(config or transport_config_from_settings()),
+                # The response hook fires on headers, giving time to first byte.
+                event_hooks={"request": [_install_trace], "response": [mark_first_byte]},
+            )
+        return _SYNC_CLIENT
+
+
+def get_async_http_client(config: TransportConfig | None = None) -> Any:
+    """Return the shared ``httpx.AsyncClient`` for the running event loop.
+
+    Pooled connections belong to the loop that opened them, so each loop
+    gets its own client; close it with :func:`aclose_async_http_client`
+    before the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        client = _ASYNC_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            import openai
+
+            client = openai.DefaultAsyncHttpxClient(
+                **_client_kwargs(config or transport_config_from_settings()),
+                event_hooks={"request": [_ainstall_trace], "response": [amark_first_byte]},
+            )
+            _ASYNC_CLIENTS[loop] = client
+        return client
+
+
+async def aclose_async_http_client() -> None:
+    """Close the running loop's shared async client, if it has one."""
+    with _LOCK:
+        client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_transport() -> None:
+    """Close the shared sync client; the next call builds a fresh pool."""
+    global _SYNC_CLIENT
+    with _LOCK:
+        if _SYNC_CLIENT is not None:
+            _SYNC_CLIENT.close()
+            _SYNC_CLIENT = None
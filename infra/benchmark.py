@@ -0,0 +1,121 @@
+"""Offline end-to-end benchmark of bot pipelines against a recorded LLM cassette.
+
+Record a cassette with a normal run (``LLM_CASSETTE_MODE=record``), then::
+
+    python -m infra.benchmark --bot content_creation --runs 5 --latency recorded
+
+Only LLM traffic is replayed; bots that crawl the web still need the network.
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import time
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+logger = logging.getLogger(__name__)
+
+_BOTS = {
+    "local_seo": "bots.local_seo.bot:LocalSeoBot",
+    "content_creation": "bots.content_creation.bot:ContentCreationBot",
+    "forum_marketing": "bots.forum_marketing.bot:ForumMarketingBot",
+    "link_building": "bots.link_building.bot:LinkBuildingBot",
+    "competitor_analysis": "bots.competitor_analysis.bot:CompetitorAnalysisBot",
+    "trend_tracking": "bots.trend_tracking.bot:TrendTrackingBot",
+    "chatbot": "bots.chatbot.bot:ChatbotBot",
+    "orchestrator": "bots.orchestrator.bot:OrchestratorBot",
+}
+
+
+def run_benchmark(
+    bot_name: str,
+    cassette_path: str,
+    runs: int = 3,
+    latency: str = "",
+    bot_kwargs: dict | None = None,
+) -> dict:
+    """Run *bot_name* *runs* times against the cassette; return timings and LLM metrics."""
+    from common.llm.cassette import REPLAY, Cassette, parse_latency
+    from common.llm.client import LLMClient
+
+    module_name, _, class_name = _BOTS[bot_name].partition(":")
+    bot_class = getattr(importlib.import_module(module_name), class_name)
+    cassette = Cassette(cassette_path, mode=REPLAY, latency=parse_latency(latency))
+
+    wall: list[float] = []
+    summaries: list[dict] = []
+    for _ in range(runs):
+        cassette.rewind()
+        bot = bot_class(llm=LLMClient(cassette=cassette))
+        started = time.perf_counter()
+        bot.run(**(bot_kwargs or {}))
+        wall.append(time.perf_counter() - started)
+        if bot.last_llm_metrics is not None:
+            summaries.append(bot.last_llm_metrics.summary())
+
+    calls = sum(s["calls"] for s in summaries)
+    return {
+        "bot": bot_name,
+        "runs": runs,
+        "latency": latency or "none",
+        "wall_seconds": [round(w, 4) for w in wall],
+        "mean_wall_seconds": round(sum(wall) / len(wall), 4),
+        "llm_calls_per_run": calls / runs,
+        "llm_calls_per_second": round(calls / sum(wall), 2) if sum(wall) else None,
+        "last_run": summaries[-1] if summaries else None,
+    }
+
+
+@click.command()
+@click.option("--bot", "bot_name", type=click.Choice(sorted(_BOTS)), required=True)
+@click.option(
+    "--cassette",
+    "cassette_path",
+    envvar="LLM_CASSETTE_PATH",
+    default="./.cache/llm_cassette.jsonl.gz",
+)
+@click.option("--runs", default=3, show_default=True)
+@click.option(
+    "--latency",
+    envvar="LLM_CASSETTE_LATENCY",
+    default="",
+    help='"", "recorded[:scale]" or "lognormal:median[:sigma]"',
+)
+@click.option("--kwargs", "kwargs_json", default="{}", help="JSON keyword arguments for run()")
+@click.option("--output", type=click.Path(dir_okay=False), default=None)
+def main(
+    bot_name: str, cassette_path: str, runs: int, latency: str, kwargs_json: str, output: str | None
+) -> None:
+    """Benchmark a bot pipeline offline against a recorded cassette."""
+    logging.basicConfig(level=logging.WARNING)
+    result = run_benchmark(bot_name, cassette_path, runs, latency, json.loads(kwargs_json))
+
+    console.print(
+        f"[bold green]{bot_name}[/bold green]: {runs} runs, "
+        f"mean {result['mean_wall_seconds']:.3f}s, "
+        f"{result['llm_calls_per_run']:.0f} LLM calls/run"
+    )
+    if result["last_run"]:
+        table = Table("Call site", "Calls", "Seconds", "p95 s", "Prompt tok", "Completion tok")
+        for site, stats in result["last_run"]["call_sites"].items():
+            table.add_row(
+                site,
+                str(stats["calls"]),
+                f"{stats['seconds']:.3f}",
+                f"{stats['total_seconds']['p95']:.3f}",
+                str(stats["prompt_tokens"]),
+                str(stats["completion_tokens"]),
+            )
+        console.print(table)
+    if output:
+        with open(output, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
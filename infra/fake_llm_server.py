@@ -0,0 +1,414 @@
+"""OpenAI-compatible fake LLM server for local load tests.
+
+Serves ``POST /v1/chat/completions`` the way the ``openai`` SDK uses it: plain
+chat, JSON mode, structured ``parse`` (``response_format`` with a JSON schema)
+and ``stream=True``. Replies are synthesised, no model is involved:
+
+- a request carrying a JSON schema gets an instance of that schema;
+- a JSON-mode request gets an instance of the ``bots/*/models.py`` model whose
+  fields its instructions mention (wrapped in the ``key "..."`` it asks for);
+- packed requests (see :mod:`common.llm.packing`) get one result per task;
+- anything else gets prose.
+
+Latency is a time to first token plus a token rate, optionally jittered, and
+a share of requests can fail with 500s or 429s to exercise retries::
+
+    python -m infra.fake_llm_server --port 8089 --ttft 0.4 --tokens-per-second 60
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python -m bots.content_creation.run
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import importlib
+import json
+import logging
+import pkgutil
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import click
+from pydantic import BaseModel
+
+from common.llm.tokens import estimate_message_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORDS = [
+    "fresh", "seasonal", "handmade", "local", "pasta", "wood-fired", "oven", "neighbourhood",
+    "favourite", "family", "recipe", "brunch", "terrace", "tasting", "menu", "chef", "special",
+    "natural", "wine", "dessert", "weekend", "booking", "delivery", "catering", "vegetarian",
+    "gluten-free", "signature", "dish",
+]
+
+_PACKED = re.compile(r"receive (\d+) independent tasks")
+_WRAPPER_KEY = re.compile(r'key "(\w+)"')
+_QUOTED_KEY = re.compile(r'"(\w+)"')
+_DATA_HEADER = "\n## Input\n"
+
+
+@dataclasses.dataclass
+class FakeLLMConfig:
+    """Timing and failure knobs for :class:`FakeLLMServer`."""
+
+    ttft: float = 0.2
+    tokens_per_second: float = 0.0  # 0 = whole reply at once
+    jitter: float = 0.0  # log-normal sigma applied to every delay
+    error_rate: float = 0.0  # share of requests answered with a 500
+    rate_limit_rate: float = 0.0  # share of requests answered with a 429
+    retry_after_ms: int = 200
+    list_items: int = 3
+    seed: int | None = None
+
+
+# ---------------------------------------------------------------------------
+# Reply synthesis
+# ---------------------------------------------------------------------------
+
+
+def bot_models() -> dict[str, type[BaseModel]]:
+    """Every Pydantic model defined in a ``bots.<bot>.models`` module, by class name."""
+    import bots
+
+    models: dict[str, type[BaseModel]] = {}
+    for info in pkgutil.iter_modules(bots.__path__):
+        try:
+            module = importlib.import_module(f"bots.{info.name}.models")
+        except ImportError:
+            continue
+        for value in vars(module).values():
+            if (
+                isinstance(value, type)
+                and issubclass(value, BaseModel)
+                and value is not BaseModel
+                and value.__module__ == module.__name__
+            ):
+                models[value.__name__] = value
+    return models
+
+
+class SchemaSynthesizer:
+    """Builds a value that validates against a JSON schema."""
+
+    def __init__(self, rng: random.Random, list_items: int = 3) -> None:
+        self.rng = rng
+        self.list_items = list_items
+
+    def build(self, schema: dict, root: dict | None = None, name: str = "") -> Any:
+        root = root if root is not None else schema
+        if "$ref" in schema:
+            return self.build(self._resolve(root, schema["$ref"]), root, name)
+        if "const" in schema:
+            return schema["const"]
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        for combinator in ("anyOf", "oneOf", "allOf"):
+            if combinator in schema:
+                options = [s for s in schema[combinator] if s.get("type") != "null"]
+                return self.build(options[0] if options else {"type": "null"}, root, name)
+        kind = schema.get("type", "object" if "properties" in schema else "string")
+        if isinstance(kind, list):
+            kind = next((k for k in kind if k != "null"), "null")
+        if kind == "object":
+            properties = schema.get("properties", {})
+            return {key: self.build(sub, root, key) for key, sub in properties.items()}
+        if kind == "array":
+            count = max(schema.get("minItems", 0), min(self.list_items, schema.get("maxItems", 99)))
+            return [self.build(schema.get("items", {}), root, name) for _ in range(count)]
+        if kind == "integer":
+            low, high = _bounds(schema, 1, 1000)
+            return self.rng.randint(int(low), int(high))
+        if kind == "number":
+            low, high = _bounds(schema, 0.0, 1.0 if "score" in name else 100.0)
+            return round(self.rng.uniform(low, high), 2)
+        if kind == "boolean":
+            return self.rng.random() < 0.5
+        if kind == "null":
+            return None
+        return self._string(schema, name)
+
+    def _string(self, schema: dict, name: str) -> str:
+        fmt = schema.get("format", "")
+        if fmt == "date-time":
+            return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        if fmt == "date":
+            return time.strftime("%Y-%m-%d", time.gmtime())
+        slug = "-".join(self.rng.sample(_WORDS, 3))
+        if fmt == "uri" or name.endswith("url"):
+            return f"https://{slug}.example.com/"
+        if fmt == "email" or name.endswith("email"):
+            return f"hello@{slug}.example.com"
+        if name == "slug":
+            return slug
+        words = 8 if name in ("title", "name", "subject", "h1", "keyword", "topic") else 40
+        text = " ".join(self.rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+        return text[: schema["maxLength"]] if "maxLength" in schema else text
+
+    @staticmethod
+    def _resolve(root: dict, ref: str) -> dict:
+        node: Any = root
+        for part in ref.lstrip("#/").split("/"):
+            node = node[part]
+        return node
+
+
+def _bounds(schema: dict, low: float, high: float) -> tuple[float, float]:
+    low = schema.get("minimum", schema.get("exclusiveMinimum", low))
+    high = schema.get("maximum", schema.get("exclusiveMaximum", max(high, low)))
+    return low, high
+
+
+class ReplyBuilder:
+    """Turns a chat-completions request body into reply text."""
+
+    def __init__(self, models: dict[str, type[BaseModel]], config: FakeLLMConfig) -> None:
+        self._schemas = {name: model.model_json_schema() for name, model in models.items()}
+        self._config = config
+
+    def build(self, request: dict) -> str:
+        messages = request.get("messages") or []
+        # Seeded by the request, so identical requests get identical replies.
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+        seed = int(digest[:12], 16) ^ (self._config.seed or 0)
+        synth = SchemaSynthesizer(random.Random(seed), self._config.list_items)
+
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            return json.dumps(synth.build(schema))
+
+        text = "\n".join(str(m.get("content") or "") for m in messages)
+        packed = _PACKED.search(text)
+        if packed:
+            return json.dumps({"results": self._packed(text, int(packed.group(1)), synth)})
+        if response_format.get("type") == "json_object" or "JSON" in text:
+            return json.dumps(self._guess_json(text, synth))
+        budget = min(request.get("max_tokens") or 300, 300)
+        return " ".join(synth.rng.choice(_WORDS) for _ in range(budget // 2)).capitalize() + "."
+
+    def _packed(self, text: str, count: int, synth: SchemaSynthesizer) -> list[dict]:
+        marker = text.index("matching this schema:") + len("matching this schema:")
+        schema, _ = json.JSONDecoder().raw_decode(text[marker:].lstrip())
+        return [{"index": i, "result": synth.build(schema)} for i in range(count)]
+
+    def _guess_json(self, text: str, synth: SchemaSynthesizer) -> Any:
+        # Only the instructions describe the reply; the data after them is input.
+        instructions = text.split(_DATA_HEADER, 1)[0]
+        keys = set(_QUOTED_KEY.findall(instructions))
+        best_name, best_hits = None, (0, 0.0)
+        for name, schema in self._schemas.items():
+            fields = set(schema.get("properties", {}))
+            if not fields:
+                continue
+            hits = (len(fields & keys), len(fields & keys) / len(fields))
+            if hits[0] >= 2 and (hits[1], hits[0]) > (best_hits[1], best_hits[0]):
+                best_name, best_hits = name, hits
+        wrapper = _WRAPPER_KEY.search(instructions)
+        item: dict = {"type": "string"}
+        if best_name is not None:
+            item = self._schemas[best_name]
+        elif wrapper is None:
+            item = {"type": "object", "properties": {k: {"type": "string"} for k in sorted(keys)}}
+        if wrapper is not None and not (best_name and wrapper.group(1) in item["properties"]):
+            return {wrapper.group(1): synth.build({"type": "array", "items": item}, item)}
+        return synth.build(item)
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server speaking the chat-completions wire format."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: FakeLLMConfig | None = None) -> None:
+        super().__init__(address, _Handler)
+        self.config = config or FakeLLMConfig()
+        self.replies = ReplyBuilder(bot_models(), self.config)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> FakeLLMServer:
+        """Serve on a daemon thread; returns self for chaining."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def draw(self) -> tuple[float, int | None]:
+        """Return (delay multiplier, injected error status or None) for one request."""
+        config = self.config
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            factor = self._rng.lognormvariate(0.0, config.jitter) if config.jitter else 1.0
+            status = None
+            if roll < config.error_rate:
+                status = 500
+            elif roll < config.error_rate + config.rate_limit_rate:
+                status = 429
+            if status is not None:
+                self.errors += 1
+        return factor, status
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeLLMServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") in ("/health", "/v1/models"):
+            self._json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+        else:
+            self._error(404, "not_found", f"No route for GET {self.path}")
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._error(404, "not_found", f"No route for POST {self.path}")
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._error(400, "invalid_request_error", "Body is not valid JSON")
+            return
+
+        config = self.server.config
+        factor, status = self.server.draw()
+        if status == 500:
+            self._error(500, "server_error", "Injected server error")
+            return
+        if status == 429:
+            self._error(
+                429,
+                "rate_limit_exceeded",
+                "Injected rate limit",
+                {"retry-after-ms": str(config.retry_after_ms)},
+            )
+            return
+
+        model = request.get("model", "fake")
+        content = self.server.replies.build(request)
+        usage = {
+            "prompt_tokens": estimate_message_tokens(request.get("messages") or [], model),
+            "completion_tokens": estimate_tokens(content, model),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        time.sleep(config.ttft * factor)
+        if request.get("stream"):
+            self._stream(request, model, content, usage, factor)
+            return
+        if config.tokens_per_second:
+            time.sleep(usage["completion_tokens"] / config.tokens_per_second * factor)
+        self._json(
+            200,
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content, "refusal": None},
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    # ------------------------------------------------------------------
+
+    def _stream(self, request: dict, model: str, content: str, usage: dict, factor: float) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        # Roughly four tokens per chunk, paced at the configured token rate.
+        pieces = [content[i : i + 16] for i in range(0, len(content), 16)]
+        rate = self.server.config.tokens_per_second
+        for index, piece in enumerate(pieces):
+            delta = {"content": piece} if index else {"role": "assistant", "content": piece}
+            choice = {"index": 0, "delta": delta, "finish_reason": None}
+            self._event({**base, "choices": [choice]})
+            if rate:
+                time.sleep(4 / rate * factor)
+        self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._event({**base, "choices": [], "usage": usage})
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _event(self, payload: dict) -> None:
+        self._chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, code: str, message: str, headers: dict | None = None) -> None:
+        error = {"message": message, "type": code, "param": None, "code": code}
+        self._json(status, {"error": error}, headers)
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8089, show_default=True)
+@click.option("--ttft", default=0.2, show_default=True, help="Seconds to the first token.")
+@click.option("--tokens-per-second", default=0.0, show_default=True, help="0 = instant.")
+@click.option("--jitter", default=0.0, show_default=True, help="Log-normal sigma on delays.")
+@click.option("--error-rate", default=0.0, show_default=True, help="Share of 500 replies.")
+@click.option("--rate-limit-rate", default=0.0, show_default=True, help="Share of 429s.")
+@click.option("--list-items", default=3, show_default=True, help="Elements per JSON list.")
+@click.option("--seed", type=int, default=None)
+def main(host: str, port: int, **options: Any) -> None:
+    """Serve fake chat completions for load tests; point OPENAI_BASE_URL at it."""
+    logging.basicConfig(level=logging.INFO)
+    server = FakeLLMServer((host, port), FakeLLMConfig(**options))
+    logger.info("Fake LLM server on %s (%s)", server.url, server.config)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Served %d requests (%d injected errors)", server.requests, server.errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Micro-benchmark of the HTML parser backends on a corpus of saved pages.
+
+Save some competitor pages first (``--save`` fetches them into the corpus),
+then compare every installed backend::
+
+    python -m infra.parse_benchmark --save https://rival.example.com/menu
+    python -m infra.parse_benchmark --corpus ./.cache/pages --runs 5
+
+Each page is parsed once per run and its text, links and metadata read, as
+``WebScraper.crawl`` does. An empty corpus is filled with generated pages.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import statistics
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from common.crawling.document import ParsedDocument, available_backends
+
+console = Console()
+logger = logging.getLogger(__name__)
+
+_DISHES = (
+    "Margherita", "Carbonara", "Cacio e Pepe", "Tiramisu", "Burrata", "Osso Buco",
+    "Risotto ai Funghi", "Lasagne", "Arancini", "Panna Cotta", "Gnocchi", "Saltimbocca",
+)
+
+
+def sample_page(rng: random.Random, items: int = 80) -> str:
+    """A restaurant page shaped like real ones: nav, scripts, a menu and a footer."""
+    menu = "\n".join(
+        f'<li class="menu-item"><h3>{rng.choice(_DISHES)}</h3>'
+        f"<p>Handmade daily with seasonal produce.</p><span>${rng.randint(9, 39)}</span>"
+        f'<a href="/menu/item-{i}">Details</a></li>'
+        for i in range(items)
+    )
+    return f"""<!DOCTYPE html><html><head><title>Trattoria Example | Menu</title>
+<meta name="description" content="Italian restaurant"><meta property="og:type" content="restaurant">
+<script type="application/ld+json">{{"@type": "Restaurant", "name": "Trattoria Example"}}</script>
+<style>{"body { margin: 0 } " * 200}</style><script>{"var t = 1; " * 500}</script></head>
+<body><nav>{"".join(f'<a href="/p{i}">Page {i}</a>' for i in range(30))}</nav>
+<main><ul>{menu}</ul></main><footer>{"<p>Opening hours and address.</p>" * 20}</footer>
+</body></html>"""
+
+
+def load_corpus(corpus: Path, generate: int = 20) -> list[str]:
+    pages = [path.read_text(encoding="utf-8", errors="replace") for path in corpus.glob("*.html")]
+    if not pages:
+        rng = random.Random(0)
+        pages = [sample_page(rng) for _ in range(generate)]
+    return pages
+
+
+def save_pages(corpus: Path, urls: list[str]) -> None:
+    from common.crawling.scraper import WebScraper
+
+    corpus.mkdir(parents=True, exist_ok=True)
+    scraper = WebScraper()
+    for url in urls:
+        html = scraper.fetch(url)
+        if html:
+            parsed = urlparse(url)
+            name = f"{parsed.netloc}{parsed.path}".strip("/").replace("/", "_") or "index"
+            (corpus / f"{name}.html").write_text(html, encoding="utf-8")
+            console.print(f"saved {url}")
+
+
+def run_parse_benchmark(pages: list[str], runs: int = 3, backends: tuple[str, ...] = ()) -> dict:
+    """Time parse + text + links + metadata per page for each backend."""
+    results = {}
+    for backend in backends or available_backends():
+        per_page: list[float] = []
+        for _ in range(runs):
+            for html in pages:
+                started = time.perf_counter()
+                document = ParsedDocument(html, "https://example.com/", backend)
+                _ = (document.text, document.links, document.meta, document.structured_data)
+                per_page.append(time.perf_counter() - started)
+        results[backend] = {
+            "pages": len(per_page),
+            "median_ms": round(statistics.median(per_page) * 1000, 3),
+            "pages_per_second": round(len(per_page) / sum(per_page), 1),
+        }
+    return results
+
+
+@click.command()
+@click.option("--corpus", type=click.Path(file_okay=False), default="./.cache/pages")
+@click.option("--save", "save_urls", multiple=True, help="Fetch a page into the corpus first.")
+@click.option("--runs", default=3, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), default=None)
+def main(corpus: str, save_urls: tuple[str, ...], runs: int, output: str | None) -> None:
+    """Compare HTML parser backends on saved restaurant pages."""
+    logging.basicConfig(level=logging.WARNING)
+    corpus_path = Path(corpus)
+    if save_urls:
+        save_pages(corpus_path, list(save_urls))
+    pages = load_corpus(corpus_path)
+    results = run_parse_benchmark(pages, runs)
+
+    slowest = max(r["median_ms"] for r in results.values())
+    table = Table("Backend", "Pages", "Median ms/page", "Pages/s", "Speed-up")
+    for backend, stats in results.items():
+        table.add_row(
+            backend,
+            str(stats["pages"]),
+            f"{stats['median_ms']:.2f}",
+            f"{stats['pages_per_second']:.0f}",
+            f"{slowest / stats['median_ms']:.1f}x" if stats["median_ms"] else "-",
+        )
+    console.print(table)
+    if output:
+        with open(output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@
 from __future__ import annotations
 
 import logging
-from typing import Callable, Any
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
 
 logger = logging.getLogger(__name__)
 
@@ -85,28 +87,173 @@ def default_schedule(scheduler: BotScheduler | None = None) -> BotScheduler:
     from bots.chatbot.bot import ChatbotBot
     from bots.orchestrator.bot import OrchestratorBot
 
-    def _run(bot_class):
+    from common.config import get_settings
+    from common.llm.batch import get_batch_queue
+    from common.llm.client import LLMClient
+
+    settings = get_settings()
+    batch_enabled = settings.llm_batch_enabled
+
+    def _run(bot_class, batch: bool = False):
         def _inner(**kwargs):
+            bot = None
             try:
-                bot = bot_class()
+                if batch and batch_enabled:
+                    bot = bot_class(llm=LLMClient(batch=get_batch_queue()))
+                else:
+                    bot = bot_class()
                 bot.run(**kwargs)
             except Exception as exc:
                 logger.error("Scheduled run of %s failed: %s", bot_class.__name__, exc)
+            finally:
+                if bot is not None:
+                    try:
+                        _report_run_metrics(bot, settings.llm_metrics_path)
+                    except Exception as exc:
+                        logger.error(
+                            "Reporting metrics for %s failed: %s", bot_class.__name__, exc
+                        )
         return _inner
 
     # Weekly on Monday at 06:00
     scheduler.schedule_bot("local_seo", "0 6 * * 1", _run(LocalSeoBot))
-    # Weekly on Monday at 07:00
-    scheduler.schedule_bot("content_creation", "0 7 * * 1", _run(ContentCreationBot))
+    # Weekly on Monday at 07:00 (batch mode when LLM_BATCH_ENABLED)
+    scheduler.schedule_bot("content_creation", "0 7 * * 1", _run(ContentCreationBot, batch=True))
     # Weekly on Tuesday at 06:00
     scheduler.schedule_bot("forum_marketing", "0 6 * * 2", _run(ForumMarketingBot))
-    # Weekly on Wednesday at 06:00
-    scheduler.schedule_bot("link_building", "0 6 * * 3", _run(LinkBuildingBot))
-    # Weekly on Thursday at 06:00
-    scheduler.schedule_bot("competitor_analysis", "0 6 * * 4", _run(CompetitorAnalysisBot))
+    # Weekly on Wednesday at 06:00 (batch mode when LLM_BATCH_ENABLED)
+    scheduler.schedule_bot("link_building", "0 6 * * 3", _run(LinkBuildingBot, batch=True))
+    # Weekly on Thursday at 06:00 (batch mode when LLM_BATCH_ENABLED)
+    scheduler.schedule_bot(
+        "competitor_analysis", "0 6 * * 4", _run(CompetitorAnalysisBot, batch=True)
+    )
     # Daily at 07:00
     scheduler.schedule_bot("trend_tracking", "0 7 * * *", _run(TrendTrackingBot))
     # Daily at 08:00 (orchestrator aggregates all outputs)
     scheduler.schedule_bot("orchestrator", "0 8 * * *", _run(OrchestratorBot))
 
     return scheduler
+
+
+def _report_run_metrics(bot, metrics_path: str) -> None:
+    """Log where a job's LLM and crawl time went and refresh the Prometheus textfile."""
+    _log_llm_metrics(bot)
+    _log_crawl_metrics()
+    if metrics_path:
+        # Write then rename so a scraping node_exporter never sees a partial file.
+        path = Path(metrics_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(_llm_prometheus() + _crawl_prometheus(), encoding="utf-8")
+        tmp.replace(path)
+
+
+def _log_llm_metrics(bot) -> None:
+    from common.llm.transport import connection_stats
+
+    if bot.last_llm_metrics is not None:
+        summary = bot.last_llm_metrics.summary()
+        slowest = ", ".join(
+            f"{site} {stats['seconds']:.1f}s/{stats['calls']}"
+            for site, stats in list(summary["call_sites"].items())[:3]
+        )
+        logger.info(
+            "%s: %d LLM calls, %.1fs, %d+%d tokens (%.0f%% of prompt cached); slowest: %s",
+            bot.name,
+            summary["calls"],
+            summary["seconds"],
+            summary["prompt_tokens"],
+            summary["completion_tokens"],
+            summary["prompt_cache_ratio"] * 100,
+            slowest or "-",
+        )
+    transport = connection_stats().snapshot()
+    logger.info(
+        "LLM transport: %d requests over %d connections (%.0f%% reused), %d TLS handshakes",
+        transport["requests"],
+        transport["connections_opened"],
+        transport["reuse_ratio"] * 100,
+        transport["tls_handshakes"],
+    )
+
+
+def _llm_prometheus() -> str:
+    from common.llm.hedging import get_hedge_policy
+    from common.llm.metrics import get_metrics
+    from common.llm.transport import connection_stats
+
+    return (
+        get_metrics().to_prometheus()
+        + connection_stats().to_prometheus()
+        + get_hedge_policy().to_prometheus()
+    )
+
+
+def _log_crawl_metrics() -> None:
+    from common.crawling import transport as crawl_transport
+    from common.crawling.fingerprint import get_fingerprint_store
+    from common.crawling.http_cache import get_http_cache
+    from common.crawling.politeness import get_politeness
+    from common.crawling.streaming import body_stats
+
+    crawl = crawl_transport.connection_stats().snapshot()
+    dns = crawl_transport.dns_cache().snapshot()
+    bodies = body_stats().snapshot()
+    if crawl["requests"]:
+        logger.info(
+            "Crawl transport: %d requests over %d connections (%.0f%% reused), "
+            "%.0f%% of DNS lookups cached; %.1f MB read, %d bodies truncated, %d skipped",
+            crawl["requests"],
+            crawl["connections_opened"],
+            crawl["reuse_ratio"] * 100,
+            dns["hit_ratio"] * 100,
+            bodies["bytes_read"] / 1e6,
+            bodies["truncated"],
+            bodies["skipped"],
+        )
+    http_cache = get_http_cache()
+    if http_cache is not None:
+        cache_stats = http_cache.stats()
+        logger.info(
+            "Crawl cache: %d fresh hits, %d revalidated, %d downloaded, %d unchanged",
+            cache_stats["fresh_hits"],
+            cache_stats["revalidated"],
+            cache_stats["misses"],
+            cache_stats["unchanged"],
+        )
+    politeness = get_politeness()
+    if politeness is not None and crawl["requests"]:
+        polite_stats = politeness.stats()
+        logger.info(
+            "Crawl politeness: %d robots.txt fetched (%d cached), %d URLs disallowed, "
+            "%.1fs spent pacing %d hosts",
+            polite_stats["fetches"],
+            polite_stats["memory_hits"] + polite_stats["disk_hits"],
+            polite_stats["disallowed"],
+            polite_stats["wait_seconds"],
+            polite_stats["hosts"],
+        )
+    fingerprints = get_fingerprint_store()
+    if fingerprints is not None:
+        fingerprint_stats = fingerprints.stats()
+        logger.info(
+            "Page fingerprints: %d of %d checked pages reused a previous extraction",
+            fingerprint_stats["reused"],
+            fingerprint_stats["checks"],
+        )
+
+
+def _crawl_prometheus() -> str:
+    from common.crawling import transport as crawl_transport
+    from common.crawling.fingerprint import get_fingerprint_store
+    from common.crawling.http_cache import get_http_cache
+    from common.crawling.politeness import get_politeness
+    from common.crawling.streaming import body_stats
+
+    optional = (get_http_cache(), get_politeness(), get_fingerprint_store())
+    return (
+        crawl_transport.connection_stats().to_prometheus()
+        + crawl_transport.dns_cache().to_prometheus()
+        + body_stats().to_prometheus()
+        + "".join(component.to_prometheus() for component in optional if component is not None)
+    )
@@ -8,6 +8,8 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from common.llm.structured import StructuredOutputError
+
 
 @pytest.fixture
 def mock_llm_client():
@@ -16,9 +18,22 @@ def mock_llm_client():
 
     # Default chat_completion returns a minimal JSON string
     mock.chat_completion.return_value = json.dumps({"result": "ok"})
+    # Packed calls size their chunks from the routed completion cap.
+    mock.completion_cap.return_value = 2000
+
+    # Default structured_completion behaves like the real client in JSON mode:
+    # one upstream call (served by chat_completion) whose reply is handed back
+    # via StructuredOutputError so bots parse it locally.
+    def _structured(messages, response_format, **kwargs):
+        raise StructuredOutputError("use raw reply", raw_text=mock.chat_completion(messages))
+
+    mock.structured_completion.side_effect = _structured
+
+    def _stream(messages, response_format, field, **kwargs):
+        yield from ()
+        _structured(messages, response_format)
 
-    # Default structured_completion raises so bots fall back to chat_completion
-    mock.structured_completion.side_effect = Exception("use chat_completion fallback")
+    mock.stream_structured.side_effect = _stream
 
     return mock
 
@@ -66,6 +81,9 @@ def mock_settings(monkeypatch):
         "RESTAURANT_CUISINE": "Italian",
         "DATABASE_URL": "sqlite:///:memory:",
         "OUTPUT_DIR": "/tmp/test_outputs",
+        # Tests crawl local servers: no robots.txt requests or per-host pacing.
+        "CRAWL_RESPECT_ROBOTS": "false",
+        "CRAWL_HOST_DELAY": "0",
     }
     for key, val in env_vars.items():
         monkeypatch.setenv(key, val)
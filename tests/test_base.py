@@ -33,6 +33,25 @@ class TestBotBase:
         assert dest.exists()
         assert "test_bot" in dest.name
 
+    def test_run_writes_llm_metrics_sidecar(self, tmp_output_dir):
+        from common.llm.metrics import MetricsRegistry
+
+        registry = MetricsRegistry()
+
+        class _LlmBot(_ConcreteBot):
+            def run(self, **kwargs):
+                with registry.track("gpt-4o") as record:
+                    record.prompt_tokens = 12
+                return {"path": str(self.save_output({"ok": True}, "latest.json"))}
+
+        bot = _LlmBot()
+        dest = Path(bot.run()["path"])
+        sidecar = json.loads(dest.with_suffix(".metrics.json").read_text())
+        assert sidecar["calls"] == 1 and sidecar["prompt_tokens"] == 12
+        assert [site.rsplit(".", 2)[-2:] for site in sidecar["call_sites"]] == [["_LlmBot", "run"]]
+        assert json.loads(dest.read_text()) == {"ok": True}
+        assert bot.last_llm_metrics.records[0].bot == "test_bot"
+
     def test_load_input_reads_file(self, tmp_output_dir):
         # Write a file manually
         subdir = tmp_output_dir / "some_bot"
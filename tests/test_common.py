@@ -1,9 +1,26 @@
 """Tests for common utilities."""
 from __future__ import annotations
 
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import ClassVar
+
 import pytest
 
+from common.crawling import politeness as politeness_module
+from common.crawling import transport as crawl_transport
+from common.crawling.async_scraper import AsyncWebScraper
+from common.crawling.document import ParsedDocument, available_backends
+from common.crawling.fingerprint import FingerprintStore, hamming_distance, simhash
+from common.crawling.http_cache import HttpCache
+from common.crawling.politeness import HostThrottle, Politeness, RobotsCache, RobotsRules
+from common.crawling.streaming import BodyReader, body_stats
 from common.crawling.scraper import WebScraper
+from common.crawling.site_crawler import CrawlBudget, SiteCrawler, normalize_url
 from common.storage.database import (
     ProspectRepository,
     ProspectStatus,
@@ -65,6 +82,514 @@ class TestWebScraper:
         assert scraper.extract_links("") == []
 
 
+_RESTAURANT_PAGE = """<!DOCTYPE html>
+<html><head>
+  <title>Rival  Ristorante | Menu</title>
+  <meta name="description" content="Wood-fired pizza in the East Village">
+  <meta property="og:title" content="Rival Ristorante">
+  <style>p { color: red }</style>
+  <script type="application/ld+json">{"@type": "Restaurant", "servesCuisine": "Italian"}</script>
+  <script type="application/ld+json">{not json</script>
+</head><body>
+  <!-- nav -->
+  <nav><a href="/menu">Menu</a> <a href="https://rival.example.com/menu">Menu again</a></nav>
+  <h1>Rival Ristorante</h1>
+  <p>Margherita <b>$16</b></p>
+  <script>trackVisit()</script><noscript>Enable JS</noscript>
+  <a href="mailto:hi@rival.example.com">Email</a>
+</body></html>"""
+
+
+class TestParsedDocument:
+    @pytest.fixture(params=available_backends())
+    def document(self, request):
+        return ParsedDocument(_RESTAURANT_PAGE, "https://rival.example.com/", request.param)
+
+    def test_text_is_the_same_on_every_backend(self, document):
+        assert document.text == "Menu Menu again Rival Ristorante Margherita $16 Email"
+
+    def test_links_and_metadata_come_from_one_tree(self, document):
+        assert document.links == ["https://rival.example.com/menu"]
+        assert document.title == "Rival Ristorante | Menu"
+        assert document.meta["description"] == "Wood-fired pizza in the East Village"
+        assert document.meta["og:title"] == "Rival Ristorante"
+        assert document.structured_data == [{"@type": "Restaurant", "servesCuisine": "Italian"}]
+
+    def test_crawl_parses_each_page_once(self, monkeypatch):
+        import bs4
+
+        parses = []
+        real_soup = bs4.BeautifulSoup
+        monkeypatch.setattr(bs4, "BeautifulSoup", lambda *a: parses.append(1) or real_soup(*a))
+        scraper = WebScraper(parser="html.parser")
+        page = SimpleNamespace(text=_RESTAURANT_PAGE, unchanged=False)
+        monkeypatch.setattr(scraper, "fetch_result", lambda url: page)
+        result = scraper.crawl("https://rival.example.com/")
+        assert result["text"] and result["links"] and result["document"].title
+        assert len(parses) == 1
+
+    def test_unknown_backend_is_rejected(self):
+        with pytest.raises(ValueError):
+            ParsedDocument("<p>x</p>", backend="regex")
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """Test server that ignores clients hanging up mid-response (size caps, closed pools)."""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        if self.path.startswith("/slow"):
+            time.sleep(0.3)
+        with cls.lock:
+            cls.in_flight -= 1
+        body = f"<html><body><p>{self.path}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_server():
+    _PageHandler.peak = 0
+    server = _QuietHTTPServer(("127.0.0.1", 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestCrawlTransport:
+    @pytest.fixture(autouse=True)
+    def _fresh_pool(self, mock_settings):
+        crawl_transport.close_crawl_client()
+        crawl_transport.connection_stats().reset()
+        crawl_transport.dns_cache().clear()
+        yield
+        crawl_transport.close_crawl_client()
+
+    def test_scrapers_share_one_pool_across_instances(self, page_server):
+        for path in ("/a", "/b", "/c"):
+            assert path in WebScraper().fetch(page_server + path)
+        stats = crawl_transport.connection_stats().snapshot()
+        assert (stats["requests"], stats["connections_opened"], stats["reused"]) == (3, 1, 2)
+        assert "crawl_http_connections_opened_total 1" in (
+            crawl_transport.connection_stats().to_prometheus()
+        )
+
+    def test_dns_answers_are_cached(self, page_server):
+        crawl_transport.get_crawl_client(
+            crawl_transport.CrawlTransportConfig(max_keepalive_connections=0)
+        )
+        scraper = WebScraper()
+        scraper.fetch(page_server + "/a")
+        scraper.fetch(page_server + "/b")
+        dns = crawl_transport.dns_cache().snapshot()
+        assert (dns["lookups"], dns["hits"]) == (2, 1)
+
+    def test_close_leaves_shared_client_open(self, page_server):
+        with WebScraper() as scraper:
+            scraper.fetch(page_server + "/a")
+        assert not crawl_transport.get_crawl_client().is_closed
+
+
+class TestAsyncWebScraper:
+    async def test_results_stream_in_completion_order(self, page_server, mock_settings):
+        scraper = AsyncWebScraper()
+        urls = [page_server + "/slow", page_server + "/fast"]
+        seen = [result["url"] async for result in scraper.crawl_many(urls)]
+        await crawl_transport.aclose_crawl_client()
+        assert seen == urls[::-1]
+
+    def test_slow_pages_overlap_and_per_host_cap_holds(self, page_server, mock_settings):
+        scraper = AsyncWebScraper(per_host_concurrency=3)
+        urls = [f"{page_server}/slow/{i}" for i in range(6)]
+        started = time.monotonic()
+        pages = scraper.crawl_all(urls)
+        elapsed = time.monotonic() - started
+        assert list(pages) == urls
+        assert all(f"/slow/{i}" in pages[url]["text"] for i, url in enumerate(urls))
+        # Six 0.3s pages, three at a time: two rounds, not six.
+        assert 0.55 < elapsed < 1.5
+        assert _PageHandler.peak == 3
+
+    def test_timeout_yields_empty_page(self, page_server, mock_settings):
+        scraper = AsyncWebScraper(timeout=0.05)
+        pages = scraper.crawl_all([page_server + "/slow"])
+        assert pages[page_server + "/slow"]["text"] == ""
+
+
+class _CacheAwareHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    version = "v1"
+    cache_control = "no-cache"
+    requests: ClassVar[list[dict]] = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(dict(self.headers))
+        etag = f'"{cls.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f"<html><body><p>menu {cls.version}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cls.cache_control)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCache:
+    @pytest.fixture
+    def site(self):
+        _CacheAwareHandler.version = "v1"
+        _CacheAwareHandler.cache_control = "no-cache"
+        _CacheAwareHandler.requests = []
+        server = _QuietHTTPServer(("127.0.0.1", 0), _CacheAwareHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{server.server_address[1]}/menu"
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def scraper(self, mock_settings):
+        yield WebScraper(cache=HttpCache(":memory:"))
+        crawl_transport.close_crawl_client()
+
+    def test_revalidates_with_etag_and_serves_304_from_cache(self, site, scraper):
+        first = scraper.crawl(site)
+        second = scraper.crawl(site)
+        assert not first["unchanged"] and second["unchanged"]
+        assert "menu v1" in second["text"]
+        assert _CacheAwareHandler.requests[1]["If-None-Match"] == '"v1"'
+        assert scraper._cache.stats()["revalidated"] == 1
+
+    def test_changed_content_is_downloaded_and_flagged(self, site, scraper):
+        scraper.fetch(site)
+        _CacheAwareHandler.version = "v2"
+        result = scraper.fetch_result(site)
+        assert "menu v2" in result.text and not result.unchanged
+
+    def test_fresh_entries_skip_the_request(self, site, scraper):
+        _CacheAwareHandler.cache_control = "max-age=600"
+        scraper.fetch(site)
+        result = scraper.fetch_result(site)
+        assert result.from_cache and result.unchanged
+        assert len(_CacheAwareHandler.requests) == 1
+
+    def test_evicts_least_recently_used_over_byte_budget(self):
+        cache = HttpCache(":memory:", max_bytes=250)
+        response = SimpleNamespace(status_code=200, headers={}, text="x" * 100)
+        for url in ("https://a.example", "https://b.example", "https://c.example"):
+            cache.store(url, response)
+        assert cache.get("https://a.example") is None
+        assert cache.get("https://c.example") is not None
+        assert cache.stats()["evictions"] == 1
+
+
+class _MixedContentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/menu.pdf":
+            content_type, body = "application/pdf", b"%PDF-1.4" + b"\0" * 500_000
+        elif self.path == "/gallery":
+            content_type, body = "text/html", b"<p>" + b"photo " * 200_000 + b"</p>"
+        else:
+            content_type = "text/html"
+            body = '<meta charset="iso-8859-1"><p>Caf\u00e9 cr\u00e8me</p>'.encode("latin-1")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            # The scraper hung up after the headers or at the size cap.
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBoundedFetch:
+    @pytest.fixture
+    def site(self, mock_settings):
+        server = _QuietHTTPServer(("127.0.0.1", 0), _MixedContentHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        body_stats().reset()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+        crawl_transport.close_crawl_client()
+
+    def test_non_html_is_skipped_after_headers(self, site):
+        result = WebScraper().fetch_result(site + "/menu.pdf")
+        assert result.text == ""
+        assert body_stats().snapshot()["skipped"] == 1
+
+    def test_large_pages_are_capped(self, site):
+        result = WebScraper(max_bytes=10_000).fetch_result(site + "/gallery")
+        assert result.truncated and result.text.startswith("<p>photo")
+        assert len(result.text) == 10_000
+        assert body_stats().snapshot()["bytes_read"] == 10_000
+
+    def test_charset_is_sniffed_from_meta_tag(self, site):
+        assert "Café crème" in WebScraper().extract_text(WebScraper().fetch(site + "/latin"))
+
+    async def test_async_fetch_is_bounded_too(self, site):
+        scraper = AsyncWebScraper(max_bytes=10_000)
+        result = await scraper.afetch_result(site + "/gallery")
+        skipped = await scraper.afetch_result(site + "/menu.pdf")
+        await crawl_transport.aclose_crawl_client()
+        assert result.truncated and len(result.text) == 10_000
+        assert skipped.text == ""
+
+    def test_reader_handles_multibyte_characters_split_across_chunks(self):
+        reader = BodyReader("text/html; charset=utf-8")
+        encoded = b"Cr\xc3\xa8me br\xc3\xbbl\xc3\xa9e"
+        for i in range(len(encoded)):
+            reader.feed(encoded[i : i + 1])
+        assert reader.text() == "Crème brûlée"
+
+
+_SITE_PAGES = {
+    "/": '<a href="/blog/1">News</a><a href="/about">About</a><a href="/menu">Menu</a>'
+    '<a href="/menu#top">Menu</a><a href="/menu?utm_source=nav">Menu</a>'
+    '<a href="/menu.pdf">PDF menu</a><a href="https://elsewhere.example.com/menu">Ad</a>'
+    "<p>Trattoria Rival</p>",
+    "/menu": '<a href="/menu/wines">Wines</a><p>Carbonara $18</p>',
+    "/menu/wines": "<p>Barolo $90</p>",
+    "/specials": "<p>Happy hour 5-7pm</p>",
+    "/about": "<p>Family run since 1950</p>",
+    "/blog/1": '<a href="/blog/2">Older</a><p>We won an award</p>',
+    "/blog/2": "<p>Old news</p>",
+}
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requested: ClassVar[list[str]] = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        if self.path == "/sitemap.xml":
+            content_type = "application/xml"
+            host = self.headers["Host"]
+            body = f"<?xml version='1.0'?><urlset><url><loc>http://{host}/specials</loc></url></urlset>"
+        elif self.path.split("?")[0] in _SITE_PAGES:
+            content_type, body = "text/html", _SITE_PAGES[self.path.split("?")[0]]
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        encoded = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSiteCrawler:
+    @pytest.fixture
+    def site(self, mock_settings):
+        _SiteHandler.requested = []
+        server = _QuietHTTPServer(("127.0.0.1", 0), _SiteHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+        crawl_transport.close_crawl_client()
+
+    def test_crawls_menu_and_offer_pages_first(self, site):
+        crawler = SiteCrawler(WebScraper(), CrawlBudget(max_pages=5))
+        corpus = crawler.crawl(site + "/")
+        paths = [page.url[len(site):] for page in corpus.pages]
+        assert paths == ["/", "/menu", "/menu/wines", "/specials"]
+        assert corpus.pdf_links == [site + "/menu.pdf"]
+        assert "Carbonara $18" in corpus.merged_text()
+
+    def test_each_page_is_fetched_once(self, site):
+        SiteCrawler(WebScraper(), CrawlBudget(max_pages=20)).crawl(site + "/")
+        pages = [path for path in _SiteHandler.requested if path != "/sitemap.xml"]
+        assert sorted(pages) == sorted(_SITE_PAGES)
+
+    def test_depth_and_byte_budgets_stop_the_crawl(self, site):
+        shallow_budget = CrawlBudget(max_pages=20, max_depth=1)
+        shallow = SiteCrawler(WebScraper(), shallow_budget).crawl(site + "/")
+        assert site + "/menu/wines" not in [page.url for page in shallow.pages]
+        assert site + "/blog/2" not in [page.url for page in shallow.pages]
+        # The sitemap's bytes count too: it and the start page use up this budget.
+        small_budget = CrawlBudget(max_pages=20, max_bytes=200)
+        small = SiteCrawler(WebScraper(), small_budget).crawl(site + "/")
+        assert len(small.pages) == 1 and small.attempts == 2
+
+    def test_failed_fetches_count_toward_page_budget(self, site):
+        corpus = SiteCrawler(WebScraper(), CrawlBudget(max_pages=1)).crawl(site + "/missing")
+        assert corpus.pages == [] and corpus.attempts == 1
+        assert [path for path in _SiteHandler.requested if path != "/sitemap.xml"] == ["/missing"]
+
+        crawler = SiteCrawler(AsyncWebScraper(), CrawlBudget(max_pages=1))
+        assert crawler.crawl_sites([site + "/missing"])[site + "/missing"].pages == []
+        assert _SiteHandler.requested.count("/specials") == 0
+
+    def test_async_crawl_of_several_sites(self, site):
+        crawler = SiteCrawler(AsyncWebScraper(), CrawlBudget(max_pages=5))
+        corpora = crawler.crawl_sites([site + "/", site + "/about"])
+        assert list(corpora) == [site + "/", site + "/about"]
+        urls = [page.url for page in corpora[site + "/"].pages]
+        assert len(urls) == 4 and urls[0] == site + "/"
+        assert {site + "/menu", site + "/specials"} <= set(urls)
+        assert not any("/blog/" in url for url in urls)
+
+    def test_normalize_url_drops_fragments_and_tracking(self):
+        assert normalize_url("HTTPS://Example.com:443/Menu/?utm_source=x&b=2&a=1#top") == (
+            "https://example.com/Menu?a=1&b=2"
+        )
+        assert normalize_url("http://example.com/index.html") == "http://example.com/"
+
+
+class _RobotsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requested.append(self.path)
+        if self.path == "/robots.txt":
+            content_type, body = "text/plain", b"User-agent: *\nDisallow: /private\n"
+        else:
+            content_type, body = "text/html", b"<p>Open page</p>"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPoliteness:
+    @pytest.fixture
+    def sites(self, mock_settings):
+        servers = [_QuietHTTPServer(("127.0.0.1", 0), _RobotsHandler) for _ in range(2)]
+        for server in servers:
+            server.requested = []
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield [(f"http://127.0.0.1:{s.server_address[1]}", s.requested) for s in servers]
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        crawl_transport.close_crawl_client()
+
+    def test_rules_follow_robots_conventions(self):
+        rules = RobotsRules(200, "User-agent: *\nDisallow: /private\nCrawl-delay: 5\n")
+        assert rules.allowed("https://a.example.com/menu")
+        assert not rules.allowed("https://a.example.com/private/x")
+        assert rules.crawl_delay() == 5
+        assert RobotsRules(404).allowed("https://a.example.com/private")
+        assert not RobotsRules(503).allowed("https://a.example.com/menu")
+
+    def test_disallowed_urls_are_never_requested(self, sites):
+        site, requested = sites[0]
+        politeness = Politeness(RobotsCache(), HostThrottle(), delay=0)
+        scraper = WebScraper(politeness=politeness)
+        assert scraper.fetch(site + "/private/menu") == ""
+        assert "Open page" in scraper.fetch(site + "/menu")
+        assert requested == ["/robots.txt", "/menu"]
+        assert politeness.stats()["disallowed"] == 1
+
+    def test_robots_body_is_read_up_to_the_cap(self, sites, monkeypatch):
+        site, _ = sites[0]
+        monkeypatch.setattr(politeness_module, "_MAX_ROBOTS_BYTES", 20)
+        rules = RobotsCache().rules(site + "/private", client=crawl_transport.get_crawl_client())
+        # The Disallow line lies past the cap, so it was never read.
+        assert rules.status == 200 and rules.allowed(site + "/private")
+
+    async def test_robots_fetched_once_and_reused_from_disk(self, sites, tmp_path):
+        site, requested = sites[0]
+        cache = RobotsCache(tmp_path / "robots.db")
+        scraper = AsyncWebScraper(politeness=Politeness(cache, HostThrottle(), delay=0))
+        await asyncio.gather(*(scraper.afetch(f"{site}/page{i}") for i in range(5)))
+        await crawl_transport.aclose_crawl_client()
+        assert requested.count("/robots.txt") == 1
+
+        later_run = RobotsCache(tmp_path / "robots.db")
+        assert not later_run.rules(site + "/private", client=None).allowed(site + "/private")
+        assert later_run.stats()["disk_hits"] == 1 and later_run.stats()["fetches"] == 0
+
+    def test_hosts_are_paced_independently(self, sites):
+        politeness = Politeness(RobotsCache(), HostThrottle(), delay=0.25, respect_robots=False)
+        scraper = AsyncWebScraper(politeness=politeness)
+        urls = [f"{site}/page{i}" for site, _ in sites for i in range(3)]
+        started = time.perf_counter()
+        pages = scraper.crawl_all(urls)
+        elapsed = time.perf_counter() - started
+        assert all(page["text"] == "Open page" for page in pages.values())
+        # Three requests per host need two delays; the hosts wait in parallel.
+        assert 0.45 < elapsed < 1.2
+        assert politeness.stats()["hosts"] == 2
+
+
+def _menu_text(seed: int, style: str = "handmade with seasonal produce") -> str:
+    import random
+
+    rng = random.Random(seed)
+    dishes = ("Carbonara", "Margherita", "Tiramisu", "Burrata", "Lasagne", "Gnocchi")
+    return " ".join(f"{rng.choice(dishes)} {style} ${rng.randint(9, 39)}" for _ in range(60))
+
+
+class TestFingerprints:
+    def test_rotating_banner_is_a_near_duplicate(self):
+        menu = _menu_text(1)
+        monday = simhash("Today only: free dessert. Updated 3 March. " + menu)
+        tuesday = simhash("Today only: half-price wine. Updated 4 March. " + menu)
+        new_menu = simhash(_menu_text(2, "slow cooked over charcoal"))
+        assert hamming_distance(monday, tuesday) <= 3
+        assert hamming_distance(monday, new_menu) > 10
+
+    def test_store_reuses_result_only_for_unchanged_pages(self, tmp_path):
+        url = "https://rival.example.com"
+        store = FingerprintStore(tmp_path / "fingerprints.db")
+        assert store.reusable(url, _menu_text(1)) is None
+        store.store(url, "Updated 3 March. " + _menu_text(1), {"name": "Rival"})
+
+        later_run = FingerprintStore(tmp_path / "fingerprints.db")
+        assert later_run.reusable(url, "Updated 4 March. " + _menu_text(1)) == {"name": "Rival"}
+        assert later_run.reusable(url, _menu_text(2, "slow cooked over charcoal")) is None
+        assert later_run.stats() == {"checks": 2, "reused": 1}
+
+
 class TestProspectRepository:
     @pytest.fixture
     def db_engine(self):
@@ -2,11 +2,17 @@
 from __future__ import annotations
 
 import json
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from bots.competitor_analysis.bot import CompetitorAnalysisBot
 from bots.competitor_analysis.models import CompetitorProfile, CompetitorComparison
+from common.crawling.async_scraper import AsyncWebScraper
+from common.crawling.fingerprint import FingerprintStore
+from common.crawling.site_crawler import SiteCorpus, SiteCrawler, SitePage
+from common.llm.budget import TRUNCATION_MARKER
+from common.llm.tokens import estimate_tokens
 
 
 _PROFILE_RESPONSE = json.dumps({
@@ -89,3 +95,50 @@ class TestCompetitorAnalysisBot:
         bot = CompetitorAnalysisBot(llm=mock_llm_client)
         report = bot.generate_report([])
         assert isinstance(report, str)
+
+    def test_run_crawls_all_competitors_in_one_batch(self, mock_llm_client, tmp_output_dir, mock_settings):
+        mock_llm_client.chat_completion.return_value = _PROFILE_RESPONSE
+        urls = ["https://rival.example.com", "https://down.example.com"]
+        corpora = {
+            urls[0]: SiteCorpus(urls[0], [SitePage(urls[0], "Rival Ristorante", 0)]),
+            urls[1]: SiteCorpus(urls[1]),
+        }
+        bot = CompetitorAnalysisBot(llm=mock_llm_client, scraper=MagicMock(spec=AsyncWebScraper))
+        with patch.object(SiteCrawler, "crawl_sites", return_value=corpora) as crawl_sites:
+            result = bot.run(competitor_urls=urls)
+        crawl_sites.assert_called_once_with(urls)
+        assert len(result["competitors"]) == 1
+
+    def test_competitor_text_merges_key_pages(self, mock_llm_client, tmp_output_dir, mock_settings):
+        corpus = SiteCorpus(
+            "https://rival.example.com",
+            [
+                SitePage("https://rival.example.com", "Welcome " * 5000, 0),
+                SitePage("https://rival.example.com/menu", "Carbonara $18", 1),
+            ],
+            pdf_links=["https://rival.example.com/menu.pdf"],
+        )
+        bot = CompetitorAnalysisBot(llm=mock_llm_client, scraper=MagicMock(spec=AsyncWebScraper))
+        with patch.object(SiteCrawler, "crawl", return_value=corpus):
+            text = bot.crawl_competitor("https://rival.example.com")
+        assert "## https://rival.example.com/menu\nCarbonara $18" in text
+        assert "https://rival.example.com/menu.pdf" in text
+        assert TRUNCATION_MARKER in text
+        assert estimate_tokens(text) <= 2500
+
+    def test_unchanged_site_reuses_previous_profile(self, mock_llm_client, tmp_output_dir, mock_settings):
+        mock_llm_client.chat_completion.return_value = _PROFILE_RESPONSE
+        bot = CompetitorAnalysisBot(
+            llm=mock_llm_client,
+            scraper=MagicMock(spec=AsyncWebScraper),
+            fingerprints=FingerprintStore(":memory:"),
+        )
+        menu = " ".join(f"Spaghetti Carbonara {i} handmade daily $18" for i in range(50))
+        first = bot.profile_competitor("https://rival.example.com", "Open today. " + menu, "Us")
+        second = bot.profile_competitor("https://rival.example.com", "Closed Monday. " + menu, "Us")
+        assert mock_llm_client.structured_completion.call_count == 1
+        assert second == first
+        bot.profile_competitor("https://rival.example.com", "Sushi omakase $120 " * 50, "Us")
+        assert mock_llm_client.structured_completion.call_count == 2
+        bot.profile_competitor("https://rival.example.com", "Sushi omakase $120 " * 50, "Them")
+        assert mock_llm_client.structured_completion.call_count == 3
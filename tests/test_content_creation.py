@@ -83,3 +83,28 @@ class TestContentCreationBot:
         post = BlogPost(title="T", slug="t", body_markdown="B", word_count=1)
         snippets = bot.create_social_snippets(post)
         assert all(isinstance(s, SocialSnippet) for s in snippets)
+
+    def test_run_batches_blog_posts_into_one_job(self, mock_settings, tmp_output_dir, tmp_path):
+        from common.llm.batch import BatchQueue, LocalBatchBackend
+        from common.llm.client import LLMClient
+
+        queue = BatchQueue(
+            LocalBatchBackend(tmp_path / "out", responder=lambda body: _BLOG_RESPONSE),
+            tmp_path / "jobs",
+            flush_interval=0.2,
+            poll_interval=0.01,
+        )
+        bot = ContentCreationBot(llm=LLMClient(batch=queue))
+        clusters = [{"keyword": k} for k in ("burrata", "cannoli", "tiramisu")]
+        result = bot.run(keyword_clusters=clusters)
+        queue.close()
+
+        assert len(result["blog_posts"]) == 3
+        jobs = []
+        for job in (tmp_path / "jobs").glob("job_*.jsonl"):
+            lines = job.read_text().splitlines()
+            jobs.append([json.loads(line)["body"]["messages"][0]["content"] for line in lines])
+        blog_jobs = [job for job in jobs if any("burrata" in content for content in job)]
+        assert len(blog_jobs) == 1
+        assert len(blog_jobs[0]) == 3
+        assert all(any(k in content for content in blog_jobs[0]) for k in ("cannoli", "tiramisu"))
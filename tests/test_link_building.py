@@ -80,3 +80,13 @@ class TestLinkBuildingBot:
         email = bot.generate_outreach_email(prospect, {"restaurant_name": "R", "city": "C", "cuisine": "I"})
         assert len(email.subject) > 0
         assert len(email.body) > 0
+
+    def test_run_drafts_outreach_for_streamed_prospects(self, mock_llm_client, tmp_output_dir, mock_settings):
+        mock_llm_client.chat_completion.side_effect = [_PROSPECTS_RESPONSE, _EMAIL_RESPONSE, _EMAIL_RESPONSE]
+        bot = LinkBuildingBot(llm=mock_llm_client)
+        result = bot.run()
+        assert [p["url"] for p in result["prospects"]] == [
+            "https://nycfoodblog.example.com",
+            "https://eastvillageguide.example.com",
+        ]
+        assert len(result["outreach_emails"]) == 2
@@ -0,0 +1,1115 @@
+"""Tests for common/llm."""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import openai
+import pytest
+from pydantic import BaseModel
+
+from bots.local_seo.models import SeoMeta
+from common.llm.async_client import AsyncLLMClient
+from common.llm.batch import BatchError, BatchQueue, LocalBatchBackend
+from common.llm.budget import TRUNCATION_MARKER, PromptBudget, Section, context_window
+from common.llm.cache import ResponseCache, make_cache_key
+from common.llm.cassette import (
+    Cassette,
+    CassetteClient,
+    CassetteMissError,
+    parse_latency,
+    recorded_latency,
+)
+from common.llm.client import LLMClient
+from common.llm.hedging import HedgePolicy
+from common.llm.metrics import MetricsRegistry, bot_scope, current_record, note_usage
+from common.llm.packing import packed_completion
+from common.llm.prompts import DATA_HEADER, PromptTemplate
+from common.llm.rate_limit import RateLimiter, SQLiteRateLimiter, TokenBucket, parse_model_limits
+from common.llm.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    RetryPolicy,
+    RetryStats,
+    is_retryable,
+    retry_after_seconds,
+)
+from common.llm.singleflight import SingleFlight
+from common.llm.streaming import JsonArrayStream
+from common.llm.structured import (
+    _NATIVE_UNSUPPORTED,
+    StructuredOutputError,
+    native_supported,
+    repair_json,
+)
+from common.llm.tokens import estimate_message_tokens, estimate_tokens, truncate_to_tokens
+from common.llm.transport import (
+    TransportConfig,
+    aclose_async_http_client,
+    close_transport,
+    connection_stats,
+    get_async_http_client,
+    get_http_client,
+)
+from infra.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+class _Item(BaseModel):
+    name: str
+    score: int = 0
+
+
+def _completion(content: str, parsed=None):
+    message = SimpleNamespace(content=content, parsed=parsed)
+    usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeOpenAI:
+    """Minimal stand-in for ``openai.OpenAI`` recording every request."""
+
+    def __init__(self, replies: list[str] | None = None, parse_error: Exception | None = None):
+        self.replies = list(replies or [json.dumps({"name": "pasta", "score": 3})])
+        self.parse_error = parse_error or _StatusError(400, param="response_format")
+        self.create_calls: list[dict] = []
+        self.parse_calls: list[dict] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self._parse))
+        )
+
+    def _create(self, **kwargs):
+        self.create_calls.append(kwargs)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if kwargs.get("stream"):
+            return self._stream(reply)
+        return _completion(reply)
+
+    def _stream(self, reply: str):
+        self.chunks_sent = 0
+        for start in range(0, len(reply), 7):
+            self.chunks_sent += 1
+            delta = SimpleNamespace(content=reply[start : start + 7])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    def _parse(self, **kwargs):
+        self.parse_calls.append(kwargs)
+        raise self.parse_error
+
+
+class FakeAsyncOpenAI:
+    """Async stand-in that tracks the peak number of concurrent requests."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self._parse))
+        )
+
+    async def _create(self, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return _completion(json.dumps({"name": kwargs["messages"][0]["content"]}))
+
+    async def _parse(self, **kwargs):
+        raise _StatusError(400, param="response_format")
+
+
+@pytest.fixture(autouse=True)
+def _reset_native_memo():
+    _NATIVE_UNSUPPORTED.clear()
+    yield
+    _NATIVE_UNSUPPORTED.clear()
+
+
+@pytest.fixture
+def fake_openai():
+    return FakeOpenAI()
+
+
+@pytest.fixture
+def llm(fake_openai, mock_settings):
+    client = LLMClient()
+    client._client = fake_openai
+    return client
+
+
+class TestResponseCache:
+    def test_key_depends_on_every_request_field(self):
+        base = make_cache_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 100)
+        assert base == make_cache_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 100)
+        assert base != make_cache_key("gpt-4o-mini", [{"role": "user", "content": "hi"}], 0.7, 100)
+        assert base != make_cache_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.2, 100)
+        assert base != make_cache_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 50)
+        assert base != make_cache_key(
+            "gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 100, response_format=_Item
+        )
+
+    def test_ttl_expiry_counts_as_miss(self, tmp_path):
+        cache = ResponseCache(tmp_path / "c.db", ttl_seconds=0.01)
+        cache.set("k", "v")
+        time.sleep(0.02)
+        assert cache.get("k") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        cache = ResponseCache(tmp_path / "c.db", max_entries=2)
+        cache.set("a", "1")
+        time.sleep(0.001)
+        cache.set("b", "2")
+        time.sleep(0.001)
+        assert cache.get("a") == "1"
+        time.sleep(0.001)
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats()["evictions"] == 1
+
+    def test_size_budget_evicts(self, tmp_path):
+        cache = ResponseCache(tmp_path / "c.db", max_entries=None, max_bytes=10)
+        cache.set("a", "x" * 8)
+        cache.set("b", "y" * 8)
+        assert cache.stats()["bytes"] <= 10
+
+
+class TestLLMClientCache:
+    def test_chat_completion_hits_cache_on_repeat(self, llm, fake_openai, tmp_path):
+        llm._cache = ResponseCache(tmp_path / "c.db")
+        messages = [{"role": "user", "content": "keywords please"}]
+        first = llm.chat_completion(messages)
+        second = llm.chat_completion(messages)
+        assert first == second
+        assert len(fake_openai.create_calls) == 1
+        assert llm.cache.stats()["hits"] == 1
+
+    def test_use_cache_false_bypasses(self, llm, fake_openai, tmp_path):
+        llm._cache = ResponseCache(tmp_path / "c.db")
+        messages = [{"role": "user", "content": "keywords please"}]
+        llm.chat_completion(messages)
+        llm.chat_completion(messages, use_cache=False)
+        assert len(fake_openai.create_calls) == 2
+
+    def test_structured_completion_is_cached(self, llm, fake_openai, tmp_path):
+        llm._cache = ResponseCache(tmp_path / "c.db")
+        messages = [{"role": "user", "content": "one item"}]
+        first = llm.structured_completion(messages, _Item)
+        second = llm.structured_completion(messages, _Item)
+        assert first == second == _Item(name="pasta", score=3)
+        assert len(fake_openai.create_calls) == 1
+
+
+class TestAsyncLLMClient:
+    async def test_semaphore_bounds_in_flight_requests(self, mock_settings):
+        fake = FakeAsyncOpenAI()
+        client = AsyncLLMClient(max_concurrency=3)
+        client._async_client = fake
+        prompts = [[{"role": "user", "content": f"p{i}"}] for i in range(10)]
+        replies = await client.gather(*(client.achat_completion(m) for m in prompts))
+        assert len(replies) == 10
+        assert json.loads(replies[4])["name"] == "p4"
+        assert fake.peak == 3
+
+    async def test_structured_falls_back_to_json_mode(self, mock_settings):
+        client = AsyncLLMClient()
+        client._async_client = FakeAsyncOpenAI(delay=0)
+        result = await client.astructured_completion(
+            [{"role": "user", "content": "risotto"}], _Item
+        )
+        assert result == _Item(name="risotto")
+
+    def test_run_concurrently_from_sync_code(self, mock_settings):
+        client = AsyncLLMClient(max_concurrency=2)
+        client._async_client = FakeAsyncOpenAI(delay=0)
+        replies = client.run_concurrently(
+            client.achat_completion([{"role": "user", "content": "a"}]),
+            client.achat_completion([{"role": "user", "content": "b"}]),
+        )
+        assert [json.loads(r)["name"] for r in replies] == ["a", "b"]
+
+
+class TestBatchQueue:
+    @staticmethod
+    def _echo(body):
+        return json.dumps({"name": body["messages"][0]["content"]})
+
+    def test_concurrent_callers_share_one_batch(self, tmp_path):
+        backend = LocalBatchBackend(tmp_path / "out", responder=self._echo)
+        queue = BatchQueue(backend, tmp_path / "jobs", flush_interval=0.05, poll_interval=0.01)
+        results: dict[str, str] = {}
+
+        def _call(name):
+            body = queue.submit({"model": "m", "messages": [{"role": "user", "content": name}]})
+            results[name] = body.result(timeout=5)["choices"][0]["message"]["content"]
+
+        threads = [threading.Thread(target=_call, args=(f"dish{i}",)) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert {k: json.loads(v)["name"] for k, v in results.items()} == {
+            f"dish{i}": f"dish{i}" for i in range(5)
+        }
+        assert queue.stats()["batches_submitted"] == 1
+        job_lines = next((tmp_path / "jobs").glob("job_*.jsonl")).read_text().splitlines()
+        assert len(job_lines) == 5
+        assert json.loads(job_lines[0])["url"] == "/v1/chat/completions"
+
+    def test_failed_item_raises_at_call_site(self, tmp_path):
+        def _responder(body):
+            raise ValueError("bad request")
+
+        queue = BatchQueue(
+            LocalBatchBackend(tmp_path / "out", responder=_responder),
+            tmp_path / "jobs",
+            flush_interval=0.01,
+            poll_interval=0.01,
+        )
+        future = queue.submit({"model": "m", "messages": []})
+        with pytest.raises(BatchError):
+            future.result(timeout=5)
+
+    def test_llm_client_batch_mode_structured(self, tmp_path, mock_settings):
+        queue = BatchQueue(
+            LocalBatchBackend(tmp_path / "out", responder=self._echo),
+            tmp_path / "jobs",
+            flush_interval=0.01,
+            poll_interval=0.01,
+        )
+        client = LLMClient(batch=queue)
+        client._client = FakeOpenAI()
+        result = client.structured_completion([{"role": "user", "content": "gnocchi"}], _Item)
+        assert result == _Item(name="gnocchi")
+        assert client._client.parse_calls == []
+
+
+class TestRateLimiter:
+    def test_token_bucket_reports_wait_once_exhausted(self):
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.reserve(60, now=bucket.updated_at) == 0.0
+        assert bucket.reserve(1, now=bucket.updated_at) == pytest.approx(1.0)
+
+    def test_oversized_request_is_clamped_to_capacity(self):
+        bucket = TokenBucket(per_minute=100)
+        assert bucket.reserve(10_000, now=bucket.updated_at) == 0.0
+
+    def test_limits_are_per_model(self):
+        limiter = RateLimiter(rpm=1, per_model={"gpt-4o-mini": (1000, 0)})
+        assert limiter.reserve("gpt-4o", 10) == 0.0
+        assert limiter.reserve("gpt-4o", 10) > 0
+        assert limiter.reserve("gpt-4o-mini", 10) == 0.0
+        assert limiter.stats()["waits"] == 1
+
+    def test_tpm_budget_uses_token_estimate(self):
+        limiter = RateLimiter(tpm=600)
+        assert limiter.reserve("gpt-4o", 600) == 0.0
+        assert limiter.reserve("gpt-4o", 100) == pytest.approx(10.0, rel=0.01)
+
+    def test_sqlite_limiter_shares_budget_between_instances(self, tmp_path):
+        first = SQLiteRateLimiter(tmp_path / "rl.db", rpm=2)
+        second = SQLiteRateLimiter(tmp_path / "rl.db", rpm=2)
+        assert first.reserve("gpt-4o", 1) == 0.0
+        assert second.reserve("gpt-4o", 1) == 0.0
+        assert first.reserve("gpt-4o", 1) > 0
+
+    def test_parse_model_limits(self):
+        assert parse_model_limits("gpt-4o=500:30000, gpt-4o-mini=5000:") == {
+            "gpt-4o": (500, 30000),
+            "gpt-4o-mini": (5000, 0),
+        }
+
+    def test_client_acquires_before_each_upstream_call(self, fake_openai, mock_settings):
+        calls = []
+
+        class _Recorder(RateLimiter):
+            def acquire(self, model, tokens):
+                calls.append((model, tokens))
+                return 0.0
+
+        client = LLMClient(rate_limiter=_Recorder())
+        client._client = fake_openai
+        messages = [{"role": "user", "content": "x" * 400}]
+        client.chat_completion(messages, max_tokens=50)
+        assert calls == [("gpt-4o", estimate_message_tokens(messages) + 50)]
+
+    def test_estimate_tokens_is_roughly_four_chars(self):
+        assert 80 <= estimate_tokens("word " * 80) <= 120
+
+
+class _StatusError(Exception):
+    def __init__(
+        self,
+        status_code: int,
+        headers: dict | None = None,
+        code: str | None = None,
+        param: str | None = None,
+    ):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.code = code
+        self.param = param
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class TestRetryPolicy:
+    @pytest.fixture(autouse=True)
+    def _no_sleep(self, monkeypatch):
+        self.slept: list[float] = []
+        monkeypatch.setattr("common.llm.retry.time.sleep", self.slept.append)
+
+    def test_error_taxonomy(self):
+        assert is_retryable(_StatusError(429))
+        assert is_retryable(_StatusError(503))
+        assert is_retryable(TimeoutError())
+        assert not is_retryable(_StatusError(400))
+        assert not is_retryable(_StatusError(401))
+        assert not is_retryable(ValueError("bad schema"))
+
+    def test_retry_after_headers(self):
+        assert retry_after_seconds(_StatusError(429, {"retry-after": "7"})) == 7.0
+        assert retry_after_seconds(_StatusError(429, {"retry-after-ms": "250"})) == 0.25
+        assert retry_after_seconds(_StatusError(500)) is None
+
+    def test_retries_transient_errors_then_succeeds(self):
+        outcomes = [_StatusError(503), _StatusError(429, {"retry-after": "2"}), "ok"]
+
+        def _fn(timeout):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        stats = RetryStats()
+        policy = RetryPolicy(max_attempts=5, base_delay=0.1, deadline=None)
+        assert policy.call(_fn, stats=stats) == "ok"
+        assert stats.attempts == 3 and stats.retries == 2
+        assert self.slept[1] >= 2.0  # Retry-After honoured
+        assert stats.backoff_seconds == pytest.approx(sum(self.slept))
+
+    def test_fatal_error_is_not_retried(self):
+        calls = []
+
+        def _fn(timeout):
+            calls.append(timeout)
+            raise _StatusError(400)
+
+        with pytest.raises(_StatusError):
+            RetryPolicy().call(_fn)
+        assert len(calls) == 1
+
+    def test_gives_up_after_max_attempts(self):
+        def _fn(timeout):
+            raise _StatusError(500)
+
+        policy = RetryPolicy(max_attempts=3, deadline=None)
+        with pytest.raises(_StatusError):
+            policy.call(_fn)
+        assert policy.stats()["retries"] == 2
+        assert policy.stats()["giveups"] == 1
+
+    def test_deadline_stops_long_backoff(self):
+        def _fn(timeout):
+            raise _StatusError(429, {"retry-after": "60"})
+
+        with pytest.raises(DeadlineExceededError):
+            RetryPolicy(deadline=5).call(_fn)
+        assert self.slept == []
+
+    def test_circuit_breaker_fails_fast_then_probes(self, monkeypatch):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        now = time.monotonic()
+        monkeypatch.setattr("common.llm.retry.time.monotonic", lambda: now + 11)
+        assert breaker.state == "half_open"
+        breaker.before_call()  # probe allowed
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # only one probe at a time
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    async def test_cancelled_probe_is_abandoned(self, monkeypatch):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        now = time.monotonic()
+        monkeypatch.setattr("common.llm.retry.time.monotonic", lambda: now + 11)
+        started = asyncio.Event()
+
+        async def _hang(timeout):
+            started.set()
+            await asyncio.sleep(10)
+
+        probe = asyncio.create_task(RetryPolicy().acall(_hang, breaker=breaker))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.state == "half_open"
+        assert breaker.before_call()  # the next call becomes the probe
+
+    def test_client_retries_upstream_call(self, fake_openai, mock_settings):
+        failures = [_StatusError(502)]
+        original = fake_openai._create
+
+        def _flaky(**kwargs):
+            if failures:
+                raise failures.pop()
+            return original(**kwargs)
+
+        fake_openai.chat.completions.create = _flaky
+        client = LLMClient(
+            retry_policy=RetryPolicy(base_delay=0.01), circuit_breaker=CircuitBreaker()
+        )
+        client._client = fake_openai
+        assert client.chat_completion([{"role": "user", "content": "hi"}])
+        assert client.stats()["retry"]["retries"] == 1
+        assert "timeout" in fake_openai.create_calls[0]
+
+
+class TestStructuredPath:
+    def test_repair_json_handles_fences_prose_and_trailing_commas(self):
+        assert repair_json('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+        assert repair_json('Sure! Here you go: {"a": 1} Hope that helps.') == {"a": 1}
+
+    def test_repair_json_closes_truncated_output(self):
+        assert repair_json('{"items": [{"name": "pasta"}, {"name": "piz') == {
+            "items": [{"name": "pasta"}, {"name": "piz"}]
+        }
+        assert repair_json('{"a": 1, "b":') == {"a": 1, "b": None}
+
+    def test_repair_json_rejects_non_json(self):
+        with pytest.raises(ValueError):
+            repair_json("not json at all")
+
+    def test_unsupported_native_path_is_remembered(self, llm, fake_openai):
+        messages = [{"role": "user", "content": "item"}]
+        llm.structured_completion(messages, _Item, use_cache=False)
+        llm.structured_completion(messages, _Item, use_cache=False)
+        assert len(fake_openai.parse_calls) == 1
+        assert len(fake_openai.create_calls) == 2
+        assert not native_supported("gpt-4o", _Item)
+
+    def test_bad_reply_raises_with_raw_text_and_no_resend(self, mock_settings):
+        fake = FakeOpenAI(replies=["I cannot produce JSON today"])
+        client = LLMClient()
+        client._client = fake
+        with pytest.raises(StructuredOutputError) as excinfo:
+            client.structured_completion([{"role": "user", "content": "item"}], _Item)
+        assert excinfo.value.raw_text == "I cannot produce JSON today"
+        assert len(fake.parse_calls) + len(fake.create_calls) == 2
+
+    def test_unparsed_native_reply_is_repaired_locally(self, llm, fake_openai):
+        def _parse(**kwargs):
+            fake_openai.parse_calls.append(kwargs)
+            return _completion('{"name": "tiramisu", "score": 2,}', parsed=None)
+
+        fake_openai.beta.chat.completions.parse = _parse
+        result = llm.structured_completion([{"role": "user", "content": "x"}], _Item)
+        assert result == _Item(name="tiramisu", score=2)
+        assert fake_openai.create_calls == []
+
+    def test_transient_native_failure_does_not_fall_back(self, llm, fake_openai):
+        llm._retry_policy = RetryPolicy(max_attempts=1)
+        fake_openai.parse_error = _StatusError(503)
+        with pytest.raises(_StatusError):
+            llm.structured_completion([{"role": "user", "content": "x"}], _Item)
+        assert fake_openai.create_calls == []
+        assert native_supported("gpt-4o", _Item)
+
+    @pytest.mark.parametrize(
+        "error", [_StatusError(401, code="invalid_api_key"), _StatusError(400, param="messages")]
+    )
+    def test_other_native_errors_propagate_and_keep_native_path(self, llm, fake_openai, error):
+        fake_openai.parse_error = error
+        with pytest.raises(_StatusError):
+            llm.structured_completion([{"role": "user", "content": "x"}], _Item)
+        assert fake_openai.create_calls == []
+        assert native_supported("gpt-4o", _Item)
+
+
+class TestSingleFlight:
+    def test_concurrent_threads_share_one_call(self):
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def _fn():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return "reply"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do("k", _fn)))
+        leader.start()
+        started.wait(2)
+        followers = [
+            threading.Thread(target=lambda: results.append(group.do("k", _fn))) for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        while group.stats()["saved_calls"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(2)
+
+        assert len(calls) == 1
+        assert sorted(results, key=lambda r: r[1]) == [("reply", False)] + [("reply", True)] * 4
+        assert group.stats() == {"calls": 1, "saved_calls": 4, "in_flight": 0}
+
+    def test_errors_are_shared_and_key_is_released(self):
+        group = SingleFlight()
+
+        def _fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            group.do("k", _fail)
+        assert group.do("k", lambda: "ok") == ("ok", False)
+
+    async def test_concurrent_tasks_share_one_call(self):
+        group = SingleFlight()
+        calls = []
+
+        async def _fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "reply"
+
+        results = await asyncio.gather(*(group.ado("k", _fn) for _ in range(5)))
+        assert len(calls) == 1
+        assert [shared for _, shared in results].count(True) == 4
+        assert group.stats()["in_flight"] == 0
+
+    async def test_async_client_coalesces_identical_prompts(self, mock_settings):
+        fake = FakeAsyncOpenAI()
+        group = SingleFlight()
+        client = AsyncLLMClient(single_flight=group)
+        client._async_client = fake
+        messages = [{"role": "user", "content": "same"}]
+
+        replies = await client.gather(*(client.achat_completion(messages) for _ in range(6)))
+        assert len(set(replies)) == 1
+        assert client.stats()["single_flight"]["saved_calls"] == 5
+
+    async def test_uncached_calls_are_not_coalesced(self, mock_settings):
+        group = SingleFlight()
+        client = AsyncLLMClient(single_flight=group)
+        client._async_client = FakeAsyncOpenAI()
+        messages = [{"role": "user", "content": "same"}]
+
+        await client.gather(*(client.achat_completion(messages, use_cache=False) for _ in range(3)))
+        assert group.stats()["calls"] == 0
+
+
+class TestPromptBudget:
+    def test_context_window_uses_longest_prefix(self):
+        assert context_window("gpt-4o-mini") == 128_000
+        assert context_window("gpt-4") == 8_192
+        assert context_window("some-local-model") == 16_000
+
+    def test_truncate_to_tokens_cuts_at_word_boundary(self):
+        text = "alpha beta gamma delta " * 50
+        cut = truncate_to_tokens(text, 20)
+        assert estimate_tokens(cut) <= 20
+        assert text.startswith(cut) and not cut.endswith(" ")
+        assert truncate_to_tokens("short", 20) == "short"
+
+    def test_small_sections_are_left_alone(self, mock_settings):
+        prompt = PromptBudget(max_prompt_tokens=1000).render(
+            "{name}: {data}", name="x", data=Section({"a": [1, 2]})
+        )
+        assert prompt == 'x: {"a":[1,2]}'
+
+    def test_text_section_is_trimmed_to_budget(self, mock_settings):
+        budget = PromptBudget(max_prompt_tokens=200)
+        prompt = budget.render("Page:\n{text}", text=Section("word " * 2000))
+        assert prompt.endswith(TRUNCATION_MARKER)
+        assert estimate_tokens(prompt) <= 200
+
+    def test_json_section_stays_valid_json(self, mock_settings):
+        data = {
+            "items": [{"title": f"item {i}", "body": "lorem ipsum " * 40} for i in range(50)],
+            "meta": {"source": "test"},
+        }
+        text = PromptBudget(max_prompt_tokens=400).fit({"data": Section(data)}, 400)["data"]
+        shrunk = json.loads(text)
+        assert estimate_tokens(text) <= 400
+        assert shrunk["meta"] == {"source": "test"}
+        assert shrunk["items"][-1].endswith("more)")
+
+    def test_priority_then_proportional_trimming(self, mock_settings):
+        budget = PromptBudget(max_prompt_tokens=10_000)
+        sections = {
+            "key": Section("k " * 100, priority=1),
+            "big": Section("b " * 400),
+            "small": Section("s " * 200),
+        }
+        fitted = budget.fit(sections, 250)
+        assert fitted["key"] == sections["key"].value
+        big, small = estimate_tokens(fitted["big"]), estimate_tokens(fitted["small"])
+        assert big + small + estimate_tokens(fitted["key"]) <= 250
+        assert big == pytest.approx(2 * small, rel=0.25)
+
+
+class TestPacking:
+    def test_items_are_answered_in_one_call(self, llm, fake_openai):
+        results = [{"index": n, "result": {"name": f"dish {n}"}} for n in range(3)]
+        fake_openai.replies = [json.dumps({"results": list(reversed(results))})]
+        items = packed_completion(llm, ["a", "b", "c"], _Item, max_tokens_per_item=100)
+        assert [item.name for item in items] == ["dish 0", "dish 1", "dish 2"]
+        assert len(fake_openai.create_calls) == 1
+        assert fake_openai.create_calls[0]["max_tokens"] == 300
+
+    def test_calls_stay_within_the_routed_token_cap(self, llm, fake_openai):
+        first = [{"index": n, "result": {"name": f"dish {n}"}} for n in range(2)]
+        fake_openai.replies = [
+            json.dumps({"results": first}),
+            json.dumps({"results": [{"index": 0, "result": {"name": "dish 2"}}]}),
+        ]
+        cap = llm.completion_cap("classify")
+        items = packed_completion(
+            llm, ["a", "b", "c"], _Item, call_class="classify", max_tokens_per_item=cap // 2
+        )
+        assert [item.name for item in items] == ["dish 0", "dish 1", "dish 2"]
+        assert [call["max_tokens"] for call in fake_openai.create_calls] == [cap, cap // 2]
+
+    def test_shared_instructions_are_sent_once_as_system_message(self, llm, fake_openai):
+        results = [{"index": n, "result": {"name": f"dish {n}"}} for n in range(2)]
+        fake_openai.replies = [json.dumps({"results": results})]
+        packed_completion(llm, ["a", "b"], _Item, instructions="Name the dish.")
+        system, user = fake_openai.create_calls[0]["messages"]
+        assert system == {"role": "system", "content": "Name the dish."}
+        assert "Name the dish." not in user["content"]
+
+    def test_only_failed_items_are_reissued(self, llm, fake_openai):
+        fake_openai.replies = [
+            json.dumps({"results": [{"index": 0, "result": {"name": "ok"}}, {"index": 1}]}),
+            json.dumps({"results": [{"index": 0, "name": "fixed", "score": 2}]}),
+        ]
+        items = packed_completion(llm, ["first task", "second task"], _Item)
+        assert items == [_Item(name="ok"), _Item(name="fixed", score=2)]
+        retry = fake_openai.create_calls[1]["messages"][0]["content"]
+        assert "second task" in retry and "first task" not in retry
+
+    def test_items_failing_every_round_are_none(self, llm, fake_openai):
+        fake_openai.replies = ["not json at all"]
+        assert packed_completion(llm, ["a", "b"], _Item, max_rounds=2) == [None, None]
+        assert len(fake_openai.create_calls) == 2
+
+
+class TestModelRouting:
+    def test_call_class_selects_model_and_token_cap(self, llm, fake_openai):
+        llm.chat_completion([{"role": "user", "content": "intent?"}], call_class="classify")
+        llm.chat_completion([{"role": "user", "content": "post"}], call_class="generate")
+        llm.chat_completion([{"role": "user", "content": "plain"}])
+        classify, generate, plain = fake_openai.create_calls
+        assert (classify["model"], classify["max_tokens"]) == ("gpt-4o-mini", 1000)
+        assert (generate["model"], generate["max_tokens"]) == ("gpt-4o", 4000)
+        assert (plain["model"], plain["max_tokens"]) == ("gpt-4o", 2000)
+
+    def test_explicit_arguments_override_route(self, llm, fake_openai):
+        messages = [{"role": "user", "content": "x"}]
+        llm.chat_completion(messages, model="gpt-4.1", max_tokens=50, call_class="classify")
+        assert fake_openai.create_calls[0]["model"] == "gpt-4.1"
+        assert fake_openai.create_calls[0]["max_tokens"] == 50
+
+    def test_routes_come_from_settings(self, monkeypatch, mock_settings):
+        monkeypatch.setenv("LLM_EXTRACT_MODEL", "gpt-4o-mini")
+        monkeypatch.setenv("LLM_EXTRACT_MAX_TOKENS", "700")
+        fake = FakeOpenAI()
+        client = LLMClient()
+        client._client = fake
+        messages = [{"role": "user", "content": "x"}]
+        client.structured_completion(messages, _Item, call_class="extract")
+        assert fake.parse_calls[0]["model"] == "gpt-4o-mini"
+        assert fake.create_calls[0]["max_tokens"] == 700
+
+    def test_unknown_call_class_is_rejected(self, llm):
+        with pytest.raises(ValueError, match="Unknown call class"):
+            llm.chat_completion([{"role": "user", "content": "x"}], call_class="translate")
+
+
+class TestMetrics:
+    @pytest.fixture
+    def registry(self):
+        return MetricsRegistry()
+
+    def _client(self, fake, registry, **kwargs):
+        client = LLMClient(metrics=registry, **kwargs)
+        client._client = fake
+        return client
+
+    def test_call_is_recorded_with_bot_and_call_site(self, fake_openai, registry, mock_settings):
+        client = self._client(fake_openai, registry)
+        with bot_scope("trend_tracking"):
+            client.chat_completion([{"role": "user", "content": "x"}], call_class="classify")
+        (record,) = registry._records
+        assert (record.bot, record.model, record.call_class) == (
+            "trend_tracking",
+            "gpt-4o-mini",
+            "classify",
+        )
+        assert record.call_site.endswith("test_call_is_recorded_with_bot_and_call_site")
+        assert (record.prompt_tokens, record.completion_tokens) == (10, 5)
+        assert (record.path, record.cache) == ("chat", "miss")
+        assert record.total_seconds >= record.ttfb_seconds >= 0
+
+    def test_json_mode_fallback_is_one_record(self, fake_openai, registry, mock_settings):
+        client = self._client(fake_openai, registry)
+        client.structured_completion([{"role": "user", "content": "x"}], _Item)
+        (record,) = registry._records
+        assert record.path == "json_mode"
+        assert record.prompt_tokens == 10
+
+    def test_cache_and_errors_are_labelled(self, fake_openai, registry, mock_settings, tmp_path):
+        client = self._client(fake_openai, registry, cache=ResponseCache(tmp_path / "c.db"))
+        messages = [{"role": "user", "content": "x"}]
+        client.chat_completion(messages)
+        client.chat_completion(messages)
+        fake_openai.chat.completions.create = lambda **kw: (_ for _ in ()).throw(ValueError("x"))
+        with pytest.raises(ValueError):
+            client.chat_completion(messages, use_cache=False)
+        assert [(r.cache, r.outcome) for r in registry._records] == [
+            ("miss", "ok"),
+            ("hit", "ok"),
+            ("bypass", "error"),
+        ]
+        summary = registry.summary()
+        assert (summary["calls"], summary["cache_hits"], summary["errors"]) == (3, 1, 1)
+
+    def test_prometheus_exposition(self, fake_openai, registry, mock_settings):
+        client = self._client(fake_openai, registry)
+        client.chat_completion([{"role": "user", "content": "x"}])
+        text = registry.to_prometheus()
+        assert "# TYPE llm_call_duration_seconds histogram" in text
+        assert 'llm_tokens_total{bot="-",' in text and 'kind="prompt"} 10' in text
+        assert 'le="+Inf"} 1' in text
+        assert text.count("llm_calls_total{") == 1
+
+
+class TestCassette:
+    def _record(self, path, fake, mock_settings):
+        client = LLMClient(cassette=Cassette(path, mode="record"), single_flight=SingleFlight())
+        client._client = CassetteClient(client._cassette, fake)
+        return client
+
+    @pytest.mark.parametrize("name", ["tape.jsonl", "tape.jsonl.gz"])
+    def test_record_then_replay_offline(self, tmp_path, mock_settings, name):
+        fake = FakeOpenAI(replies=['{"name": "pasta", "score": 3}', "second reply"])
+        recorder = self._record(tmp_path / name, fake, mock_settings)
+        first = recorder.structured_completion([{"role": "user", "content": "item"}], _Item)
+        second = recorder.chat_completion([{"role": "user", "content": "free text"}])
+
+        replay = LLMClient(cassette=Cassette(tmp_path / name))
+        assert replay.structured_completion([{"role": "user", "content": "item"}], _Item) == first
+        assert replay.chat_completion([{"role": "user", "content": "free text"}]) == second
+        assert len(fake.create_calls) == 2
+
+    def test_repeated_requests_replay_in_order(self, tmp_path, mock_settings):
+        fake = FakeOpenAI(replies=["one", "two"])
+        recorder = self._record(tmp_path / "tape.jsonl", fake, mock_settings)
+        messages = [{"role": "user", "content": "same"}]
+        recorder.chat_completion(messages, use_cache=False)
+        recorder.chat_completion(messages, use_cache=False)
+
+        cassette = Cassette(tmp_path / "tape.jsonl")
+        replay = LLMClient(cassette=cassette)
+        replies = [replay.chat_completion(messages, use_cache=False) for _ in range(3)]
+        assert replies == ["one", "two", "two"]
+        cassette.rewind()
+        assert replay.chat_completion(messages, use_cache=False) == "one"
+
+    def test_unrecorded_request_fails_fast(self, tmp_path, mock_settings):
+        (tmp_path / "tape.jsonl").write_text("")
+        replay = LLMClient(cassette=Cassette(tmp_path / "tape.jsonl"))
+        with pytest.raises(CassetteMissError):
+            replay.chat_completion([{"role": "user", "content": "never recorded"}])
+
+    def test_latency_models(self):
+        assert recorded_latency(0.5)({"latency": 0.4}) == pytest.approx(0.2)
+        draws = [parse_latency("lognormal:0.8:0.3")({}) for _ in range(200)]
+        assert 0.6 < sorted(draws)[100] < 1.0
+        assert parse_latency("") is None
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransport:
+    @pytest.fixture(autouse=True)
+    def _fresh_pool(self):
+        close_transport()
+        connection_stats().reset()
+        yield
+        close_transport()
+        connection_stats().reset()
+
+    def test_clients_share_one_pool(self, mock_settings):
+        first, second = LLMClient(), LLMClient()
+        assert first._get_client()._client is second._get_client()._client
+        assert first._get_client()._client is get_http_client()
+
+    def test_connections_are_reused_and_counted(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = get_http_client(TransportConfig(max_keepalive_connections=2))
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            for _ in range(3):
+                assert client.get(url).text == "ok"
+        finally:
+            server.shutdown()
+            server.server_close()
+        stats = connection_stats().snapshot()
+        assert (stats["requests"], stats["connections_opened"], stats["reused"]) == (3, 1, 2)
+        assert "llm_http_connections_opened_total 1" in connection_stats().to_prometheus()
+
+    async def test_async_pool_belongs_to_its_loop_until_closed(self, mock_settings):
+        pool = get_async_http_client()
+        assert get_async_http_client() is pool
+        await aclose_async_http_client()
+        assert pool.is_closed
+        assert get_async_http_client() is not pool
+        await aclose_async_http_client()
+
+
+class _Menu(BaseModel):
+    title: str
+    items: list[_Item]
+
+
+class TestStreaming:
+    def test_array_elements_are_decoded_across_chunk_boundaries(self):
+        doc = '```json\n{"title": "a: [b]", "items": [{"name": "x}]\\"", "tags": [1]}, 2, null]}'
+        for size in (1, 5, len(doc)):
+            stream, elements = JsonArrayStream("items"), []
+            for start in range(0, len(doc), size):
+                elements += stream.feed(doc[start : start + size])
+            assert elements == [{"name": 'x}]"', "tags": [1]}, 2, None]
+
+    def test_items_are_yielded_before_the_reply_is_complete(self, llm, fake_openai):
+        items = [{"name": f"dish {i}", "score": i} for i in range(5)]
+        fake_openai.replies = [json.dumps({"title": "menu", "items": items})]
+        stream = llm.stream_structured([{"role": "user", "content": "menu"}], _Menu, "items")
+        first = next(stream)
+        assert first == _Item(name="dish 0", score=0)
+        # Calls made between elements must not join the stream's metrics record.
+        assert current_record() is None
+        total_chunks = -(-len(fake_openai.replies[0]) // 7)
+        assert fake_openai.chunks_sent < total_chunks
+        assert [first, *stream] == [_Item(**item) for item in items]
+        assert stream.result == _Menu(title="menu", items=items)
+        assert fake_openai.create_calls[0]["stream"] is True
+
+    def test_streamed_result_is_cached_and_replayed(self, fake_openai, mock_settings, tmp_path):
+        client = LLMClient(cache=ResponseCache(tmp_path / "cache.db"))
+        client._client = fake_openai
+        fake_openai.replies = [json.dumps({"title": "t", "items": [{"name": "soup"}]})]
+        messages = [{"role": "user", "content": "menu"}]
+        assert list(client.stream_structured(messages, _Menu, "items")) == [_Item(name="soup")]
+        replay = client.stream_structured(messages, _Menu, "items")
+        assert list(replay) == [_Item(name="soup")]
+        assert replay.result.title == "t"
+        assert len(fake_openai.create_calls) == 1
+
+    def test_unrepairable_reply_raises_after_streaming(self, llm, fake_openai):
+        fake_openai.replies = ['{"items": [{"name": "soup"}], "title": 7}']
+        stream = llm.stream_structured([{"role": "user", "content": "x"}], _Menu, "items")
+        assert next(stream) == _Item(name="soup")
+        with pytest.raises(StructuredOutputError) as info:
+            next(stream)
+        assert '"title": 7' in info.value.raw_text
+
+
+class TestPromptLayout:
+    _TEMPLATE = PromptTemplate(
+        instructions="Summarise the payload under Input.",
+        fields=(("name", "Restaurant"), ("payload", "Payload (JSON)")),
+    )
+
+    def test_static_prefix_is_shared_and_data_comes_last(self, mock_settings):
+        first = self._TEMPLATE.render(name="Roma", payload={"b": 1, "a": [1, 2]})
+        second = self._TEMPLATE.render(name="Tokyo", payload={"a": [3], "b": 2})
+        prefix = "Summarise the payload under Input.\n\n" + DATA_HEADER + "\n"
+        assert first.startswith(prefix) and second.startswith(prefix)
+        assert first.endswith('Restaurant: Roma\nPayload (JSON): {"a":[1,2],"b":1}\n')
+
+    def test_serialisation_is_independent_of_key_order(self, mock_settings):
+        assert self._TEMPLATE.render(name="x", payload={"b": 1, "a": 2}) == self._TEMPLATE.render(
+            name="x", payload={"a": 2, "b": 1}
+        )
+
+    def test_sections_are_fitted_to_the_budget(self, mock_settings):
+        budget = PromptBudget(model="gpt-4o", max_prompt_tokens=60)
+        prompt = self._TEMPLATE.render(budget=budget, name="x", payload=Section("word " * 500))
+        assert estimate_tokens(prompt, "gpt-4o") <= 60
+        assert TRUNCATION_MARKER.strip() in prompt
+
+    def test_fields_must_match(self, mock_settings):
+        with pytest.raises(KeyError):
+            self._TEMPLATE.render(name="x")
+
+    def test_cached_prompt_tokens_are_summarised(self):
+        registry = MetricsRegistry()
+        with bot_scope("chatbot"), registry.track("gpt-4o"):
+            details = SimpleNamespace(cached_tokens=768)
+            usage = SimpleNamespace(
+                prompt_tokens=1024, completion_tokens=10, prompt_tokens_details=details
+            )
+            note_usage(usage)
+        summary = registry.summary("chatbot")
+        assert (summary["cached_tokens"], summary["prompt_cache_ratio"]) == (768, 0.75)
+
+
+class TestHedging:
+    @staticmethod
+    def _warm(policy, model="gpt-4o", seconds=0.01, samples=5):
+        for _ in range(samples):
+            policy.observe(model, seconds)
+
+    def test_slow_call_is_hedged_and_duplicate_wins(self, fake_openai, mock_settings):
+        policy = HedgePolicy(min_samples=5, max_rate=1.0)
+        self._warm(policy)
+        calls = []
+        release = threading.Event()
+
+        def _create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(2)
+            return _completion("fast")
+
+        fake_openai.chat.completions.create = _create
+        client = LLMClient(hedge_policy=policy)
+        client._client = fake_openai
+        started = time.monotonic()
+        reply = client.chat_completion([{"role": "user", "content": "hi"}], hedge=True)
+        release.set()
+        assert reply == "fast"
+        assert time.monotonic() - started < 1.0
+        assert len(calls) == 2
+        assert client.stats()["hedging"]["hedges_won"] == 1
+
+    def test_calls_that_do_not_opt_in_are_never_hedged(self, fake_openai, mock_settings):
+        policy = HedgePolicy(min_samples=1, max_rate=1.0)
+        self._warm(policy, seconds=0.0)
+        client = LLMClient(hedge_policy=policy)
+        client._client = fake_openai
+        client.chat_completion([{"role": "user", "content": "hi"}])
+        assert policy.stats()["calls"] == 0
+        assert len(fake_openai.create_calls) == 1
+
+    def test_hedge_rate_is_capped(self):
+        policy = HedgePolicy(percentile=0.5, min_samples=1, max_rate=0.5, min_delay=0.0)
+        self._warm(policy, seconds=0.0, samples=50)
+
+        def _slow():
+            time.sleep(0.02)
+            return "ok"
+
+        for _ in range(4):
+            assert policy.call("gpt-4o", _slow) == "ok"
+        stats = policy.stats()
+        assert (stats["hedges"], stats["hedges_capped"]) == (2, 2)
+
+    async def test_async_loser_is_cancelled(self):
+        policy = HedgePolicy(min_samples=1, max_rate=1.0)
+        self._warm(policy)
+        started, cancelled = [], []
+
+        async def _request():
+            started.append(1)
+            try:
+                await asyncio.sleep(5 if len(started) == 1 else 0)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return len(started)
+
+        assert await policy.acall("gpt-4o", _request) == 2
+        await asyncio.sleep(0)
+        assert cancelled == [1]
+        assert policy.stats()["win_rate"] == 1.0
+
+
+class TestFakeLLMServer:
+    @pytest.fixture
+    def server(self):
+        server = FakeLLMServer(("127.0.0.1", 0), FakeLLMConfig(ttft=0.0, seed=1)).start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        close_transport()
+
+    @pytest.fixture
+    def client(self, server, mock_settings, monkeypatch):
+        from common.config import get_settings
+
+        monkeypatch.setenv("OPENAI_BASE_URL", server.url)
+        get_settings.cache_clear()
+        return LLMClient()
+
+    def test_structured_reply_matches_schema(self, client):
+        meta = client.structured_completion(
+            [{"role": "user", "content": "Write SEO meta for the menu page."}],
+            response_format=SeoMeta,
+            use_cache=False,
+        )
+        assert isinstance(meta, SeoMeta) and meta.title_tag
+
+    def test_json_mode_reply_is_inferred_from_bot_prompt(self, client):
+        from bots.link_building.bot import LinkBuildingBot
+
+        bot = LinkBuildingBot(llm=client)
+        prospects = list(bot.stream_prospects(["pasta"], "Rome", "Italian"))
+        assert len(prospects) == 3
+        assert all(p.url.startswith("https://") for p in prospects)
+
+    def test_async_client_survives_repeated_event_loops(self, server, client):
+        async_client = AsyncLLMClient()
+        for prompt in ("first", "second"):
+            replies = async_client.run_concurrently(
+                *(
+                    async_client.achat_completion(
+                        [{"role": "user", "content": text}], use_cache=False
+                    )
+                    for text in (prompt, "x")
+                )
+            )
+            assert all(replies)
+        assert server.requests == 4
+
+    def test_text_reply_and_injected_errors(self, client, server):
+        reply = client.chat_completion([{"role": "user", "content": "hi"}], use_cache=False)
+        assert reply and server.requests == 1
+        server.config.error_rate = 1.0
+        with pytest.raises(openai.InternalServerError):
+            client.chat_completion([{"role": "user", "content": "again"}], use_cache=False)
+        assert server.errors >= 1
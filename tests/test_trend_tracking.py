@@ -0,0 +1,44 @@
+"""Tests for the Trend Tracking bot."""
+from __future__ import annotations
+
+import json
+from unittest.mock import MagicMock
+
+from bots.trend_tracking.bot import TrendTrackingBot
+from common.crawling.http_cache import FetchResult
+from common.crawling.scraper import WebScraper
+
+_RSS = "<rss><channel><item><title>Natural wine bars are booming</title></item></channel></rss>"
+
+_TRENDS_RESPONSE = json.dumps({
+    "trends": [
+        {
+            "topic": "Natural wine",
+            "source": "Food & Wine",
+            "summary": "Diners are asking for low-intervention wines.",
+            "relevance_score": 0.8,
+            "actionable_ideas": ["Add two natural wines by the glass"],
+        }
+    ]
+})
+
+
+class TestTrendTrackingBot:
+    def test_unchanged_feeds_reuse_analysis_only_for_same_inputs(
+        self, mock_llm_client, mock_settings, tmp_output_dir
+    ):
+        mock_llm_client.chat_completion.return_value = _TRENDS_RESPONSE
+        scraper = MagicMock(spec=WebScraper)
+        scraper.fetch_result.side_effect = lambda url, timeout=None: FetchResult(
+            url, _RSS, unchanged=True
+        )
+        bot = TrendTrackingBot(llm=mock_llm_client, scraper=scraper)
+
+        first = bot.run(topics=["wine"])
+        assert first["trends"][0]["topic"] == "Natural wine"
+        bot.run(topics=["wine"])
+        assert mock_llm_client.structured_completion.call_count == 1
+
+        bot.run(topics=["wine", "brunch"])
+        bot.run(topics=["wine", "brunch"], cuisine="Japanese")
+        assert mock_llm_client.structured_completion.call_count == 3